@@ -4,34 +4,173 @@
 # In[ ]:
 
 
-from dash import Dash, dcc, html, dash_table, callback, Input, Output
+from dash import Dash, dcc, html, dash_table, callback, ctx, no_update, ClientsideFunction, Input, Output, State, Patch
+from dash.dash_table import FormatTemplate
+from dash.dash_table.Format import Format, Group, Scheme
+from dash.exceptions import PreventUpdate
 import plotly.graph_objs as go
-import plotly.express as px
 import pandas as pd
 import numpy as np
-import requests
 import json
-from datetime import datetime, timedelta
+import os
+import threading
+import time
+from datetime import datetime
 
-# Initialize the app
-app = Dash(__name__)
+import correlation_index
+import covariance_engine
+import data_loader
+import downsample
+import holdings_store
+import metrics
+import nudge_engine
+import payload
+import risk_engine
+import rollups
+from portfolio_registry import PortfolioRegistry
+from caching import LRUCache, memoize_by_slices, slice_versions
+
+# Modules that only serve lazy tabs (monte_carlo, rebalance, returns_query,
+# table_index, history_store) or optional modes (price_feed, prerender) are
+# imported where they are first used, so a worker boots without them
+
+# Initialize the app (paged tables are rendered by callbacks, so their ids
+# are not in the initial layout)
+app = Dash(__name__, suppress_callback_exceptions=True)
 app.title = "Comprehensive Portfolio Performance Dashboard"
 server = app.server
+metrics.instrument_dash(app)
+if os.environ.get("RESPONSE_COMPRESSION", "1") != "0":
+    payload.install_compression(server)
 
 # GitHub raw URL to your JSON file
-GITHUB_JSON_URL = "https://raw.githubusercontent.com/Akashshrivastava719/portfolio-dashboard/main/portfolio_data.json"
+GITHUB_JSON_URL = os.environ.get(
+    "PORTFOLIO_JSON_URL",
+    "https://raw.githubusercontent.com/Akashshrivastava719/portfolio-dashboard/main/portfolio_data.json"
+)
+
+def _json_setting(name, default):
+    """Value of an environment variable holding JSON or the path of a JSON file"""
+    raw = os.environ.get(name)
+    if not raw:
+        return default
+    if os.path.exists(raw):
+        with open(raw, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(raw)
+
+# All portfolios served by this deployment (name -> source URL or ingest
+# manifest); the first one is shown by default
+PORTFOLIO_SOURCES = _json_setting("PORTFOLIO_SOURCES", {"Main Portfolio": GITHUB_JSON_URL})
+DEFAULT_PORTFOLIO = next(iter(PORTFOLIO_SOURCES))
+
+# Memory budget for parsed portfolios kept per worker, and parallel loaders
+PORTFOLIO_CACHE_BYTES = int(os.environ.get("PORTFOLIO_CACHE_MB", 512)) * 1024 * 1024
+PORTFOLIO_LOAD_WORKERS = int(os.environ.get("PORTFOLIO_LOAD_WORKERS", 8))
+
+# Parse the other portfolios from their local snapshots in the background after
+# startup (up to half the memory budget), so switching books does not wait
+WARM_PORTFOLIOS = os.environ.get("WARM_PORTFOLIOS", "1") != "0"
+
+# How often the browser checks whether the background poller found new data
+DATA_POLL_INTERVAL_MS = 15 * 1000
+
+# Number of built figures/tables kept across data versions
+FIGURE_CACHE_SIZE = int(os.environ.get("FIGURE_CACHE_SIZE", 64))
+
+# Rolling window (trading days) for rolling volatility and beta
+RISK_WINDOW = int(os.environ.get("RISK_WINDOW", risk_engine.DEFAULT_WINDOW))
+
+# Window the offline JSON export uses for its precomputed rolling series
+EXPORTED_RISK_WINDOW = 60
+
+# Precision and shrinkage used when covariances are built from per-asset returns
+COVARIANCE_DTYPE = np.dtype(os.environ.get("COVARIANCE_DTYPE", "float64"))
+COVARIANCE_SHRINKAGE = os.environ.get("COVARIANCE_SHRINKAGE") or None
+
+# Maximum points sent per time-series chart (re-queried at full budget on zoom)
+TIMESERIES_POINT_BUDGETS = {
+    'cumulative-returns': 1500,
+    'drawdown-chart': 1500,
+    'rolling-volatility': 1000,
+    'rolling-beta': 1000,
+    'recent-returns-2m': 500,
+    'recent-returns-1m': 500,
+}
+DOWNSAMPLE_METHOD = os.environ.get("DOWNSAMPLE_METHOD", "lttb")
+
+# Points sent for the cumulative returns of a picked date window
+WINDOW_CHART_POINT_BUDGET = 1000
+
+# Rows per page of the server-side paged tables
+TABLE_PAGE_SIZE = int(os.environ.get("TABLE_PAGE_SIZE", 25))
+
+# Keep an on-disk, delta-encoded history of every portfolio version for comparisons
+PORTFOLIO_HISTORY = os.environ.get("PORTFOLIO_HISTORY", "1") != "0"
+
+# Live price ticks (file:<path> or udp://host:port; unset disables streaming)
+# and how often a streaming browser asks for the changes since its last poll
+PRICE_FEED = os.environ.get("PRICE_FEED")
+LIVE_POLL_INTERVAL_MS = int(os.environ.get("LIVE_POLL_INTERVAL_MS", 1000))
 
-# Store the current data
-current_data = {
+# Build every section once per data version into a static, cacheable bundle
+# (served on /report and /prerender/...), and where the bundles are kept
+PRERENDER = os.environ.get("PRERENDER", "1") != "0"
+PRERENDER_DIR = os.environ.get("PRERENDER_DIR", os.path.join(data_loader.CACHE_DIR, "prerender"))
+
+# Rollup shown in the table until another grouping is picked
+ROLLUP_DEFAULT_DIMENSION = 'Sector'
+
+# Custom tag groups for the rollups, {tag: [tickers]}, on top of any Tags column of the export
+PORTFOLIO_TAGS = _json_setting("PORTFOLIO_TAGS", {})
+
+# Upper bound on the scenarios one Monte Carlo run may request
+MONTE_CARLO_MAX_SCENARIOS = int(os.environ.get("MONTE_CARLO_MAX_SCENARIOS", 2_000_000))
+
+# Which data keys each dashboard section is built from
+DATA_SLICES = {
+    'performance': ['port_vs_bench'],
+    'holdings': ['portfolio'],
+    'sectors': ['sector_data'],
+    'risk_summary': ['risk_summary'],
+    'correlation': ['corr_matrix', 'corr_tickers'],
+    'returns': ['portfolio_returns', 'var_threshold', 'cvar_threshold'],
+    'timeseries': ['dates', 'cum_port', 'cum_bench', 'drawdown', 'max_drawdown',
+                   'rolling_vol', 'portfolio_vol_annual', 'rolling_beta', 'beta_full', 'risk_window'],
+    'risk_contrib': ['component_var_df', 'sector_contrib_pct', 'asset_covariance', 'asset_covariance_tickers'],
+    'nudges': ['nudges'],
+}
+
+# Sections only built while their tab is open (section -> tab); each records
+# the slice versions it last rendered in a rendered-<section> store
+LAZY_SECTIONS = {
+    'risk-analysis': 'risk',
+    'returns-window': 'risk',
+    'correlation': 'correlation',
+    'risk-contribution': 'contribution',
+    'monte-carlo': 'montecarlo',
+    'whatif-tickers': 'whatif',
+    'whatif': 'whatif',
+    'portfolio-table': 'holdings',
+    'history': 'history',
+}
+
+# Memoized create_* results keyed by the versions of their data slices
+figure_cache = metrics.register_cache('figures', LRUCache(maxsize=FIGURE_CACHE_SIZE))
+
+# Placeholder data served until a portfolio's first snapshot arrives
+EMPTY_DATA = {
     'portfolio': pd.DataFrame(),
     'port_vs_bench': pd.DataFrame(),
     'sector_data': pd.DataFrame(),
     'risk_summary': pd.DataFrame(),
     'nudges': [],
-    'corr_matrix': pd.DataFrame(),
+    'corr_matrix': np.empty(0, dtype=np.float32),
+    'corr_tickers': [],
     'portfolio_returns': [],
     'benchmark_returns': [],
     'dates': [],
+    'date_index': np.array([], dtype=np.int64),
     'var_threshold': 0,
     'cvar_threshold': 0,
     'cum_port': [],
@@ -40,110 +179,266 @@ current_data = {
     'rolling_vol': [],
     'rolling_beta': [],
     'max_drawdown': 0,
+    'portfolio_vol_annual': 0,
+    'beta_full': 0,
+    'VaR_pct': 0,
+    'CVaR_pct': 0,
     'component_var_df': pd.DataFrame(),
-    'sector_contrib_pct': pd.DataFrame()
+    'sector_contrib_pct': pd.DataFrame(),
+    'holdings_index': holdings_store.HoldingsStore(pd.DataFrame()),
+    'rollups': rollups.RollupCube(holdings_store.HoldingsStore(pd.DataFrame())),
+    'asset_covariance': None,
+    'asset_covariance_tickers': None,
+    'risk_window': RISK_WINDOW,
+    'version': None,
+    'loaded_at': None
 }
+EMPTY_DATA['slices'] = slice_versions(EMPTY_DATA, DATA_SLICES)
 
-def load_data_from_github():
-    """Load comprehensive data from GitHub repository"""
-    try:
-        print("🔄 Loading comprehensive data from GitHub...")
-        response = requests.get(GITHUB_JSON_URL)
-        response.raise_for_status()
-        
-        data_dict = response.json()
-        
-        # Convert to DataFrames and arrays
-        portfolio = pd.DataFrame(data_dict.get('portfolio', []))
-        
-        # Create port_vs_bench
-        comparison = pd.DataFrame(data_dict.get('comparison', []))
-        if not comparison.empty:
-            port_vs_bench = comparison.reset_index().rename(columns={'index': 'Metric'})
-            benchmark_col = [col for col in port_vs_bench.columns if 'Nifty' in col or 'Benchmark' in col]
-            if benchmark_col:
-                port_vs_bench = port_vs_bench.rename(columns={benchmark_col[0]: 'Benchmark'})
-        else:
-            port_vs_bench = pd.DataFrame()
-        
-        # Create sector_data
-        sector_dist = pd.DataFrame(data_dict.get('sector_dist', []))
-        if not sector_dist.empty:
-            sector_data = sector_dist.rename(columns={0: 'Weight', 'Sector': 'Sector'})
-            if 'Current Value' in sector_data.columns:
-                sector_data = sector_data.rename(columns={'Current Value': 'Weight'})
-        else:
-            sector_data = pd.DataFrame()
-        
-        # Other data
-        risk_summary = pd.DataFrame(data_dict.get('risk_summary', []))
-        nudges = data_dict.get('nudges', [])
-        corr_matrix = pd.DataFrame(data_dict.get('corr_matrix', []))
-        component_var_df = pd.DataFrame(data_dict.get('component_var_df', []))
-        sector_contrib_pct = pd.DataFrame(data_dict.get('sector_contrib_pct', []))
-        
-        # Time series data
-        portfolio_returns = np.array(data_dict.get('portfolio_returns', []))
-        benchmark_returns = np.array(data_dict.get('benchmark_returns', []))
-        dates = data_dict.get('dates', [])
-        cum_port = np.array(data_dict.get('cum_port', []))
-        cum_bench = np.array(data_dict.get('cum_bench', []))
-        drawdown = np.array(data_dict.get('drawdown', []))
-        rolling_vol = np.array(data_dict.get('rolling_vol', []))
-        rolling_beta = np.array(data_dict.get('rolling_beta', []))
-        
-        # Risk metrics
-        var_threshold = data_dict.get('var_threshold', 0)
-        cvar_threshold = data_dict.get('cvar_threshold', 0)
-        max_drawdown = data_dict.get('max_drawdown', 0)
-        portfolio_vol_annual = data_dict.get('portfolio_vol_annual', 0)
-        beta_full = data_dict.get('beta_full', 0)
-        VaR_pct = data_dict.get('VaR_pct', 0)
-        CVaR_pct = data_dict.get('CVaR_pct', 0)
-        
-        print("✅ Comprehensive data loaded successfully!")
-        return {
-            'portfolio': portfolio,
-            'port_vs_bench': port_vs_bench,
-            'sector_data': sector_data,
-            'risk_summary': risk_summary,
-            'nudges': nudges,
-            'corr_matrix': corr_matrix,
-            'portfolio_returns': portfolio_returns,
-            'benchmark_returns': benchmark_returns,
-            'dates': dates,
-            'var_threshold': var_threshold,
-            'cvar_threshold': cvar_threshold,
-            'cum_port': cum_port,
-            'cum_bench': cum_bench,
-            'drawdown': drawdown,
-            'rolling_vol': rolling_vol,
-            'rolling_beta': rolling_beta,
-            'max_drawdown': max_drawdown,
-            'portfolio_vol_annual': portfolio_vol_annual,
-            'beta_full': beta_full,
-            'VaR_pct': VaR_pct,
-            'CVaR_pct': CVaR_pct,
-            'component_var_df': component_var_df,
-            'sector_contrib_pct': sector_contrib_pct
-        }
-        
-    except Exception as e:
-        print(f"❌ Error loading data from GitHub: {e}")
-        return current_data
-
-# Load initial data
-current_data = load_data_from_github()
+# One incremental risk engine per portfolio: a version that only appends days
+# to the last one updates the derived series day by day (see risk_engine.py)
+risk_engines = {}
+risk_engines_lock = threading.Lock()
+
+# Likewise one covariance accumulator per portfolio, with the tickers it covers,
+# for the risk tables derived from per-asset returns (see covariance_engine.py)
+covariance_accumulators = {}
+covariance_accumulators_lock = threading.Lock()
+
+def derive_risk_metrics(data_dict, portfolio_id=None):
+    """Fill in risk series the snapshot does not ship, or ships for another window"""
+    returns = data_dict.get('portfolio_returns')
+    if returns is None or len(returns) == 0:
+        return data_dict
+    
+    metrics_keys = ['cum_port', 'cum_bench', 'drawdown', 'rolling_vol', 'rolling_beta', 'var_threshold',
+                    'cvar_threshold', 'VaR_pct', 'CVaR_pct', 'max_drawdown', 'portfolio_vol_annual', 'beta_full']
+    missing = [k for k in metrics_keys if k not in data_dict]
+    if RISK_WINDOW != data_dict.get('risk_window', EXPORTED_RISK_WINDOW):
+        missing += [k for k in ('rolling_vol', 'rolling_beta') if k not in missing]
+    if not missing:
+        return data_dict
+    
+    benchmark_returns = data_dict.get('benchmark_returns', [])
+    if portfolio_id is None or len(benchmark_returns) != len(returns):
+        metrics = risk_engine.compute_risk_metrics(returns, benchmark_returns, window=RISK_WINDOW)
+    else:
+        with risk_engines_lock:
+            engine = risk_engine.extend(risk_engines.get(portfolio_id), returns, benchmark_returns, window=RISK_WINDOW)
+            risk_engines[portfolio_id] = engine
+            metrics = engine.metrics()
+    return dict(data_dict, **{k: metrics[k] for k in missing})
+
+def derive_risk_tables(data_dict, portfolio_id=None):
+    """Build correlation and risk-contribution tables from per-asset returns when not shipped"""
+    asset_returns = data_dict.get('asset_returns')
+    targets = ['corr_matrix', 'component_var_df', 'sector_contrib_pct']
+    if asset_returns is None or len(asset_returns) == 0 or all(k in data_dict for k in targets):
+        return data_dict
+    
+    asset_returns = pd.DataFrame(asset_returns)
+    tickers = [c for c in asset_returns.columns if c != 'Date']
+    portfolio = pd.DataFrame(data_dict.get('portfolio', []))
+    holdings = portfolio.set_index('Ticker') if 'Ticker' in portfolio.columns else pd.DataFrame()
+    weights = holdings['Weight'].reindex(tickers).fillna(0).to_numpy() if 'Weight' in holdings else np.zeros(len(tickers))
+    sectors = holdings['Sector'].reindex(tickers).astype(object).fillna('UNKNOWN').to_numpy() if 'Sector' in holdings else ['UNKNOWN'] * len(tickers)
+    
+    shrinkage = COVARIANCE_SHRINKAGE
+    if shrinkage not in (None, 'ledoit-wolf'):
+        shrinkage = float(shrinkage)
+    returns = asset_returns[tickers].to_numpy(dtype=float)
+    # Ledoit-Wolf needs the whole centred history, and gaps are handled pair by pair, so both start cold
+    if portfolio_id is None or shrinkage == 'ledoit-wolf' or np.isnan(returns).any():
+        tables = covariance_engine.risk_tables(returns, tickers, weights, sectors,
+                                               dtype=COVARIANCE_DTYPE, shrinkage=shrinkage)
+    else:
+        with covariance_accumulators_lock:
+            previous_tickers, accumulator = covariance_accumulators.get(portfolio_id, (None, None))
+            accumulator = covariance_engine.extend(accumulator if previous_tickers == tickers else None,
+                                                   returns, dtype=COVARIANCE_DTYPE)
+            covariance_accumulators[portfolio_id] = (tickers, accumulator)
+            cov = covariance_engine.shrink(accumulator.covariance(), float(shrinkage or 0))
+        tables = covariance_engine.tables_from_covariance(cov, tickers, weights, sectors)
+    return dict(data_dict, **{k: v for k, v in tables.items() if k not in data_dict})
+
+def build_current_data(data_dict, version=None, portfolio_id=None):
+    """Convert a raw portfolio_data.json document into DataFrames and arrays"""
+    data_dict = derive_risk_metrics(data_dict, portfolio_id)
+    data_dict = derive_risk_tables(data_dict, portfolio_id)
+    
+    # Convert to DataFrames and arrays
+    portfolio = pd.DataFrame(data_dict.get('portfolio', []))
+    
+    # Create port_vs_bench
+    comparison = pd.DataFrame(data_dict.get('comparison', []))
+    if not comparison.empty:
+        port_vs_bench = comparison.reset_index().rename(columns={'index': 'Metric'})
+        benchmark_col = [col for col in port_vs_bench.columns if 'Nifty' in col or 'Benchmark' in col]
+        if benchmark_col:
+            port_vs_bench = port_vs_bench.rename(columns={benchmark_col[0]: 'Benchmark'})
+    else:
+        port_vs_bench = pd.DataFrame()
+    
+    # Create sector_data
+    sector_dist = pd.DataFrame(data_dict.get('sector_dist', []))
+    if not sector_dist.empty:
+        sector_data = sector_dist.rename(columns={0: 'Weight', 'Sector': 'Sector'})
+        if 'Current Value' in sector_data.columns:
+            sector_data = sector_data.rename(columns={'Current Value': 'Weight'})
+    else:
+        sector_data = pd.DataFrame()
+    
+    # Other data
+    risk_summary = pd.DataFrame(data_dict.get('risk_summary', []))
+    nudges = data_dict.get('nudges', [])
+    corr_matrix = pd.DataFrame(data_dict.get('corr_matrix', []))
+    component_var_df = pd.DataFrame(data_dict.get('component_var_df', []))
+    sector_contrib_pct = pd.DataFrame(data_dict.get('sector_contrib_pct', []))
+    
+    # Compact copies on one shared ticker/sector index (see holdings_store.py);
+    # correlations are kept as a packed triangle, unpacked by correlation()
+    holdings_index = holdings_store.HoldingsStore(portfolio, corr_matrix, component_var_df, sector_contrib_pct)
+    portfolio = holdings_index.portfolio
+    component_var_df, sector_contrib_pct = holdings_index.component_var_df, holdings_index.sector_contrib_pct
+    if sector_data.empty:
+        sector_data = holdings_index.sector_weights()
+    
+    # Sector / asset type / tag totals, so group-by switches are lookups (see rollups.py)
+    rollup_cube = rollups.RollupCube(holdings_index, PORTFOLIO_TAGS)
+    
+    # Time series data (zero-copy views when loaded from a binary snapshot)
+    portfolio_returns = np.asarray(data_dict.get('portfolio_returns', []), dtype=float)
+    benchmark_returns = np.asarray(data_dict.get('benchmark_returns', []), dtype=float)
+    dates = data_dict.get('dates', [])
+    cum_port = np.asarray(data_dict.get('cum_port', []), dtype=float)
+    cum_bench = np.asarray(data_dict.get('cum_bench', []), dtype=float)
+    drawdown = np.asarray(data_dict.get('drawdown', []), dtype=float)
+    rolling_vol = np.asarray(data_dict.get('rolling_vol', []), dtype=float)
+    rolling_beta = np.asarray(data_dict.get('rolling_beta', []), dtype=float)
+    
+    # Risk metrics
+    var_threshold = data_dict.get('var_threshold', 0)
+    cvar_threshold = data_dict.get('cvar_threshold', 0)
+    max_drawdown = data_dict.get('max_drawdown', 0)
+    portfolio_vol_annual = data_dict.get('portfolio_vol_annual', 0)
+    beta_full = data_dict.get('beta_full', 0)
+    VaR_pct = data_dict.get('VaR_pct', 0)
+    CVaR_pct = data_dict.get('CVaR_pct', 0)
+    
+    data = {
+        'portfolio': portfolio,
+        'port_vs_bench': port_vs_bench,
+        'sector_data': sector_data,
+        'risk_summary': risk_summary,
+        'nudges': nudges,
+        'corr_matrix': holdings_index.corr_packed,
+        'corr_tickers': holdings_index.tickers[holdings_index.corr_codes].tolist(),
+        'portfolio_returns': portfolio_returns,
+        'benchmark_returns': benchmark_returns,
+        'dates': dates,
+        'date_index': downsample.as_datetime_index(dates) if len(dates) else np.array([], dtype=np.int64),
+        'var_threshold': var_threshold,
+        'cvar_threshold': cvar_threshold,
+        'cum_port': cum_port,
+        'cum_bench': cum_bench,
+        'drawdown': drawdown,
+        'rolling_vol': rolling_vol,
+        'rolling_beta': rolling_beta,
+        'max_drawdown': max_drawdown,
+        'portfolio_vol_annual': portfolio_vol_annual,
+        'beta_full': beta_full,
+        'VaR_pct': VaR_pct,
+        'CVaR_pct': CVaR_pct,
+        'component_var_df': component_var_df,
+        'sector_contrib_pct': sector_contrib_pct,
+        'holdings_index': holdings_index,
+        'rollups': rollup_cube,
+        'asset_covariance': data_dict.get('asset_covariance'),
+        'asset_covariance_tickers': data_dict.get('asset_covariance_tickers'),
+        'risk_window': RISK_WINDOW,
+        'version': version,
+        'loaded_at': datetime.now()
+    }
+    data['slices'] = slice_versions(data, DATA_SLICES)
+    return data
+
+# Every portfolio gets a conditional fetcher, a snapshot store shared by all
+# workers, and a slot in one memory-bounded LRU of parsed datasets
+registry = PortfolioRegistry(PORTFOLIO_SOURCES, build_current_data, EMPTY_DATA,
+                             max_bytes=PORTFOLIO_CACHE_BYTES, max_workers=PORTFOLIO_LOAD_WORKERS,
+                             keep_history=PORTFOLIO_HISTORY)
+metrics.register_cache('portfolios', registry.datasets)
+
+def get_portfolio_data(portfolio_id):
+    """Parsed data of the selected portfolio (the default one if none is selected)"""
+    return registry.get(portfolio_id or DEFAULT_PORTFOLIO)
+
+def load_data_from_github(portfolio_id=DEFAULT_PORTFOLIO):
+    """Load comprehensive data from the shared snapshot, fetching from GitHub if this worker is the writer"""
+    print(f"🔄 Loading comprehensive data for {portfolio_id} from GitHub...")
+    data = registry.load(portfolio_id)
+    if data is None:
+        print(f"❌ No snapshot available yet for {portfolio_id} - the background poller will keep trying")
+        return EMPTY_DATA
+    
+    print("✅ Comprehensive data loaded successfully!")
+    return data
+
+# Serve the default portfolio from the last local snapshot right away; the
+# poller fetches from GitHub in the background and the other portfolios are
+# warmed once the app is set up (see the end of this module), so a new worker
+# starts without touching the network
+if registry.load(DEFAULT_PORTFOLIO, fetch=False) is not None:
+    print(f"✅ Serving {DEFAULT_PORTFOLIO} from the local snapshot, refreshing in the background")
+else:
+    print(f"⏳ No local snapshot of {DEFAULT_PORTFOLIO} yet - fetching from GitHub in the background")
+registry.start()
+
+# Ticks from the price feed, coalesced to the latest price per ticker
+price_book, live_feed = None, None
+if PRICE_FEED:
+    import price_feed
+    price_book = price_feed.TickBook()
+    live_feed = price_feed.open_feed(PRICE_FEED, price_book)
+    live_feed.start()
+    print(f"📡 Streaming live prices from {PRICE_FEED}")
+
+# Nudge rules, re-evaluated per data version for the holdings whose inputs changed
+nudge_rules = nudge_engine.NudgeEngine()
 
 # Comprehensive dashboard layout
 app.layout = html.Div([
     html.H1("📈 Comprehensive Portfolio Performance Dashboard", style={"textAlign": "center"}),
     
-    # Refresh button
+    # Portfolio selector and refresh button
     html.Div([
+        dcc.Dropdown(
+            id='portfolio-selector',
+            options=[{'label': name, 'value': name} for name in PORTFOLIO_SOURCES],
+            value=DEFAULT_PORTFOLIO,
+            clearable=False,
+            style={'width': '320px', 'margin': '0 auto'}
+        ),
         html.Button('🔄 Refresh Data from GitHub', id='refresh-button', n_clicks=0,
                    style={'margin': '10px auto', 'padding': '10px 20px', 'fontSize': '16px', 'display': 'block'}),
         html.Div(id='refresh-status'),
+        html.Div(html.A("📄 Static report", href="/report", target="_blank"),
+                 style={'textAlign': 'center'}) if PRERENDER else html.Div(),
+        dcc.Interval(id='refresh-poll', interval=DATA_POLL_INTERVAL_MS),
+        dcc.Checklist(
+            id='live-toggle',
+            options=[{'label': ' Stream live prices' if live_feed else ' Stream live prices (no price feed configured)',
+                      'value': 'on', 'disabled': live_feed is None}],
+            value=[], style={'textAlign': 'center'}
+        ),
+        html.Div(id='live-status', style={'textAlign': 'center'}),
+        dcc.Interval(id='live-poll', interval=LIVE_POLL_INTERVAL_MS, disabled=True),
+        dcc.Store(id='live-rendered'),
+        # What the distribution charts were last drawn from, so live patches are re-applied after a redraw
+        dcc.Store(id='rendered-distribution'),
+        dcc.Store(id='data-version'),
+        html.Div([dcc.Store(id=f'slice-{name}') for name in DATA_SLICES]),
+        html.Div([dcc.Store(id=f'rendered-{name}') for name in LAZY_SECTIONS]),
     ], style={"marginBottom": "20px"}),
 
     # === SECTION 1: Performance Overview ===
@@ -152,128 +447,411 @@ app.layout = html.Div([
         dcc.Graph(id="bar-perf")
     ], style={"marginBottom": "40px"}),
 
-    # === SECTION 2: Portfolio Distribution Charts ===
-    html.Div([
-        html.Div([
-            dcc.Graph(id="ticker-weight-chart")
-        ], style={"width": "48%", "display": "inline-block"}),
-        html.Div([
-            dcc.Graph(id="sector-dist")
-        ], style={"width": "48%", "display": "inline-block", "float": "right"})
-    ]),
-    
-    html.Div([
-        html.Div([
-            dcc.Graph(id="pnl-dist")
-        ], style={"width": "48%", "display": "inline-block"}),
-        html.Div([
-            dcc.Graph(id="abs-contribution-chart")
-        ], style={"width": "48%", "display": "inline-block", "float": "right"})
-    ]),
-
-    # === SECTION 3: Risk Metrics ===
-    html.Div([
-        html.H2("Risk Metrics Overview", style={"textAlign": "center"}),
-        html.Div(id="risk-table-container")
-    ], style={"marginBottom": "40px"}),
+    # Everything below the performance chart sits in tabs; the heavier tabs
+    # are only built once opened (see LAZY_SECTIONS)
+    dcc.Tabs(id='dashboard-tabs', value='overview', children=[
+        dcc.Tab(label='Overview', value='overview', children=[
+            # === SECTION 2: Portfolio Distribution Charts ===
+            # Group-by and drill-down switches, answered from the precomputed rollups
+            html.Div([
+                html.Label("Group by:", style={'marginRight': '8px'}),
+                dcc.Dropdown(id='rollup-dimension', options=[{'label': d, 'value': d} for d in rollups.DIMENSIONS],
+                             placeholder='Holdings (no grouping)',
+                             style={'width': '240px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
+                html.Label("Drill into:", style={'margin': '0 8px 0 24px'}),
+                dcc.Dropdown(id='rollup-group', options=[], placeholder='All groups', disabled=True,
+                             style={'width': '280px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
+            ], style={"textAlign": "center", "margin": "20px 0"}),
 
-    # === SECTION 4: Comprehensive Risk Analysis ===
-    html.Div([
-        html.H2("Comprehensive Risk Analysis", style={"textAlign": "center"}),
-        
-        # Row 1: Correlation and Distribution
-        html.Div([
             html.Div([
-                dcc.Graph(id="correlation-heatmap")
-            ], style={"width": "48%", "display": "inline-block"}),
+                html.Div([
+                    dcc.Graph(id="ticker-weight-chart")
+                ], style={"width": "48%", "display": "inline-block"}),
+                html.Div([
+                    dcc.Graph(id="sector-dist")
+                ], style={"width": "48%", "display": "inline-block", "float": "right"})
+            ]),
+
             html.Div([
-                dcc.Graph(id="returns-distribution")
-            ], style={"width": "48%", "display": "inline-block", "float": "right"})
-        ]),
-        
-        # Row 2: Cumulative Returns and Drawdown
-        html.Div([
+                html.Div([
+                    dcc.Graph(id="pnl-dist")
+                ], style={"width": "48%", "display": "inline-block"}),
+                html.Div([
+                    dcc.Graph(id="abs-contribution-chart")
+                ], style={"width": "48%", "display": "inline-block", "float": "right"})
+            ]),
+
             html.Div([
-                dcc.Graph(id="cumulative-returns")
-            ], style={"width": "48%", "display": "inline-block"}),
+                html.H2("Portfolio Rollups", style={"textAlign": "center"}),
+                html.Div(id="rollup-table")
+            ], style={"marginBottom": "40px"}),
+
+            # === SECTION 3: Risk Metrics ===
             html.Div([
-                dcc.Graph(id="drawdown-chart")
-            ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                html.H2("Risk Metrics Overview", style={"textAlign": "center"}),
+                html.Div(id="risk-table-container")
+            ], style={"marginBottom": "40px"}),
+
+            # === SECTION 7: Nudges ===
+            html.Div([
+                html.H2("📬 Portfolio Nudges & Insights", style={"textAlign": "center"}),
+                html.Div(id="nudges-container")
+            ], style={"backgroundColor": "#f8f9fa", "padding": "25px", "borderRadius": "12px", "marginBottom": "40px"})
         ]),
-        
-        # Row 3: Rolling Metrics
-        html.Div([
+        dcc.Tab(label='Risk Analysis', value='risk', children=[
+            # === SECTION 4: Comprehensive Risk Analysis ===
             html.Div([
-                dcc.Graph(id="rolling-volatility")
-            ], style={"width": "48%", "display": "inline-block"}),
+                html.H2("Comprehensive Risk Analysis", style={"textAlign": "center"}),
+
+                # Row 1: Correlation and Distribution
+                html.Div([
+                    html.Div([
+                        dcc.Graph(id="correlation-heatmap")
+                    ], style={"width": "48%", "display": "inline-block"}),
+                    html.Div([
+                        dcc.Graph(id="returns-distribution")
+                    ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                ]),
+
+                # Row 2: Cumulative Returns and Drawdown
+                html.Div([
+                    html.Div([
+                        dcc.Graph(id="cumulative-returns")
+                    ], style={"width": "48%", "display": "inline-block"}),
+                    html.Div([
+                        dcc.Graph(id="drawdown-chart")
+                    ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                ]),
+
+                # Row 3: Rolling Metrics
+                html.Div([
+                    html.Div([
+                        dcc.Graph(id="rolling-volatility")
+                    ], style={"width": "48%", "display": "inline-block"}),
+                    html.Div([
+                        dcc.Graph(id="rolling-beta")
+                    ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                ]),
+
+                # Row 4: Recent Performance
+                html.Div([
+                    html.Div([
+                        dcc.Graph(id="recent-returns-2m")
+                    ], style={"width": "48%", "display": "inline-block"}),
+                    html.Div([
+                        dcc.Graph(id="recent-returns-1m")
+                    ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                ]),
+
+                # Row 5: Returns over any window
+                html.Div([
+                    html.H3("Returns over Any Window", style={"textAlign": "center"}),
+                    html.Div([
+                        dcc.Dropdown(
+                            id='returns-window',
+                            # The named windows are filled in when the tab first renders
+                            options=[{'label': 'Custom range', 'value': 'custom'}],
+                            value=None, clearable=False, placeholder='Window',
+                            style={'width': '180px', 'display': 'inline-block', 'verticalAlign': 'middle'}
+                        ),
+                        dcc.DatePickerRange(id='returns-range', display_format='YYYY-MM-DD',
+                                            style={'marginLeft': '20px', 'verticalAlign': 'middle'}),
+                    ], style={"textAlign": "center"}),
+                    html.Div(id='returns-window-summary'),
+                    dcc.Graph(id='returns-window-chart'),
+                    html.Div(id='returns-window-table')
+                ], style={"clear": "both"})
+            ], style={"marginBottom": "40px"})
+        ]),
+        dcc.Tab(label='Correlations', value='correlation', children=[
+            # === SECTION 5: Interactive Correlation Matrix ===
             html.Div([
-                dcc.Graph(id="rolling-beta")
-            ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                html.H2("Interactive Correlation Matrix", style={"textAlign": "center"}),
+                html.Div([
+                    html.Label("Minimum absolute correlation filter:"),
+                    dcc.Slider(
+                        id='corr-threshold-slider',
+                        min=0, max=1, step=0.05, value=0,
+                        marks={0: '0', 0.25: '0.25', 0.5: '0.5', 0.75: '0.75', 1: '1'},
+                    ),
+                    html.Label("Top correlated pairs to list:"),
+                    dcc.Input(id='corr-top-k', type='number', min=0, step=1, value=10),
+                ], style={"width": "60%", "margin": "auto"}),
+                dcc.Store(id='corr-payload'),
+                dcc.Graph(id="filtered-corr-heatmap"),
+                dash_table.DataTable(
+                    id='top-corr-pairs',
+                    columns=[{"name": c, "id": c} for c in ("Ticker A", "Ticker B", "Correlation")],
+                    style_table={"width": "60%", "margin": "auto"},
+                    style_cell={"textAlign": "center"},
+                    style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+                )
+            ], style={"marginBottom": "40px"})
         ]),
-        
-        # Row 4: Recent Performance
-        html.Div([
+        dcc.Tab(label='Risk Contribution', value='contribution', children=[
+            # === SECTION 6: Risk Contribution Analysis ===
             html.Div([
-                dcc.Graph(id="recent-returns-2m")
-            ], style={"width": "48%", "display": "inline-block"}),
+                html.H2("Risk Contribution Analysis", style={"textAlign": "center"}),
+                html.Div([
+                    html.Div([
+                        html.H3("Per-Asset Risk Contribution"),
+                        html.Div(id="asset-risk-table")
+                    ], style={"width": "48%", "display": "inline-block"}),
+                    html.Div([
+                        html.H3("Per-Sector Risk Contribution"),
+                        html.Div(id="sector-risk-table")
+                    ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                ])
+            ], style={"marginBottom": "40px"})
+        ]),
+        dcc.Tab(label='Monte Carlo', value='montecarlo', children=[
+            # === SECTION 6b: Monte Carlo VaR / CVaR and Stress Testing ===
             html.Div([
-                dcc.Graph(id="recent-returns-1m")
-            ], style={"width": "48%", "display": "inline-block", "float": "right"})
-        ])
-    ], style={"marginBottom": "40px"}),
-
-    # === SECTION 5: Interactive Correlation Matrix ===
-    html.Div([
-        html.H2("Interactive Correlation Matrix", style={"textAlign": "center"}),
-        html.Div([
-            html.Label("Minimum absolute correlation filter:"),
-            dcc.Slider(
-                id='corr-threshold-slider',
-                min=0, max=1, step=0.05, value=0,
-                marks={0: '0', 0.25: '0.25', 0.5: '0.5', 0.75: '0.75', 1: '1'},
-            )
-        ], style={"width": "60%", "margin": "auto"}),
-        dcc.Graph(id="filtered-corr-heatmap")
-    ], style={"marginBottom": "40px"}),
-
-    # === SECTION 6: Risk Contribution Analysis ===
-    html.Div([
-        html.H2("Risk Contribution Analysis", style={"textAlign": "center"}),
-        html.Div([
+                html.H2("Monte Carlo VaR / CVaR & Sector Stress Test", style={"textAlign": "center"}),
+                html.Div([
+                    html.Div([
+                        html.Label("Distribution:"),
+                        dcc.Dropdown(
+                            id='mc-distribution',
+                            options=[{'label': 'Multivariate normal', 'value': 'normal'},
+                                     {'label': 'Multivariate Student-t', 'value': 'student-t'},
+                                     {'label': 'Historical bootstrap', 'value': 'bootstrap'}],
+                            value='normal', clearable=False
+                        ),
+                        html.Label("Scenarios:"),
+                        # Left empty for the engine's defaults, shown once the first simulation runs
+                        dcc.Input(id='mc-scenarios', type='number', min=1000, max=MONTE_CARLO_MAX_SCENARIOS,
+                                  step=1000),
+                        html.Label("Confidence:"),
+                        dcc.Dropdown(id='mc-confidence', options=[{'label': f'{c:.1%}', 'value': c} for c in (0.9, 0.95, 0.975, 0.99)],
+                                     clearable=False),
+                        html.Label("Horizon (trading days):"),
+                        dcc.Input(id='mc-horizon', type='number', min=1, max=252, step=1),
+                        html.Label("Student-t degrees of freedom:"),
+                        dcc.Input(id='mc-dof', type='number', min=2.5, step=0.5),
+                    ], style={"width": "35%", "display": "inline-block", "verticalAlign": "top"}),
+                    html.Div([
+                        html.Label("Sector shocks (% return applied to every scenario):"),
+                        dash_table.DataTable(
+                            id='mc-shocks',
+                            columns=[{'name': 'Sector', 'id': 'Sector', 'editable': False},
+                                     {'name': 'Shock (%)', 'id': 'Shock', 'type': 'numeric', 'editable': True}],
+                            data=[],
+                            style_table={"maxHeight": "260px", "overflowY": "scroll"},
+                            style_cell={"textAlign": "center"},
+                            style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+                        ),
+                    ], style={"width": "60%", "display": "inline-block", "float": "right"}),
+                ]),
+                html.Button('🎲 Run Simulation', id='mc-run', n_clicks=0,
+                            style={'margin': '10px auto', 'padding': '10px 20px', 'display': 'block'}),
+                html.Div(id='mc-summary'),
+                dcc.Graph(id='mc-loss-distribution'),
+                html.H3("Tail (CVaR) Contribution by Holding"),
+                html.Div(id='mc-tail-table'),
+            ], style={"marginBottom": "40px"})
+        ]),
+        dcc.Tab(label='What-if', value='whatif', children=[
+            # === SECTION 6c: What-if Rebalancing ===
             html.Div([
-                html.H3("Per-Asset Risk Contribution"),
-                html.Div(id="asset-risk-table")
-            ], style={"width": "48%", "display": "inline-block"}),
+                html.H2("What-if Rebalancing", style={"textAlign": "center"}),
+                html.Div([
+                    html.Label("Holding:"),
+                    dcc.Dropdown(id='whatif-ticker', options=[], clearable=False),
+                    html.Label("Change in position size (%):"),
+                    dcc.Slider(id='whatif-change', min=-100, max=100, step=1, value=0, updatemode='drag',
+                               marks={v: f'{v:+d}%' if v else '0' for v in range(-100, 101, 25)},
+                               tooltip={'placement': 'bottom'}),
+                    dcc.RadioItems(
+                        id='whatif-mode',
+                        options=[{'label': ' Rescale the other holdings', 'value': 'pro-rata'},
+                                 {'label': ' Move the difference to cash', 'value': 'cash'}],
+                        value='pro-rata', inline=True
+                    ),
+                    html.Button('↩️ Reset', id='whatif-reset', n_clicks=0, style={'marginTop': '10px'}),
+                    dcc.Store(id='whatif-edits', data={}),
+                ], style={"width": "60%", "margin": "auto"}),
+                html.Div(id='whatif-summary', style={"width": "60%", "margin": "20px auto"}),
+                html.Div([
+                    html.Div([
+                        dcc.Graph(id='whatif-sector-chart')
+                    ], style={"width": "48%", "display": "inline-block"}),
+                    html.Div([
+                        html.H3("Largest Changes in Risk Contribution"),
+                        html.Div(id='whatif-asset-table')
+                    ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                ]),
+            ], style={"marginBottom": "40px"})
+        ]),
+        dcc.Tab(label='Holdings', value='holdings', children=[
+            # === SECTION 8: Detailed Portfolio Table ===
+            html.Div([
+                html.H2("Detailed Portfolio Table", style={"textAlign": "center"}),
+                html.Div(id="portfolio-table-container")
+            ])
+        ]),
+        dcc.Tab(label='History', value='history', children=[
+            # === SECTION 9: Time-travel Comparison ===
             html.Div([
-                html.H3("Per-Sector Risk Contribution"),
-                html.Div(id="sector-risk-table")
-            ], style={"width": "48%", "display": "inline-block", "float": "right"})
+                html.H2("Compare with an Earlier Snapshot", style={"textAlign": "center"}),
+                dcc.Dropdown(
+                    id='history-days',
+                    options=[{'label': f'{n} day{"s" if n > 1 else ""} ago', 'value': n} for n in (1, 7, 30, 90, 180, 365)],
+                    value=30, clearable=False,
+                    style={'width': '240px', 'margin': '0 auto'}
+                ),
+                html.Div(id='history-comparison')
+            ], style={"marginBottom": "40px"})
         ])
-    ], style={"marginBottom": "40px"}),
-
-    # === SECTION 7: Nudges ===
-    html.Div([
-        html.H2("📬 Portfolio Nudges & Insights", style={"textAlign": "center"}),
-        html.Div(id="nudges-container")
-    ], style={"backgroundColor": "#f8f9fa", "padding": "25px", "borderRadius": "12px", "marginBottom": "40px"}),
-
-    # === SECTION 8: Detailed Portfolio Table ===
-    html.Div([
-        html.H2("Detailed Portfolio Table", style={"textAlign": "center"}),
-        html.Div(id="portfolio-table-container")
     ])
 ])
 
-# Main callback to update all components
+# Refresh callback: publishes the data version and the slices that changed
 @app.callback(
     [Output('refresh-status', 'children'),
-     Output('bar-perf', 'figure'),
-     Output('ticker-weight-chart', 'figure'),
+     Output('data-version', 'data')] +
+    [Output(f'slice-{name}', 'data') for name in DATA_SLICES],
+    [Input('refresh-button', 'n_clicks'),
+     Input('refresh-poll', 'n_intervals'),
+     Input('portfolio-selector', 'value')],
+    [State('data-version', 'data')]
+)
+def update_all_components(n_clicks, n_intervals, portfolio_id, rendered):
+    # Never fetch here: the background poller owns the network I/O
+    registry.start()
+    portfolio_id = portfolio_id or DEFAULT_PORTFOLIO
+    if ctx.triggered_id == 'refresh-button':
+        registry.request_refresh(portfolio_id)
+    
+    data = get_portfolio_data(portfolio_id)
+    if PRERENDER:
+        # Page loads then fire section callbacks that find the prebuilt outputs
+        bundles.warm(portfolio_id, data)
+    rendered = rendered or {}
+    if (ctx.triggered_id == 'refresh-poll' and data['version'] == rendered.get('version')
+            and portfolio_id == rendered.get('portfolio')):
+        raise PreventUpdate
+    
+    # Status message
+    if ctx.triggered_id == 'refresh-button':
+        status_text = "🔄 Refresh requested - checking GitHub in the background..."
+        status_color = "#1f77b4"
+    elif ctx.triggered_id == 'portfolio-selector' and rendered:
+        status_text = f"📂 Showing {portfolio_id}"
+        status_color = "#1f77b4"
+    elif rendered:
+        status_text = "✅ Data refreshed from GitHub!"
+        status_color = "green"
+    else:
+        status_text = None
+    
+    status = html.Div([
+        html.H4(status_text, style={"color": status_color, "textAlign": "center"}),
+        html.P(f"Last updated: {data['loaded_at'].strftime('%Y-%m-%d %H:%M:%S')}", 
+               style={"textAlign": "center"})
+    ]) if status_text and data['loaded_at'] else html.Div()
+    
+    # Only slices whose content hash moved trigger their section callbacks
+    rendered_slices = rendered.get('slices', {})
+    slice_updates = [data['slices'][name] if data['slices'][name] != rendered_slices.get(name) else no_update
+                     for name in DATA_SLICES]
+    
+    return [status, {'portfolio': portfolio_id, 'version': data['version'], 'slices': data['slices']}] + slice_updates
+
+def _changed_slices():
+    """Names of the data slices that triggered the running section callback"""
+    return {prop_id.split('.')[0][len('slice-'):] for prop_id in ctx.triggered_prop_ids}
+
+def _if_changed(changed, slices, build):
+    return build() if changed & set(slices) else no_update
+
+def _stale_slices(section, active_tab, current, rendered):
+    """Slices a lazy section has not rendered yet; nothing is built unless its tab is open"""
+    if active_tab != LAZY_SECTIONS[section]:
+        raise PreventUpdate
+    rendered = rendered or {}
+    return {name for name, version in current.items() if version != rendered.get(name)}
+
+# === Per-section callbacks ===
+@app.callback(
+    Output('bar-perf', 'figure'),
+    Input('slice-performance', 'data'),
+    State('portfolio-selector', 'value'),
+    prevent_initial_call=True
+)
+def update_performance_section(_, portfolio_id):
+    return create_performance_figure(get_portfolio_data(portfolio_id))
+
+@app.callback(
+    [Output('ticker-weight-chart', 'figure'),
      Output('sector-dist', 'figure'),
      Output('pnl-dist', 'figure'),
      Output('abs-contribution-chart', 'figure'),
-     Output('risk-table-container', 'children'),
-     Output('correlation-heatmap', 'figure'),
+     Output('rendered-distribution', 'data')],
+    [Input('slice-holdings', 'data'),
+     Input('slice-sectors', 'data'),
+     Input('rollup-dimension', 'value'),
+     Input('rollup-group', 'value')],
+    State('portfolio-selector', 'value'),
+    prevent_initial_call=True
+)
+def update_distribution_section(holdings, sectors, dimension, group, portfolio_id):
+    data, changed = get_portfolio_data(portfolio_id), _changed_slices()
+    if {'rollup-dimension.value', 'rollup-group.value'} & set(ctx.triggered_prop_ids):
+        # Regrouping redraws every chart from the rollups
+        changed = {'holdings', 'sectors'}
+    if not dimension or group not in data['rollups'].groups(dimension):
+        group = None
+    # The ticker pie only changes when drilling into a group; the other charts follow the grouping
+    drill = (dimension, group) if group else ()
+    grouping = (dimension, group) if dimension else ()
+    return (_if_changed(changed, ['holdings'], lambda: create_ticker_weight_figure(data, *drill)),
+            _if_changed(changed, ['holdings'] if dimension else ['sectors'],
+                        lambda: create_sector_figure(data, *grouping[:1])),
+            _if_changed(changed, ['holdings'], lambda: create_pnl_figure(data, *grouping)),
+            _if_changed(changed, ['holdings'], lambda: create_abs_contribution_figure(data, *grouping)),
+            {'holdings': holdings, 'dimension': dimension, 'group': group})
+
+@app.callback(
+    [Output('rollup-group', 'options'),
+     Output('rollup-group', 'value'),
+     Output('rollup-group', 'disabled')],
+    [Input('rollup-dimension', 'value'),
+     Input('slice-holdings', 'data')],
+    [State('rollup-group', 'value'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_rollup_groups(dimension, _, group, portfolio_id):
+    if not dimension:
+        return [], None, True
+    groups = get_portfolio_data(portfolio_id)['rollups'].groups(dimension)
+    return [{'label': g, 'value': g} for g in groups], group if group in groups else None, False
+
+@app.callback(
+    Output('rollup-table', 'children'),
+    [Input('slice-holdings', 'data'),
+     Input('slice-risk_contrib', 'data'),
+     Input('rollup-dimension', 'value')],
+    State('portfolio-selector', 'value'),
+    prevent_initial_call=True
+)
+def update_rollup_section(_holdings, _risk_contrib, dimension, portfolio_id):
+    data = get_portfolio_data(portfolio_id)
+    # The ungrouped call matches the pre-rendered table's cache key
+    return create_rollup_table(data, dimension) if dimension else create_rollup_table(data)
+
+@app.callback(
+    Output('risk-table-container', 'children'),
+    Input('slice-risk_summary', 'data'),
+    State('portfolio-selector', 'value'),
+    prevent_initial_call=True
+)
+def update_risk_metrics_section(_, portfolio_id):
+    return create_risk_table(get_portfolio_data(portfolio_id))
+
+@app.callback(
+    [Output('correlation-heatmap', 'figure'),
      Output('returns-distribution', 'figure'),
      Output('cumulative-returns', 'figure'),
      Output('drawdown-chart', 'figure'),
@@ -281,50 +859,130 @@ app.layout = html.Div([
      Output('rolling-beta', 'figure'),
      Output('recent-returns-2m', 'figure'),
      Output('recent-returns-1m', 'figure'),
-     Output('asset-risk-table', 'children'),
-     Output('sector-risk-table', 'children'),
-     Output('nudges-container', 'children'),
-     Output('portfolio-table-container', 'children')],
-    [Input('refresh-button', 'n_clicks')]
+     Output('rendered-risk-analysis', 'data')],
+    [Input('slice-correlation', 'data'),
+     Input('slice-returns', 'data'),
+     Input('slice-timeseries', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-risk-analysis', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
 )
-def update_all_components(n_clicks):
-    global current_data
-    if n_clicks > 0:
-        current_data = load_data_from_github()
+def update_risk_analysis_section(correlation, returns, timeseries, tab, rendered, portfolio_id):
+    current = {'correlation': correlation, 'returns': returns, 'timeseries': timeseries}
+    changed = _stale_slices('risk-analysis', tab, current, rendered)
+    if not changed:
+        raise PreventUpdate
+    data = get_portfolio_data(portfolio_id)
+    return (_if_changed(changed, ['correlation'], lambda: create_correlation_heatmap(data)),
+            _if_changed(changed, ['returns'], lambda: create_returns_distribution(data)),
+            _if_changed(changed, ['timeseries'], lambda: create_cumulative_returns(data)),
+            _if_changed(changed, ['timeseries'], lambda: create_drawdown_chart(data)),
+            _if_changed(changed, ['timeseries'], lambda: create_rolling_volatility(data)),
+            _if_changed(changed, ['timeseries'], lambda: create_rolling_beta(data)),
+            _if_changed(changed, ['timeseries'], lambda: create_recent_returns(data, months=2)),
+            _if_changed(changed, ['timeseries'], lambda: create_recent_returns(data, months=1)),
+            current)
+
+@app.callback(
+    [Output('returns-window', 'value'),
+     Output('returns-window', 'options'),
+     Output('returns-range', 'start_date'),
+     Output('returns-range', 'end_date'),
+     Output('returns-range', 'min_date_allowed'),
+     Output('returns-range', 'max_date_allowed'),
+     Output('returns-window-summary', 'children'),
+     Output('returns-window-chart', 'figure'),
+     Output('returns-window-table', 'children'),
+     Output('rendered-returns-window', 'data')],
+    [Input('returns-window', 'value'),
+     Input('returns-range', 'start_date'),
+     Input('returns-range', 'end_date'),
+     Input('slice-timeseries', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-returns-window', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_returns_window_section(window, start_date, end_date, timeseries, tab, rendered, portfolio_id):
+    current = {'timeseries': timeseries}
+    picked = ctx.triggered_id in ('returns-window', 'returns-range')
+    if not _stale_slices('returns-window', tab, current, rendered) and not picked:
+        raise PreventUpdate
+    data = get_portfolio_data(portfolio_id)
+    index = returns_index(data)
+    if not len(index):
+        return ([no_update] * 6 + [html.P("No return history available", style={"textAlign": "center"}),
+                                   go.Figure(), None, current])
     
-    # Status message
-    status = html.Div([
-        html.H4("✅ Data refreshed from GitHub!", style={"color": "green", "textAlign": "center"}),
-        html.P(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 
-               style={"textAlign": "center"})
-    ]) if n_clicks > 0 else html.Div()
-    
-    # Create all figures
-    bar_fig = create_performance_figure(current_data)
-    ticker_weight_fig = create_ticker_weight_figure(current_data)
-    sector_fig = create_sector_figure(current_data)
-    pnl_fig = create_pnl_figure(current_data)
-    abs_contribution_fig = create_abs_contribution_figure(current_data)
-    risk_table = create_risk_table(current_data)
-    correlation_fig = create_correlation_heatmap(current_data)
-    returns_dist_fig = create_returns_distribution(current_data)
-    cumulative_fig = create_cumulative_returns(current_data)
-    drawdown_fig = create_drawdown_chart(current_data)
-    rolling_vol_fig = create_rolling_volatility(current_data)
-    rolling_beta_fig = create_rolling_beta(current_data)
-    recent_2m_fig = create_recent_returns(current_data, months=2)
-    recent_1m_fig = create_recent_returns(current_data, months=1)
-    asset_risk_table = create_asset_risk_table(current_data)
-    sector_risk_table = create_sector_risk_table(current_data)
-    nudges_list = create_nudges_list(current_data)
-    portfolio_table = create_portfolio_table(current_data)
-    
-    return (status, bar_fig, ticker_weight_fig, sector_fig, pnl_fig, abs_contribution_fig, 
-            risk_table, correlation_fig, returns_dist_fig, cumulative_fig, drawdown_fig,
-            rolling_vol_fig, rolling_beta_fig, recent_2m_fig, recent_1m_fig,
-            asset_risk_table, sector_risk_table, nudges_list, portfolio_table)
+    # Picking dates by hand switches to a custom range; a named window sets the dates
+    if ctx.triggered_id == 'returns-range':
+        window = 'custom'
+    if window == 'custom' and start_date and end_date:
+        span = index.date_span(start_date, end_date)
+        stats = index.stats(*span)
+        start_date, end_date = no_update, no_update
+    else:
+        window = window if window not in (None, 'custom') else 'YTD'
+        span = index.window_span(window)
+        stats = index.stats(*span)
+        if stats['points']:
+            start_date, end_date = f"{stats['start']:%Y-%m-%d}", f"{stats['end']:%Y-%m-%d}"
+    
+    first, last = (f"{pd.Timestamp(index.date_index[k]):%Y-%m-%d}" for k in (0, -1))
+    import returns_query
+    options = [{'label': w, 'value': w} for w in returns_query.WINDOWS] + [{'label': 'Custom range', 'value': 'custom'}]
+    return (window, options, start_date, end_date, first, last, create_returns_window_summary(stats),
+            create_window_returns_figure(data, *span), create_returns_window_table(data), current)
+
+@app.callback(
+    [Output('asset-risk-table', 'children'),
+     Output('sector-risk-table', 'children'),
+     Output('rendered-risk-contribution', 'data')],
+    [Input('slice-risk_contrib', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-risk-contribution', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_risk_contribution_section(risk_contrib, tab, rendered, portfolio_id):
+    current = {'risk_contrib': risk_contrib}
+    if not _stale_slices('risk-contribution', tab, current, rendered):
+        raise PreventUpdate
+    data = get_portfolio_data(portfolio_id)
+    return create_asset_risk_table(data), create_sector_risk_table(data), current
+
+@app.callback(
+    Output('nudges-container', 'children'),
+    [Input('slice-nudges', 'data'),
+     Input('slice-holdings', 'data'),
+     Input('slice-sectors', 'data'),
+     Input('slice-risk_contrib', 'data')],
+    State('portfolio-selector', 'value'),
+    prevent_initial_call=True
+)
+def update_nudges_section(_nudges, _holdings, _sectors, _risk_contrib, portfolio_id):
+    return create_nudges_list(get_portfolio_data(portfolio_id))
+
+@app.callback(
+    [Output('portfolio-table-container', 'children'),
+     Output('rendered-portfolio-table', 'data')],
+    [Input('slice-holdings', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-portfolio-table', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_portfolio_table_section(holdings, tab, rendered, portfolio_id):
+    current = {'holdings': holdings}
+    if not _stale_slices('portfolio-table', tab, current, rendered):
+        raise PreventUpdate
+    return create_portfolio_table(get_portfolio_data(portfolio_id)), current
 
 # Chart creation functions
+@memoize_by_slices(figure_cache, 'performance')
+@metrics.timed_builder
+@payload.compact_figures
 def create_performance_figure(data):
     port_vs_bench = data['port_vs_bench']
     if port_vs_bench.empty or 'Metric' not in port_vs_bench.columns:
@@ -339,8 +997,22 @@ def create_performance_figure(data):
     fig.update_layout(barmode='group', title="Portfolio vs. Nifty (^NSEI) Performance", height=450)
     return fig
 
-def create_ticker_weight_figure(data):
-    portfolio = data['portfolio']
+def distribution_frame(data, dimension=None, group=None):
+    """(rows, label column) a distribution chart plots: every holding, one group's holdings, or group totals"""
+    if dimension and group:
+        return data['rollups'].members(dimension, group), 'Ticker'
+    if dimension:
+        return data['rollups'].table(dimension), dimension
+    return data['portfolio'], 'Ticker'
+
+def _in_group(group):
+    return f" in {group}" if group else ""
+
+@memoize_by_slices(figure_cache, 'holdings')
+@metrics.timed_builder
+@payload.compact_figures
+def create_ticker_weight_figure(data, dimension=None, group=None):
+    portfolio, _ = distribution_frame(data, dimension, group)
     if portfolio.empty or 'Ticker' not in portfolio.columns or 'Weight' not in portfolio.columns:
         return go.Figure().update_layout(title="No portfolio data available")
     
@@ -350,64 +1022,96 @@ def create_ticker_weight_figure(data):
         hole=0.3,
         textinfo='label+percent'
     )])
-    fig.update_layout(title="Portfolio Weight by Ticker", height=450)
+    fig.update_layout(title=f"Portfolio Weight by Ticker{_in_group(group)}", height=450)
     return fig
 
-def create_sector_figure(data):
-    sector_data = data['sector_data']
-    if sector_data.empty or 'Sector' not in sector_data.columns or 'Weight' not in sector_data.columns:
+@memoize_by_slices(figure_cache, 'sectors', 'holdings')
+@metrics.timed_builder
+@payload.compact_figures
+def create_sector_figure(data, dimension=None):
+    # Ungrouped, the shipped sector distribution; grouped, the rollup of the holdings' weights
+    sector_data, label = (data['rollups'].table(dimension), dimension) if dimension else (data['sector_data'], 'Sector')
+    if sector_data.empty or label not in sector_data.columns or 'Weight' not in sector_data.columns:
         return go.Figure().update_layout(title="No sector data available")
     
     fig = go.Figure(data=[go.Pie(
-        labels=sector_data["Sector"], 
+        labels=sector_data[label], 
         values=sector_data["Weight"], 
         hole=0.2
     )])
-    fig.update_layout(title="Portfolio Weight by Sector", height=450)
+    fig.update_layout(title=f"Portfolio Weight by {label}", height=450)
     return fig
 
-def create_pnl_figure(data):
-    portfolio = data['portfolio']
+@memoize_by_slices(figure_cache, 'holdings')
+@metrics.timed_builder
+@payload.compact_figures
+def create_pnl_figure(data, dimension=None, group=None):
+    portfolio, label = distribution_frame(data, dimension, group)
     if portfolio.empty or 'Unrealized P&L' not in portfolio.columns:
         return go.Figure().update_layout(title="No P&L data available")
     
-    x_data = portfolio['Ticker'] if 'Ticker' in portfolio.columns else portfolio.index
+    x_data = portfolio[label] if label in portfolio.columns else portfolio.index
     fig = go.Figure(data=[go.Bar(
         x=x_data, 
         y=portfolio["Unrealized P&L"], 
         marker_color="teal"
     )])
-    fig.update_layout(title="Unrealized P&L by Ticker", height=450)
+    fig.update_layout(title=f"Unrealized P&L by {label}{_in_group(group)}", height=450)
     return fig
 
-def create_abs_contribution_figure(data):
-    portfolio = data['portfolio']
+@memoize_by_slices(figure_cache, 'holdings')
+@metrics.timed_builder
+@payload.compact_figures
+def create_abs_contribution_figure(data, dimension=None, group=None):
+    portfolio, label = distribution_frame(data, dimension, group)
     if portfolio.empty or '1W Abs Change' not in portfolio.columns or '1M Abs Change' not in portfolio.columns:
         return go.Figure().update_layout(title="No absolute contribution data available")
     
     fig = go.Figure()
     fig.add_trace(go.Bar(
         name="1W Abs Change", 
-        y=portfolio['Ticker'] if 'Ticker' in portfolio.columns else portfolio.index,
+        y=portfolio[label] if label in portfolio.columns else portfolio.index,
         x=portfolio['1W Abs Change'],
         orientation='h',
         marker_color='lightblue'
     ))
     fig.add_trace(go.Bar(
         name="1M Abs Change", 
-        y=portfolio['Ticker'] if 'Ticker' in portfolio.columns else portfolio.index,
+        y=portfolio[label] if label in portfolio.columns else portfolio.index,
         x=portfolio['1M Abs Change'],
         orientation='h',
         marker_color='darkblue'
     ))
     fig.update_layout(
-        title="Absolute Contribution (1W & 1M)",
+        title=f"Absolute Contribution (1W & 1M){_in_group(group)}",
         barmode='group',
         height=500,
         xaxis_title="₹ Change"
     )
     return fig
 
+@memoize_by_slices(figure_cache, 'holdings', 'risk_contrib')
+@metrics.timed_builder
+def create_rollup_table(data, dimension=ROLLUP_DEFAULT_DIMENSION):
+    table = data['rollups'].table(dimension)
+    if table.empty:
+        return html.P("No holdings to roll up", style={"textAlign": "center"})
+    
+    percent = FormatTemplate.percentage(2)
+    amount = Format(precision=2, scheme=Scheme.fixed, group=Group.yes)
+    formats = {'Weight': percent, rollups.RISK_MEASURE: percent}
+    return dash_table.DataTable(
+        data=table.to_dict("records"),
+        columns=[{"name": c, "id": c} for c in table.columns[:2]] +
+                [{"name": c, "id": c, "type": "numeric", "format": formats.get(c, amount)} for c in table.columns[2:]],
+        sort_action='native',
+        style_table={"overflowX": "scroll"},
+        style_cell={"textAlign": "center", "fontSize": 12},
+        style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+    )
+
+@memoize_by_slices(figure_cache, 'risk_summary')
+@metrics.timed_builder
 def create_risk_table(data):
     risk_summary = data['risk_summary']
     if risk_summary.empty:
@@ -421,18 +1125,15 @@ def create_risk_table(data):
         style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
     )
 
+@memoize_by_slices(figure_cache, 'correlation')
+@metrics.timed_builder
+@payload.compact_figures
 def create_correlation_heatmap(data):
-    corr_matrix = data['corr_matrix']
-    if corr_matrix.empty:
+    if not len(data['corr_tickers']):
         return go.Figure().update_layout(title="No correlation data available")
     
-    # Get ticker names from columns (excluding the first column if it's index)
-    if 'index' in corr_matrix.columns:
-        tickers = corr_matrix['index'].tolist()
-        corr_values = corr_matrix.drop('index', axis=1).values
-    else:
-        tickers = corr_matrix.columns.tolist()
-        corr_values = corr_matrix.values
+    # Plotly copies z on assignment, so unpack at the stored float32 precision
+    tickers, corr_values = data['holdings_index'].correlation(np.float32)
     
     fig = go.Figure(data=go.Heatmap(
         z=corr_values,
@@ -445,6 +1146,9 @@ def create_correlation_heatmap(data):
     fig.update_layout(title="Correlation Matrix", height=500)
     return fig
 
+@memoize_by_slices(figure_cache, 'returns')
+@metrics.timed_builder
+@payload.compact_figures
 def create_returns_distribution(data):
     portfolio_returns = data['portfolio_returns']
     if len(portfolio_returns) == 0:
@@ -467,6 +1171,59 @@ def create_returns_distribution(data):
     fig.update_layout(title="Portfolio Return Distribution (historical)", height=400)
     return fig
 
+@memoize_by_slices(figure_cache, 'timeseries')
+def returns_index(data):
+    """Prefix products and sums for O(log n) window queries (see returns_query.py)"""
+    import returns_query
+    return returns_query.ReturnsIndex(data['date_index'], data['cum_port'], data['cum_bench'])
+
+def window_source(data, span):
+    """Cumulative series over points i..j-1, from the close before the window, with their rebasing divisors"""
+    i, j = span
+    start = max(i - 1, 0)
+    return (data['dates'][start:j], data['date_index'][start:j],
+            [data['cum_port'][start:j], data['cum_bench'][start:j]], returns_index(data).bases(i))
+
+def timeseries_source(data, graph_id):
+    """Full-resolution (dates, date_index, [y series], divisors or None) behind a time-series graph"""
+    dates, date_index = data['dates'], data['date_index']
+    if graph_id == 'cumulative-returns':
+        return dates, date_index, [data['cum_port'], data['cum_bench']], None
+    if graph_id == 'drawdown-chart':
+        return dates, date_index, [data['drawdown']], None
+    if graph_id == 'rolling-volatility':
+        return dates, date_index, [data['rolling_vol']], None
+    if graph_id == 'rolling-beta':
+        return dates, date_index, [data['rolling_beta']], None
+    
+    # recent-returns-<n>m: the last n calendar months, rebased to 1
+    months = int(graph_id[len('recent-returns-'):-1])
+    return window_source(data, returns_index(data).window_span(f'{months}M'))
+
+def downsampled_series(data, graph_id, x_range=None):
+    """Dates and y series of a graph, cut to x_range and reduced to its point budget"""
+    return downsample_source(timeseries_source(data, graph_id), TIMESERIES_POINT_BUDGETS.get(graph_id, 500), x_range)
+
+def downsample_source(source, budget, x_range=None):
+    dates, date_index, ys, bases = source
+    start, stop = 0, len(date_index)
+    if x_range is not None:
+        start, stop = np.searchsorted(date_index, x_range[0], side='left'), np.searchsorted(date_index, x_range[1], side='right')
+        # Keep one point either side so lines run to the edge of the view
+        start, stop = max(start - 1, 0), min(stop + 1, len(date_index))
+    
+    indices = start + downsample.select_indices(date_index[start:stop], [y[start:stop] for y in ys],
+                                                budget, DOWNSAMPLE_METHOD)
+    ys = [np.asarray(y)[indices] for y in ys]
+    # Rebasing scales a whole series, which does not change the points picked,
+    # so only the picked points are divided
+    if bases is not None:
+        ys = [y / base for y, base in zip(ys, bases)]
+    return np.asarray(dates)[indices], ys
+
+@memoize_by_slices(figure_cache, 'timeseries')
+@metrics.timed_builder
+@payload.compact_figures
 def create_cumulative_returns(data):
     cum_port = data['cum_port']
     cum_bench = data['cum_bench']
@@ -475,12 +1232,18 @@ def create_cumulative_returns(data):
     if len(cum_port) == 0 or len(cum_bench) == 0 or len(dates) == 0:
         return go.Figure().update_layout(title="No cumulative returns data available")
     
+    x, (cum_port, cum_bench) = downsampled_series(data, 'cumulative-returns')
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=dates, y=cum_port, name="Portfolio", line=dict(width=2)))
-    fig.add_trace(go.Scatter(x=dates, y=cum_bench, name="^NSEI", line=dict(width=2)))
-    fig.update_layout(title="Cumulative Returns: Portfolio vs ^NSEI", height=400)
+    fig.add_trace(go.Scatter(x=x, y=cum_port, name="Portfolio", line=dict(width=2)))
+    fig.add_trace(go.Scatter(x=x, y=cum_bench, name="^NSEI", line=dict(width=2)))
+    # Filled in by the live price stream (see update_live_prices)
+    fig.add_trace(go.Scatter(x=[], y=[], name="Portfolio (live)", line=dict(width=2, dash="dot", color="#1f77b4")))
+    fig.update_layout(title="Cumulative Returns: Portfolio vs ^NSEI", height=400, uirevision='zoom')
     return fig
 
+@memoize_by_slices(figure_cache, 'timeseries')
+@metrics.timed_builder
+@payload.compact_figures
 def create_drawdown_chart(data):
     drawdown = data['drawdown']
     dates = data['dates']
@@ -489,12 +1252,18 @@ def create_drawdown_chart(data):
     if len(drawdown) == 0 or len(dates) == 0:
         return go.Figure().update_layout(title="No drawdown data available")
     
+    x, (drawdown,) = downsampled_series(data, 'drawdown-chart')
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=dates, y=drawdown, name="Drawdown", line=dict(color="firebrick", width=2)))
+    fig.add_trace(go.Scatter(x=x, y=drawdown, name="Drawdown", line=dict(color="firebrick", width=2)))
+    fig.add_trace(go.Scatter(x=[], y=[], name="Drawdown (live)", showlegend=False,
+                             line=dict(color="firebrick", width=2, dash="dot")))
     fig.add_hline(y=0, line_dash="dash", line_color="black")
-    fig.update_layout(title=f"Drawdown (Max = {max_drawdown:.2%})", height=400)
+    fig.update_layout(title=f"Drawdown (Max = {max_drawdown:.2%})", height=400, uirevision='zoom')
     return fig
 
+@memoize_by_slices(figure_cache, 'timeseries')
+@metrics.timed_builder
+@payload.compact_figures
 def create_rolling_volatility(data):
     rolling_vol = data['rolling_vol']
     dates = data['dates']
@@ -503,13 +1272,18 @@ def create_rolling_volatility(data):
     if len(rolling_vol) == 0 or len(dates) == 0:
         return go.Figure().update_layout(title="No volatility data available")
     
+    x, (rolling_vol,) = downsampled_series(data, 'rolling-volatility')
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=dates, y=rolling_vol, name="Rolling 60D Vol"))
+    window = data['risk_window']
+    fig.add_trace(go.Scatter(x=x, y=rolling_vol, name=f"Rolling {window}D Vol"))
     fig.add_hline(y=portfolio_vol_annual, line_dash="dash", line_color="black", 
                   annotation_text=f"Full-period Vol = {portfolio_vol_annual:.2%}")
-    fig.update_layout(title="Rolling 60D Annualized Volatility", height=400)
+    fig.update_layout(title=f"Rolling {window}D Annualized Volatility", height=400, uirevision='zoom')
     return fig
 
+@memoize_by_slices(figure_cache, 'timeseries')
+@metrics.timed_builder
+@payload.compact_figures
 def create_rolling_beta(data):
     rolling_beta = data['rolling_beta']
     dates = data['dates']
@@ -518,13 +1292,18 @@ def create_rolling_beta(data):
     if len(rolling_beta) == 0 or len(dates) == 0:
         return go.Figure().update_layout(title="No beta data available")
     
+    x, (rolling_beta,) = downsampled_series(data, 'rolling-beta')
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=dates, y=rolling_beta, name="Rolling 60D Beta"))
+    window = data['risk_window']
+    fig.add_trace(go.Scatter(x=x, y=rolling_beta, name=f"Rolling {window}D Beta"))
     fig.add_hline(y=beta_full, line_dash="dash", line_color="black", 
                   annotation_text=f"Full-period Beta = {beta_full:.2f}")
-    fig.update_layout(title="Rolling 60D Beta vs ^NSEI", height=400)
+    fig.update_layout(title=f"Rolling {window}D Beta vs ^NSEI", height=400, uirevision='zoom')
     return fig
 
+@memoize_by_slices(figure_cache, 'timeseries')
+@metrics.timed_builder
+@payload.compact_figures
 def create_recent_returns(data, months=2):
     cum_port = data['cum_port']
     cum_bench = data['cum_bench']
@@ -533,104 +1312,783 @@ def create_recent_returns(data, months=2):
     if len(cum_port) == 0 or len(cum_bench) == 0 or len(dates) == 0:
         return go.Figure().update_layout(title="No recent returns data available")
     
-    # Take last n points (approximate for months)
-    n_points = min(len(dates), 21 * months)  # Approximate business days
-    recent_dates = dates[-n_points:]
-    recent_port = cum_port[-n_points:]
-    recent_bench = cum_bench[-n_points:]
-    
-    # Rebase to 1
-    recent_port = recent_port / recent_port[0]
-    recent_bench = recent_bench / recent_bench[0]
+    recent_dates, (recent_port, recent_bench) = downsampled_series(data, f'recent-returns-{months}m')
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=recent_dates, y=recent_port, name="Portfolio", line=dict(width=2)))
     fig.add_trace(go.Scatter(x=recent_dates, y=recent_bench, name="^NSEI", line=dict(width=2)))
-    fig.update_layout(title=f"Cumulative Returns (Last {months} Month{'s' if months > 1 else ''}): Portfolio vs ^NSEI", height=400)
+    fig.update_layout(title=f"Cumulative Returns (Last {months} Month{'s' if months > 1 else ''}): Portfolio vs ^NSEI", height=400,
+                      uirevision='zoom')
     return fig
 
+# Server-side paged tables: only the visible page is sent to the browser
+def paged_table(table_id, index, **style):
+    """DataTable in custom paging/sort/filter mode showing the first page of index"""
+    records, page_count = index.page(0, TABLE_PAGE_SIZE)
+    return dash_table.DataTable(
+        id=table_id,
+        data=records,
+        columns=index.columns(),
+        page_action='custom',
+        page_current=0,
+        page_size=TABLE_PAGE_SIZE,
+        page_count=page_count,
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        **style
+    )
+
+@memoize_by_slices(figure_cache, 'risk_contrib')
+@metrics.timed_builder
+def asset_risk_table_index(data):
+    from table_index import TableIndex
+    return TableIndex(data['component_var_df'])
+
+@memoize_by_slices(figure_cache, 'risk_contrib')
+@metrics.timed_builder
+def sector_risk_table_index(data):
+    from table_index import TableIndex
+    return TableIndex(data['sector_contrib_pct'])
+
+@memoize_by_slices(figure_cache, 'holdings')
+@metrics.timed_builder
+def portfolio_table_index(data):
+    from table_index import TableIndex
+    return TableIndex(data['portfolio'], decimals=3)
+
+@memoize_by_slices(figure_cache, 'risk_contrib')
+@metrics.timed_builder
 def create_asset_risk_table(data):
     component_var_df = data['component_var_df']
     if component_var_df.empty:
         return html.P("No asset risk data available", style={"textAlign": "center"})
     
-    return dash_table.DataTable(
-        data=component_var_df.to_dict("records"),
-        columns=[{"name": i, "id": i} for i in component_var_df.columns],
+    return paged_table(
+        'asset-risk-datatable', asset_risk_table_index(data),
         style_table={"overflowX": "scroll", "maxHeight": "400px"},
         style_cell={"textAlign": "center", "fontSize": 12},
         style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
     )
 
+@memoize_by_slices(figure_cache, 'risk_contrib')
+@metrics.timed_builder
 def create_sector_risk_table(data):
     sector_contrib_pct = data['sector_contrib_pct']
     if sector_contrib_pct.empty:
         return html.P("No sector risk data available", style={"textAlign": "center"})
     
-    return dash_table.DataTable(
-        data=sector_contrib_pct.to_dict("records"),
-        columns=[{"name": i, "id": i} for i in sector_contrib_pct.columns],
+    return paged_table(
+        'sector-risk-datatable', sector_risk_table_index(data),
         style_table={"overflowX": "scroll", "maxHeight": "400px"},
         style_cell={"textAlign": "center", "fontSize": 12},
         style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
     )
 
+def nudge_tables(data):
+    """Holdings and sector tables the nudge rules run on, with risk shares next to weights"""
+    store = data['holdings_index']
+    holdings = data['portfolio']
+    if 'ComponentVarPct' in data['component_var_df'].columns:
+        holdings = holdings.assign(ComponentVarPct=store.by_ticker(
+            data['component_var_df'], 'ComponentVarPct', store.holding_codes, fill=np.nan))
+    sectors = data['sector_data']
+    risk = data['sector_contrib_pct']
+    if not sectors.empty and 'ComponentVar' in risk.columns:
+        by_sector = np.full(len(store.sectors) + 1, np.nan)  # Last slot catches unknown sectors
+        codes = store.codes(risk, 'Sector')
+        by_sector[codes[codes >= 0]] = risk['ComponentVar'].to_numpy(dtype=float)[codes >= 0]
+        sector_codes = store.sectors.get_indexer(sectors['Sector'].astype(object))
+        sectors = sectors.assign(Risk=by_sector[np.where(sector_codes >= 0, sector_codes, len(store.sectors))])
+    return {'holdings': holdings, 'sectors': sectors}
+
+@memoize_by_slices(figure_cache, 'nudges', 'holdings', 'sectors', 'risk_contrib')
+@metrics.timed_builder
 def create_nudges_list(data):
-    nudges = data['nudges']
-    if not nudges:
+    items = nudge_rules.generate(nudge_tables(data), data['nudges'])
+    if not items:
         return html.P("No nudges available", style={"textAlign": "center"})
     
-    return html.Ul([html.Li(n, style={"fontSize": "18px", "margin": "6px 0"}) for n in nudges])
+    return html.Ul([html.Li(n, style={"fontSize": "18px", "margin": "6px 0"}) for n in items])
 
+@memoize_by_slices(figure_cache, 'holdings')
+@metrics.timed_builder
 def create_portfolio_table(data):
     portfolio = data['portfolio']
     if portfolio.empty:
         return html.P("No portfolio data available", style={"textAlign": "center"})
     
-    return dash_table.DataTable(
-        data=portfolio.round(3).to_dict("records"),
-        columns=[{"name": i, "id": i} for i in portfolio.columns],
+    return paged_table(
+        'portfolio-datatable', portfolio_table_index(data),
         style_table={"overflowX": "scroll", "maxHeight": "600px"},
         style_cell={"textAlign": "center", "minWidth": "120px"},
         style_header={"backgroundColor": "#f4f4f4", "fontWeight": "bold"}
     )
 
-# Interactive correlation matrix callback
+def create_returns_window_summary(stats):
+    if not stats['points']:
+        return html.P("No data points in the selected range", style={"textAlign": "center"})
+    
+    color = "green" if stats['excess_return'] >= 0 else "firebrick"
+    return html.P(
+        f"{stats['start']:%Y-%m-%d} to {stats['end']:%Y-%m-%d} ({stats['points']} points): "
+        f"Portfolio {stats['portfolio_return']:+.2%} vs ^NSEI {stats['benchmark_return']:+.2%} - "
+        f"excess {stats['excess_return']:+.2%}, relative {stats['relative_return']:+.2%}, "
+        f"volatility {stats['portfolio_vol']:.2%} (annualized)",
+        style={"textAlign": "center", "fontSize": "16px", "color": color}
+    )
+
+@memoize_by_slices(figure_cache, 'timeseries')
+@metrics.timed_builder
+@payload.compact_figures
+def create_window_returns_figure(data, i, j):
+    if j <= i or len(data['cum_bench']) == 0:
+        return go.Figure().update_layout(title="No returns in the selected range")
+    
+    x, (port, bench) = downsample_source(window_source(data, (i, j)), WINDOW_CHART_POINT_BUDGET)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=port, name="Portfolio", line=dict(width=2)))
+    fig.add_trace(go.Scatter(x=x, y=bench, name="^NSEI", line=dict(width=2)))
+    fig.update_layout(title="Cumulative Returns over the Selected Window: Portfolio vs ^NSEI", height=400)
+    return fig
+
+@memoize_by_slices(figure_cache, 'timeseries')
+@metrics.timed_builder
+def create_returns_window_table(data):
+    summary = returns_index(data).summary()
+    rows = [{
+        'Window': row['window'],
+        'From': f"{row['start']:%Y-%m-%d}" if row['points'] else '-',
+        'To': f"{row['end']:%Y-%m-%d}" if row['points'] else '-',
+        'Portfolio': f"{row['portfolio_return']:+.2%}",
+        '^NSEI': f"{row['benchmark_return']:+.2%}",
+        'Excess': f"{row['excess_return']:+.2%}",
+        'Volatility (ann.)': f"{row['portfolio_vol']:.2%}",
+    } for row in summary.to_dict('records')]
+    return dash_table.DataTable(
+        data=rows,
+        columns=[{"name": c, "id": c} for c in ('Window', 'From', 'To', 'Portfolio', '^NSEI', 'Excess', 'Volatility (ann.)')],
+        style_table={"width": "70%", "margin": "auto"},
+        style_cell={"textAlign": "center"},
+        style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+    )
+
+# Zoom-aware downsampling: re-query the visible range at full point budget
+def update_zoomed_series(relayout_data, portfolio_id, graph_id):
+    data = get_portfolio_data(portfolio_id)
+    x_range = downsample.parse_x_range(relayout_data)
+    if x_range is None or len(data['date_index']) == 0:
+        raise PreventUpdate
+    
+    x, ys = downsampled_series(data, graph_id, None if x_range == 'auto' else x_range)
+    patched = Patch()
+    for i, y in enumerate(ys):
+        patched['data'][i]['x'] = x
+        patched['data'][i]['y'] = payload.typed_array(y)
+    return patched
+
+for _graph_id in TIMESERIES_POINT_BUDGETS:
+    app.callback(
+        Output(_graph_id, 'figure', allow_duplicate=True),
+        Input(_graph_id, 'relayoutData'),
+        State('portfolio-selector', 'value'),
+        prevent_initial_call=True
+    )(lambda relayout_data, portfolio_id, graph_id=_graph_id: update_zoomed_series(relayout_data, portfolio_id, graph_id))
+
+# Live prices: one re-valued copy of each snapshot, refreshed from the tick
+# book on every poll; browsers get Patches of the changed arrays only
+@memoize_by_slices(figure_cache, 'holdings', 'timeseries')
+def live_portfolio(data):
+    portfolio = data['portfolio']
+    if portfolio.empty or 'Ticker' not in portfolio.columns:
+        return None
+    import price_feed
+    return price_feed.LivePortfolio(portfolio, data['cum_port'], data['drawdown'])
+
 @app.callback(
-    Output('filtered-corr-heatmap', 'figure'),
-    Input('corr-threshold-slider', 'value')
+    Output('live-poll', 'disabled'),
+    Input('live-toggle', 'value'),
+    prevent_initial_call=True
 )
-def update_corr_heatmap(threshold):
-    corr_matrix = current_data['corr_matrix']
-    if corr_matrix.empty:
-        return go.Figure().update_layout(title="No correlation data available")
+def toggle_live_prices(value):
+    return live_feed is None or 'on' not in (value or [])
+
+@app.callback(
+    [Output('ticker-weight-chart', 'figure', allow_duplicate=True),
+     Output('pnl-dist', 'figure', allow_duplicate=True),
+     Output('cumulative-returns', 'figure', allow_duplicate=True),
+     Output('drawdown-chart', 'figure', allow_duplicate=True),
+     Output('live-status', 'children'),
+     Output('live-rendered', 'data')],
+    Input('live-poll', 'n_intervals'),
+    [State('slice-holdings', 'data'),
+     State('rendered-risk-analysis', 'data'),
+     State('rendered-distribution', 'data'),
+     State('live-rendered', 'data'),
+     State('portfolio-selector', 'value'),
+     State('rollup-dimension', 'value')],
+    prevent_initial_call=True
+)
+def update_live_prices(_, holdings, risk_rendered, distribution_rendered, rendered, portfolio_id, dimension):
+    if live_feed is None:
+        raise PreventUpdate
+    live_feed.start()
+    data = get_portfolio_data(portfolio_id)
+    live = live_portfolio(data)
+    if live is None:
+        raise PreventUpdate
+    
+    # However many ticks arrived since the last poll, each figure gets one patch
+    revision = live.refresh(price_book)
+    # A redraw of the patched charts (say after ungrouping) shows the export's values again
+    current = {'portfolio': portfolio_id, 'revision': revision, 'holdings': holdings,
+               'timeseries': (risk_rendered or {}).get('timeseries'), 'distribution': distribution_rendered}
+    rendered = rendered or {}
+    if revision == 0 or current == rendered:
+        raise PreventUpdate
     
-    # Get ticker names and values
-    if 'index' in corr_matrix.columns:
-        tickers = corr_matrix['index'].tolist()
-        corr_values = corr_matrix.drop('index', axis=1).values
+    snapshot = live.snapshot()
+    portfolio = data['portfolio']
+    weights, pnl = no_update, no_update
+    # Patches index the per-holding charts; grouped charts wait for the next snapshot
+    if 'Weight' in portfolio.columns and not dimension:
+        weights = Patch()
+        weights['data'][0]['values'] = payload.typed_array(snapshot['weight'])
+    if 'Unrealized P&L' in portfolio.columns and not dimension:
+        pnl = Patch()
+        pnl['data'][0]['y'] = payload.typed_array(snapshot['unrealized_pnl'])
+    
+    # The time series only exist once the Risk Analysis tab has been rendered
+    cumulative, drawdown = no_update, no_update
+    if current['timeseries'] is not None and len(data['dates']):
+        x = [data['dates'][-1], datetime.fromtimestamp(live.updated_at or time.time()).strftime('%Y-%m-%d %H:%M:%S')]
+        cumulative, drawdown = Patch(), Patch()
+        cumulative['data'][2]['x'] = x
+        cumulative['data'][2]['y'] = [snapshot['last_cum'], snapshot['cum_port']]
+        drawdown['data'][1]['x'] = x
+        drawdown['data'][1]['y'] = [snapshot['last_drawdown'], snapshot['drawdown']]
+    
+    color = "green" if snapshot['day_change'] >= 0 else "firebrick"
+    status = html.P(f"📡 Live value ₹{snapshot['total_value']:,.0f} "
+                    f"({snapshot['day_change']:+,.0f}, {snapshot['day_change_pct']:+.2%}) - "
+                    f"{len(price_book)} tickers priced", style={"color": color})
+    return weights, pnl, cumulative, drawdown, status, current
+
+# Portfolio table columns kept live, and the LivePortfolio.snapshot() arrays they come from
+LIVE_TABLE_COLUMNS = {'Current Value': 'current_value', 'Unrealized P&L': 'unrealized_pnl', 'Weight': 'weight'}
+
+@app.callback(
+    Output('portfolio-datatable', 'data', allow_duplicate=True),
+    [Input('live-rendered', 'data'),
+     Input('portfolio-datatable', 'data')],
+    [State('live-toggle', 'value'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_live_table_page(_, records, streaming, portfolio_id):
+    """Patch the live columns of the visible page, after every live poll and every new page"""
+    if live_feed is None or 'on' not in (streaming or []) or not records:
+        raise PreventUpdate
+    data = get_portfolio_data(portfolio_id)
+    live = live_portfolio(data)
+    if live is None or live.revision == 0:
+        raise PreventUpdate
+    
+    snapshot = live.snapshot()
+    decimals = portfolio_table_index(data).decimals
+    page = Patch()
+    changed = False
+    for i, record in enumerate(records):
+        row = live.positions.get(record.get('Ticker'))
+        if row is None:
+            continue
+        for column, key in LIVE_TABLE_COLUMNS.items():
+            if column in record:
+                value = round(float(snapshot[key][row]), decimals)
+                if record[column] != value:
+                    page[i][column] = value
+                    changed = True
+    if not changed:
+        raise PreventUpdate
+    return page
+
+# Paging, sorting and filtering of the paged tables, answered from their index
+PAGED_TABLES = {
+    'portfolio-datatable': portfolio_table_index,
+    'asset-risk-datatable': asset_risk_table_index,
+    'sector-risk-datatable': sector_risk_table_index,
+}
+
+def update_table_page(page_current, page_size, sort_by, filter_query, portfolio_id, table_id):
+    index = PAGED_TABLES[table_id](get_portfolio_data(portfolio_id))
+    try:
+        return index.page(page_current, page_size or TABLE_PAGE_SIZE, sort_by, filter_query)
+    except ValueError:
+        # Half-typed or unsupported filter: keep showing the current page
+        raise PreventUpdate
+
+for _table_id in PAGED_TABLES:
+    app.callback(
+        [Output(_table_id, 'data'),
+         Output(_table_id, 'page_count')],
+        [Input(_table_id, 'page_current'),
+         Input(_table_id, 'page_size'),
+         Input(_table_id, 'sort_by'),
+         Input(_table_id, 'filter_query')],
+        State('portfolio-selector', 'value'),
+        prevent_initial_call=True
+    )(lambda page_current, page_size, sort_by, filter_query, portfolio_id, table_id=_table_id:
+      update_table_page(page_current, page_size, sort_by, filter_query, portfolio_id, table_id))
+
+# Interactive correlation matrix: the server ships the matrix and its |r| index
+# once per data version; threshold and top-k changes are filtered in the browser
+@app.callback(
+    [Output('corr-payload', 'data'),
+     Output('rendered-correlation', 'data')],
+    [Input('slice-correlation', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-correlation', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_corr_heatmap(correlation, tab, rendered, portfolio_id):
+    current = {'correlation': correlation}
+    if not _stale_slices('correlation', tab, current, rendered):
+        raise PreventUpdate
+    return create_corr_payload(get_portfolio_data(portfolio_id)), current
+
+@memoize_by_slices(figure_cache, 'correlation')
+@metrics.timed_builder
+def create_corr_payload(data):
+    if not len(data['corr_tickers']):
+        return {}
+    
+    tickers, corr_values = data['holdings_index'].correlation()
+    return correlation_index.build_payload(tickers, corr_values)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='corr', function_name='filter_heatmap'),
+    [Output('filtered-corr-heatmap', 'figure'),
+     Output('top-corr-pairs', 'data')],
+    [Input('corr-threshold-slider', 'value'),
+     Input('corr-top-k', 'value'),
+     Input('corr-payload', 'data')]
+)
+
+# Covariance model shared by the Monte Carlo and what-if sections: the measured
+# covariance when per-asset returns were shipped, else the one implied by the export
+@memoize_by_slices(figure_cache, 'holdings', 'correlation', 'risk_contrib')
+@metrics.timed_builder
+def risk_model(data):
+    """Tickers, annualized covariance, weights and sectors, or None without risk data"""
+    component_var_df = data['component_var_df']
+    if component_var_df.empty or 'Weight' not in component_var_df:
+        return None
+    
+    # Tables are aligned through the shared ticker codes, not string reindexes
+    store = data['holdings_index']
+    cov = None
+    if data['asset_covariance'] is not None and data['asset_covariance_tickers'] is not None:
+        # The covariance follows the return matrix's tickers, the weights the risk table's,
+        # which may have been shipped in another order
+        codes = store.codes(component_var_df, 'Ticker')
+        cov = store.square_by_ticker(np.asarray(data['asset_covariance'], dtype=float),
+                                     data['asset_covariance_tickers'], codes)
+    # Otherwise (or if the returns miss a held ticker) imply one from the correlations
+    if cov is None and len(data['corr_tickers']):
+        import monte_carlo
+        codes = store.corr_codes
+        _, corr_values = store.correlation()
+        sigma = monte_carlo.implied_volatilities(
+            corr_values, np.nan_to_num(store.by_ticker(component_var_df, 'Weight', codes)),
+            np.nan_to_num(store.by_ticker(component_var_df, 'ComponentVar', codes)))
+        cov = monte_carlo.covariance_from_correlation(corr_values, sigma)
+    if cov is None:
+        return None
+    
+    return {
+        'tickers': store.tickers[codes].tolist(),
+        'cov': cov,
+        'weights': np.nan_to_num(store.by_ticker(component_var_df, 'Weight', codes)),
+        'sectors': store.sectors_of(codes) if 'Sector' in data['portfolio'].columns else None,
+    }
+
+# Monte Carlo VaR / CVaR: one scenario engine per data version, one cached
+# simulation per (engine, scenario spec)
+@memoize_by_slices(figure_cache, 'holdings', 'correlation', 'risk_contrib', 'returns')
+@metrics.timed_builder
+def monte_carlo_engine(data):
+    model = risk_model(data)
+    if model is None:
+        return None
+    import monte_carlo
+    return monte_carlo.MonteCarloEngine(model['cov'] / monte_carlo.TRADING_DAYS, model['weights'], model['tickers'],
+                                        model['sectors'], history=data['portfolio_returns'])
+
+@app.callback(
+    Output('mc-shocks', 'data'),
+    Input('slice-holdings', 'data'),
+    State('portfolio-selector', 'value'),
+    State('mc-shocks', 'data'),
+    prevent_initial_call=True
+)
+def update_shock_sectors(_, portfolio_id, shocks):
+    data = get_portfolio_data(portfolio_id)
+    if 'Sector' not in data['portfolio'].columns:
+        return []
+    # Keep the shocks already typed in for sectors that are still held
+    previous = {row['Sector']: row.get('Shock') for row in shocks or []}
+    return [{'Sector': s, 'Shock': previous.get(s, 0)} for s in data['holdings_index'].held_sectors()]
+
+@app.callback(
+    [Output('mc-summary', 'children'),
+     Output('mc-loss-distribution', 'figure'),
+     Output('mc-tail-table', 'children'),
+     Output('mc-scenarios', 'value'),
+     Output('mc-confidence', 'value'),
+     Output('mc-horizon', 'value'),
+     Output('mc-dof', 'value'),
+     Output('rendered-monte-carlo', 'data')],
+    [Input('mc-run', 'n_clicks'),
+     Input('slice-risk_contrib', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-monte-carlo', 'data'),
+     State('mc-distribution', 'value'),
+     State('mc-scenarios', 'value'),
+     State('mc-confidence', 'value'),
+     State('mc-horizon', 'value'),
+     State('mc-dof', 'value'),
+     State('mc-shocks', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_monte_carlo_section(_, risk_contrib, tab, rendered, distribution, n_scenarios, confidence, horizon, dof,
+                               shocks, portfolio_id):
+    current = {'risk_contrib': risk_contrib}
+    if not _stale_slices('monte-carlo', tab, current, rendered) and ctx.triggered_id != 'mc-run':
+        raise PreventUpdate
+    import monte_carlo
+    # Empty fields take the engine's defaults, which are then shown in the form
+    form = [n_scenarios, confidence, horizon, dof]
+    defaults = monte_carlo.DEFAULT_SPEC
+    filled = [value if value is not None else defaults[key]
+              for value, key in zip(form, ('n_scenarios', 'confidence', 'horizon_days', 'dof'))]
+    data = get_portfolio_data(portfolio_id)
+    engine = monte_carlo_engine(data)
+    if engine is None:
+        return (html.P("No risk data available for a simulation", style={"textAlign": "center"}), go.Figure(), None,
+                *filled, current)
+    
+    spec = {
+        'distribution': distribution,
+        'n_scenarios': min(filled[0], MONTE_CARLO_MAX_SCENARIOS),
+        'confidence': filled[1],
+        'horizon_days': filled[2],
+        'dof': filled[3],
+        'shocks': {row['Sector']: float(row['Shock']) / 100 for row in shocks or [] if row.get('Shock') not in (None, '')},
+    }
+    try:
+        result = engine.run(spec)
+    except ValueError as e:
+        return (html.P(f"❌ {e}", style={"color": "red", "textAlign": "center"}), no_update, no_update,
+                *filled, current)
+    
+    return (create_monte_carlo_summary(result), create_monte_carlo_figure(result, data),
+            create_tail_contribution_table(result), *filled, current)
+
+def create_monte_carlo_summary(result):
+    spec = result['spec']
+    parts = [
+        f"{spec['n_scenarios']:,} {spec['distribution']} scenarios, {spec['horizon_days']}-day horizon",
+        f"VaR ({spec['confidence']:.1%}): {result['VaR_pct']:.2%}",
+        f"CVaR: {result['CVaR_pct']:.2%}",
+    ]
+    if spec['shocks']:
+        parts.append(f"Sector shock P&L: {result['stress_return']:.2%}")
+    parts.append(f"{result['elapsed'] * 1000:.0f} ms")
+    return html.H4(" | ".join(parts), style={"textAlign": "center"})
+
+@metrics.timed_builder
+@payload.compact_figures
+def create_monte_carlo_figure(result, data):
+    histogram = result['loss_histogram']
+    edges = np.asarray(histogram['edges'])
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=histogram['counts'], width=np.diff(edges),
+                         name="Simulated returns", marker_color="#1f77b4"))
+    fig.add_vline(x=result['var_threshold'], line_dash="dash", line_color="red",
+                  annotation_text=f"MC VaR: {result['var_threshold']:.2%}")
+    fig.add_vline(x=result['cvar_threshold'], line_dash="dot", line_color="darkred",
+                  annotation_text=f"MC CVaR: {result['cvar_threshold']:.2%}")
+    if data['var_threshold'] and result['spec']['horizon_days'] == 1:
+        fig.add_vline(x=data['var_threshold'], line_dash="dash", line_color="orange",
+                      annotation_text=f"Historical VaR: {data['var_threshold']:.2%}", annotation_position="bottom left")
+    fig.update_layout(title="Simulated Portfolio Return Distribution", xaxis_title="Return", yaxis_title="Scenarios",
+                      xaxis_tickformat=".1%", bargap=0, height=450, showlegend=False)
+    return fig
+
+@metrics.timed_builder
+def create_tail_contribution_table(result):
+    tail_contrib = result['tail_contrib'].sort_values('TailContribution')
+    note = ("Simulated: w_i E[r_i | portfolio in tail]" if result['contribution_method'] == 'simulated'
+            else "Bootstrap: CVaR allocated along the covariance (w_i (Sigma w)_i / w'Sigma w)")
+    return html.Div([
+        html.P(note, style={"fontStyle": "italic"}),
+        dash_table.DataTable(
+            data=tail_contrib.round(5).to_dict('records'),
+            columns=[{"name": c, "id": c} for c in tail_contrib.columns],
+            page_size=TABLE_PAGE_SIZE,
+            sort_action='native',
+            style_table={"overflowX": "scroll"},
+            style_cell={"textAlign": "center", "fontSize": 12},
+            style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+        )
+    ])
+
+# What-if rebalancing: weight edits are applied to the cached baseline as
+# sparse updates of Sigma w, so a slider drag costs O(holdings x edits)
+@memoize_by_slices(figure_cache, 'holdings', 'correlation', 'risk_contrib', 'timeseries')
+@metrics.timed_builder
+def rebalance_model(data):
+    model = risk_model(data)
+    if model is None:
+        return None
+    import rebalance
+    return rebalance.RebalanceModel(model['cov'], model['weights'], model['tickers'], model['sectors'],
+                                    beta=data['beta_full'])
+
+@app.callback(
+    [Output('whatif-ticker', 'options'),
+     Output('whatif-ticker', 'value'),
+     Output('rendered-whatif-tickers', 'data')],
+    [Input('slice-risk_contrib', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-whatif-tickers', 'data'),
+     State('portfolio-selector', 'value'),
+     State('whatif-ticker', 'value')],
+    prevent_initial_call=True
+)
+def update_whatif_tickers(risk_contrib, tab, rendered, portfolio_id, ticker):
+    current = {'risk_contrib': risk_contrib}
+    if not _stale_slices('whatif-tickers', tab, current, rendered):
+        raise PreventUpdate
+    model = rebalance_model(get_portfolio_data(portfolio_id))
+    if model is None:
+        return [], None, current
+    # Largest positions first
+    order = np.argsort(-model.weights, kind='stable')
+    options = [{'label': f"{model.tickers[i]} ({model.weights[i]:.2%})", 'value': model.tickers[i]} for i in order]
+    return options, ticker if ticker in model.positions else model.tickers[order[0]], current
+
+@app.callback(
+    Output('whatif-change', 'value'),
+    [Input('whatif-ticker', 'value'),
+     Input('whatif-reset', 'n_clicks')],
+    State('whatif-edits', 'data'),
+    prevent_initial_call=True
+)
+def update_whatif_slider(ticker, _, edits):
+    # Show the edit already made to the selected holding
+    if ctx.triggered_id == 'whatif-reset':
+        return 0
+    return round((edits or {}).get(ticker, 0) * 100)
+
+@app.callback(
+    Output('whatif-edits', 'data'),
+    [Input('whatif-change', 'value'),
+     Input('whatif-reset', 'n_clicks')],
+    [State('whatif-ticker', 'value'),
+     State('whatif-edits', 'data')],
+    prevent_initial_call=True
+)
+def update_whatif_edits(change, _, ticker, edits):
+    if ctx.triggered_id == 'whatif-reset':
+        return {}
+    edits = dict(edits or {})
+    if ticker is None or (edits.get(ticker, 0) * 100 == (change or 0)):
+        raise PreventUpdate
+    if change:
+        edits[ticker] = change / 100
     else:
-        tickers = corr_matrix.columns.tolist()
-        corr_values = corr_matrix.values
-    
-    # Filter correlations by absolute value
-    filtered_corr = corr_values.copy()
-    mask = np.abs(filtered_corr) < threshold
-    filtered_corr[mask] = np.nan
-    
-    fig = go.Figure(
-        data=go.Heatmap(
-            z=filtered_corr,
-            x=tickers,
-            y=tickers,
-            colorscale="RdBu",
-            zmin=-1, zmax=1,
-            hoverongaps=False,
-        ),
-        layout=go.Layout(height=700, title=f"Filtered Correlation (|r| > {threshold})")
-    )
+        edits.pop(ticker, None)
+    return edits
+
+@app.callback(
+    [Output('whatif-summary', 'children'),
+     Output('whatif-sector-chart', 'figure'),
+     Output('whatif-asset-table', 'children'),
+     Output('rendered-whatif', 'data')],
+    [Input('whatif-edits', 'data'),
+     Input('whatif-mode', 'value'),
+     Input('slice-risk_contrib', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-whatif', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_whatif_section(edits, mode, risk_contrib, tab, rendered, portfolio_id):
+    current = {'risk_contrib': risk_contrib}
+    if (not _stale_slices('whatif', tab, current, rendered)
+            and ctx.triggered_id not in ('whatif-edits', 'whatif-mode')):
+        raise PreventUpdate
+    model = rebalance_model(get_portfolio_data(portfolio_id))
+    if model is None:
+        return html.P("No risk data available for rebalancing", style={"textAlign": "center"}), go.Figure(), None, current
+    
+    before, after = model.baseline(), model.evaluate(edits, mode)
+    return (create_whatif_summary(before, after, edits), create_whatif_sector_figure(before, after),
+            create_whatif_asset_table(before, after), current)
+
+def create_whatif_summary(before, after, edits):
+    rows = [
+        {'Metric': 'Annual Volatility', 'Current': f"{before['portfolio_vol_annual']:.2%}",
+         'What-if': f"{after['portfolio_vol_annual']:.2%}"},
+        {'Metric': 'Portfolio Beta', 'Current': f"{before['beta']:.2f}", 'What-if': f"{after['beta']:.2f}"},
+        {'Metric': 'Invested Weight', 'Current': f"{before['weights'].sum():.2%}",
+         'What-if': f"{after['weights'].sum():.2%}"},
+    ]
+    edited = ", ".join(f"{t} {c:+.0%}" for t, c in (edits or {}).items()) or "no changes"
+    return html.Div([
+        html.P(f"Edits: {edited}", style={"textAlign": "center"}),
+        dash_table.DataTable(
+            data=rows,
+            columns=[{"name": c, "id": c} for c in ("Metric", "Current", "What-if")],
+            style_cell={"textAlign": "center"},
+            style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+        )
+    ])
+
+@metrics.timed_builder
+@payload.compact_figures
+def create_whatif_sector_figure(before, after):
+    current, what_if = before['sector_contrib_pct'], after['sector_contrib_pct']
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=current['Sector'], y=current['ComponentVar'], name="Current"))
+    fig.add_trace(go.Bar(x=what_if['Sector'], y=what_if['ComponentVar'], name="What-if"))
+    fig.update_layout(title="Sector Risk Contribution", barmode='group', yaxis_tickformat=".0%", height=450,
+                      uirevision='whatif')
     return fig
 
+@metrics.timed_builder
+def create_whatif_asset_table(before, after):
+    current, what_if = before['component_var_df'], after['component_var_df']
+    table = pd.DataFrame({
+        'Ticker': current['Ticker'],
+        'Weight': current['Weight'],
+        'What-if Weight': what_if['Weight'],
+        'ComponentVarPct': current['ComponentVarPct'],
+        'What-if ComponentVarPct': what_if['ComponentVarPct'],
+    })
+    change = (table['What-if ComponentVarPct'] - table['ComponentVarPct']).abs().to_numpy()
+    top = np.argsort(-change, kind='stable')[:TABLE_PAGE_SIZE]
+    return dash_table.DataTable(
+        data=table.iloc[top].round(4).to_dict('records'),
+        columns=[{"name": c, "id": c} for c in table.columns],
+        style_table={"overflowX": "scroll", "maxHeight": "400px"},
+        style_cell={"textAlign": "center", "fontSize": 12},
+        style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+    )
+
+# Time travel: compare the latest stored version with the one in effect N days earlier
+@app.callback(
+    [Output('history-comparison', 'children'),
+     Output('rendered-history', 'data')],
+    [Input('history-days', 'value'),
+     Input('slice-holdings', 'data'),
+     Input('dashboard-tabs', 'value')],
+    [State('rendered-history', 'data'),
+     State('portfolio-selector', 'value')],
+    prevent_initial_call=True
+)
+def update_history_section(days, holdings, tab, rendered, portfolio_id):
+    current = {'holdings': holdings}
+    if not _stale_slices('history', tab, current, rendered) and ctx.triggered_id != 'history-days':
+        raise PreventUpdate
+    history = registry.histories.get(portfolio_id or DEFAULT_PORTFOLIO)
+    now = history.latest() if history is not None else None
+    then = history.days_ago(days) if now is not None else None
+    if then is None:
+        message = "No snapshot history yet" if now is None else f"No snapshot from {days} or more days before {now['as_of']}"
+        return html.P(message, style={"textAlign": "center"}), current
+    return create_history_comparison(then, now), current
+
+@metrics.timed_builder
+def create_history_comparison(then, now):
+    import history_store
+    comparison = history_store.compare(then, now)
+    holdings = comparison['holdings']
+    if 'Weight Change' in holdings:
+        holdings = holdings.iloc[np.argsort(-holdings['Weight Change'].abs().to_numpy(), kind='stable')]
+    table_style = dict(
+        style_table={"overflowX": "scroll"},
+        style_cell={"textAlign": "center", "fontSize": 12},
+        style_header={"backgroundColor": "#f2f2f2", "fontWeight": "bold"},
+    )
+    return html.Div([
+        html.H4(f"Snapshot of {then['as_of']} vs {now['as_of']}", style={"textAlign": "center"}),
+        dash_table.DataTable(
+            data=comparison['metrics'].round(5).to_dict('records'),
+            columns=[{"name": c, "id": c} for c in comparison['metrics'].columns],
+            **table_style
+        ),
+        html.H3("Holdings"),
+        dash_table.DataTable(
+            data=holdings.round(5).to_dict('records'),
+            columns=[{"name": c, "id": c} for c in holdings.columns],
+            page_size=TABLE_PAGE_SIZE,
+            sort_action='native',
+            filter_action='native',
+            **table_style
+        )
+    ])
+
+# Section outputs pre-rendered per data version, by component id
+PRERENDER_BUILDERS = {
+    'bar-perf': (create_performance_figure, {}),
+    'ticker-weight-chart': (create_ticker_weight_figure, {}),
+    'sector-dist': (create_sector_figure, {}),
+    'pnl-dist': (create_pnl_figure, {}),
+    'abs-contribution-chart': (create_abs_contribution_figure, {}),
+    'rollup-table': (create_rollup_table, {}),
+    'risk-table-container': (create_risk_table, {}),
+    'correlation-heatmap': (create_correlation_heatmap, {}),
+    'returns-distribution': (create_returns_distribution, {}),
+    'cumulative-returns': (create_cumulative_returns, {}),
+    'drawdown-chart': (create_drawdown_chart, {}),
+    'rolling-volatility': (create_rolling_volatility, {}),
+    'rolling-beta': (create_rolling_beta, {}),
+    'recent-returns-2m': (create_recent_returns, {'months': 2}),
+    'recent-returns-1m': (create_recent_returns, {'months': 1}),
+    'asset-risk-table': (create_asset_risk_table, {}),
+    'sector-risk-table': (create_sector_risk_table, {}),
+    'nudges-container': (create_nudges_list, {}),
+    'portfolio-table-container': (create_portfolio_table, {}),
+    'corr-payload': (create_corr_payload, {}),
+}
+bundles = None
+
+def prerender_loaded(name, data):
+    """Warm this worker from the version's bundle, or build the bundle if this worker writes the portfolio's store"""
+    if data.get('version') is None or bundles.warm(name, data):
+        return
+    if registry.refreshers[name].store.acquire_writer():
+        bundles.submit(name, data)
+
+if PRERENDER:
+    import prerender
+    bundles = prerender.BundleStore(PRERENDER_DIR, PRERENDER_BUILDERS)
+    prerender.install_routes(server, bundles, DEFAULT_PORTFOLIO)
+    registry.on_load = prerender_loaded
+    # The default portfolio was loaded before the builders existed
+    if DEFAULT_PORTFOLIO in registry.datasets:
+        prerender_loaded(DEFAULT_PORTFOLIO, get_portfolio_data(DEFAULT_PORTFOLIO))
+
+# With every load hook in place, parse the other books from their local snapshots
+if WARM_PORTFOLIOS and len(registry.names) > 1:
+    registry.warm([name for name in registry.names if name != DEFAULT_PORTFOLIO])
+
 if __name__ == '__main__':
     app.run_server(debug=True, host='0.0.0.0', port=8050)
 
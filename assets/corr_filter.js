@@ -0,0 +1,94 @@
+/*
+ * Clientside filtering for the interactive correlation heatmap.
+ *
+ * The server sends the cluster-ordered matrix and the upper-triangle pairs
+ * sorted by descending |r| once per data version (see correlation_index.py).
+ * A threshold change binary-searches that index and only reveals or hides
+ * the pairs between the previous and the new cut-off.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    corr: (function () {
+        var state = null;
+
+        function absAt(payload, k) {
+            return Math.abs(payload.z[payload.pair_i[k]][payload.pair_j[k]]);
+        }
+
+        // Number of pairs with |r| >= threshold (pairs are sorted by |r| desc)
+        function countAtLeast(payload, threshold) {
+            var lo = 0, hi = payload.pair_i.length;
+            while (lo < hi) {
+                var mid = (lo + hi) >>> 1;
+                if (absAt(payload, mid) >= threshold) { lo = mid + 1; } else { hi = mid; }
+            }
+            return lo;
+        }
+
+        function setPairs(payload, filtered, from, to, show) {
+            for (var k = from; k < to; k++) {
+                var i = payload.pair_i[k], j = payload.pair_j[k];
+                filtered[i][j] = show ? payload.z[i][j] : null;
+                filtered[j][i] = show ? payload.z[j][i] : null;
+            }
+        }
+
+        function freshState(payload) {
+            var n = payload.tickers.length, filtered = [];
+            for (var i = 0; i < n; i++) {
+                var row = new Array(n).fill(null);
+                row[i] = payload.z[i][i];
+                filtered.push(row);
+            }
+            return {payload: payload, filtered: filtered, shown: 0};
+        }
+
+        return {
+            filter_heatmap: function (threshold, topK, payload) {
+                if (!payload || !payload.tickers || payload.tickers.length === 0) {
+                    return [{data: [], layout: {title: {text: "No correlation data available"}}}, []];
+                }
+                threshold = threshold || 0;
+                if (state === null || state.payload !== payload) {
+                    state = freshState(payload);
+                }
+
+                var count = countAtLeast(payload, threshold);
+                if (count > state.shown) {
+                    setPairs(payload, state.filtered, state.shown, count, true);
+                } else if (count < state.shown) {
+                    setPairs(payload, state.filtered, count, state.shown, false);
+                }
+                state.shown = count;
+
+                var figure = {
+                    data: [{
+                        type: "heatmap",
+                        z: state.filtered,
+                        x: payload.tickers,
+                        y: payload.tickers,
+                        colorscale: "RdBu",
+                        zmin: -1, zmax: 1,
+                        hoverongaps: false
+                    }],
+                    layout: {
+                        height: 700,
+                        title: {text: "Filtered Correlation (|r| > " + threshold + ")"},
+                        // z is updated in place, so tell plotly the data changed
+                        datarevision: count + ":" + threshold
+                    }
+                };
+
+                var pairs = [], k = Math.min(Math.max(topK || 0, 0), count);
+                for (var p = 0; p < k; p++) {
+                    var i = payload.pair_i[p], j = payload.pair_j[p];
+                    pairs.push({
+                        "Ticker A": payload.tickers[i],
+                        "Ticker B": payload.tickers[j],
+                        "Correlation": payload.z[i][j]
+                    });
+                }
+                return [figure, pairs];
+            }
+        };
+    })()
+});
@@ -0,0 +1,123 @@
+"""Local stand-in for the holdings and price-history sources of an ingest manifest.
+
+Serves synthetic holdings (see synthetic.py) at ``/holdings.json`` and one
+CSV price history per ticker, plus the benchmark, at ``/prices/<ticker>.csv``,
+with ETags so repeated rounds are answered with 304s. Latency and transient
+failures can be injected to exercise the ingest's concurrency, retries and
+fallbacks (see ingest.py):
+
+    python benchmarks/ingest_server.py --holdings 300 --latency 0.05 --fail-rate 0.1
+
+prints the manifest to put in PORTFOLIO_SOURCES, e.g.
+
+    PORTFOLIO_SOURCES='{"Stand-in": {"holdings": "http://127.0.0.1:8780/holdings.json", ...}}' python app.py
+"""
+
+import argparse
+import collections
+import hashlib
+import http.server
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+BENCHMARK = '^NSEI'
+
+
+def build_resources(n_holdings=50, n_days=500, seed=0):
+    """{path: bytes} for the holdings document and every price history"""
+    rng = np.random.default_rng(seed)
+    holdings = pd.DataFrame(synthetic.generate(n_holdings, 2, seed=seed)['portfolio'])
+    dates = pd.bdate_range(end=pd.Timestamp('2025-10-31'), periods=n_days)
+    market = rng.normal(0.0004, 0.01, n_days)
+    resources = {'/holdings.json': json.dumps(holdings.to_dict(orient='records')).encode('utf-8')}
+    for ticker, close in zip(holdings['Ticker'], holdings['Previous Closing Price']):
+        returns = market * rng.uniform(0.3, 1.4) + rng.normal(0, rng.uniform(0.006, 0.025), n_days)
+        growth = np.cumsum(returns)
+        path = close * np.exp(growth - growth[-1])  # Ends at the holding's last close
+        resources[f'/prices/{ticker}.csv'] = _csv(dates, path)
+    resources[f'/prices/{BENCHMARK}.csv'] = _csv(dates, 24000 * np.exp(np.cumsum(market)))
+    return resources
+
+
+def _csv(dates, closes):
+    frame = pd.DataFrame({'Date': dates.strftime('%Y-%m-%d'), 'Close': np.round(closes, 2)})
+    return frame.to_csv(index=False).encode('utf-8')
+
+
+def serve(resources, port=0, latency=0.0, fail_rate=0.0, seed=0):
+    """Serve resources on localhost from a daemon thread; returns (server, base URL)
+
+    ``server.hits`` counts the responses sent by status code.
+    """
+    etags = {path: '"' + hashlib.sha1(body).hexdigest()[:16] + '"' for path, body in resources.items()}
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = unquote(self.path.split('?', 1)[0])
+            if latency:
+                time.sleep(latency)
+            with lock:
+                failing = rng.random() < fail_rate
+            if failing:
+                return self._reply(503, b'', {'Retry-After': '0'})
+            if path not in resources:
+                return self._reply(404, b'')
+            if self.headers.get('If-None-Match') == etags[path]:
+                return self._reply(304, b'', {'ETag': etags[path]})
+            self._reply(200, resources[path], {'ETag': etags[path]})
+
+        def _reply(self, status, body, headers=None):
+            with lock:
+                httpd.hits[status] += 1
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    httpd.hits = collections.Counter()
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def manifest(base_url):
+    return {"holdings": f"{base_url}/holdings.json", "prices": f"{base_url}/prices/{{ticker}}.csv",
+            "benchmark": BENCHMARK}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic holdings and price histories")
+    parser.add_argument("--holdings", type=int, default=50)
+    parser.add_argument("--days", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args()
+    httpd, base_url = serve(build_resources(args.holdings, args.days), args.port, args.latency, args.fail_rate)
+    print(f"✅ Serving {args.holdings} holdings x {args.days} days at {base_url}")
+    print(json.dumps({"Stand-in": manifest(base_url)}))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        httpd.shutdown()
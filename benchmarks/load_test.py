@@ -0,0 +1,472 @@
+"""Concurrent load test of the deployed dashboard (gunicorn + Dash).
+
+Generates a synthetic ``portfolio_data.json`` (see synthetic.py), serves it
+from a local stand-in for the GitHub raw endpoint (ETags, optional latency;
+see ingest_server.py) and starts the app under gunicorn against it. Virtual
+users then drive the app over HTTP the way browsers do: every user keeps its
+own copy of the component props, fires the callbacks listed by
+``/_dash-dependencies`` and chains each response into the callbacks it
+triggers, so the load follows the app's real callback graph. Scenarios:
+
+* ``page_load``   - HTML, layout, dependencies and the initial callback cascade
+                    (refresh callback, then every section whose slice arrived)
+* ``poll``        - a ``refresh-poll`` tick of an open tab
+* ``refresh``     - the Refresh button
+* ``tab_switch``  - opening another tab, which builds its lazy sections once
+* ``corr_drag``   - a rapid ``corr-threshold-slider`` drag; the filter runs in
+                    the browser, so only opening the tab reaches the server
+* ``whatif_drag`` - a rapid ``whatif-change`` drag, one round trip per step
+
+Each ``--users`` level runs for ``--duration`` seconds and reports throughput,
+p50/p95/p99 latency and error rate per request and per scenario, plus the
+resident memory of every gunicorn worker (Linux only):
+
+    python benchmarks/load_test.py --scale 500x2500 --workers 2 --threads 4 --users 1 10 50
+
+Callbacks of one user run one after another rather than in parallel as in a
+browser, and the users share this machine's CPUs with the server, so compare
+runs against each other rather than reading absolute numbers. Environment
+variables are passed to gunicorn, so A/B runs of a cache or refresh setting
+are e.g. ``PRERENDER=0 python benchmarks/load_test.py ...``. ``--url`` drives an
+already running deployment instead (memory is then reported for ``--pid``).
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import ingest_server  # noqa: E402
+import synthetic  # noqa: E402
+from run_benchmarks import callback_body, parse_scales  # noqa: E402
+
+SCENARIOS = ("page_load", "poll", "refresh", "tab_switch", "corr_drag", "whatif_drag")
+
+# Scenario weights of a user session after its first page load
+DEFAULT_MIX = "page_load=2,poll=6,refresh=1,tab_switch=3,corr_drag=2,whatif_drag=1"
+
+# Slider positions sent per drag; the what-if slider sends every step while dragging
+DRAG_STEPS = 10
+
+# Callback chains longer than this are cut off, in case of a cycle
+MAX_CASCADE = 20
+
+# How often worker memory is sampled
+MEMORY_SAMPLE_INTERVAL = 0.5
+
+PERCENTILES = (50, 95, 99)
+
+
+class Stats:
+    """Latencies and errors per label, shared by all virtual users"""
+
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds, ok=True):
+        with self._lock:
+            self.latencies[label].append(seconds * 1000)
+            if not ok:
+                self.errors[label] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        with self._lock:
+            for label, timings in sorted(self.latencies.items()):
+                values = np.percentile(timings, PERCENTILES)
+                rows[label] = {
+                    "count": len(timings),
+                    "per_second": round(len(timings) / elapsed, 2),
+                    "error_rate": round(self.errors[label] / len(timings), 4),
+                    **{f"p{p}_ms": round(float(v), 2) for p, v in zip(PERCENTILES, values)},
+                }
+        return rows
+
+
+def walk_components(value, props):
+    """Collect the 'id.prop' values of every component in a layout fragment"""
+    if isinstance(value, list):
+        for item in value:
+            walk_components(item, props)
+    elif isinstance(value, dict):
+        if "props" in value and "type" in value:
+            component_id = value["props"].get("id")
+            for name, prop in value["props"].items():
+                if isinstance(component_id, str):
+                    props[f"{component_id}.{name}"] = prop
+                walk_components(prop, props)
+
+
+class VirtualUser:
+    """One browser tab: its component props, and the callbacks they trigger"""
+
+    def __init__(self, base_url, stats, timeout, rng):
+        self.base_url = base_url
+        self.stats = stats
+        self.timeout = timeout
+        self.rng = rng
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        self.props = {}
+        self.callbacks = []
+        self.tabs = []
+
+    def request(self, method, path, label, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            content = response.content
+        except requests.RequestException:
+            self.stats.record(label, time.perf_counter() - start, ok=False)
+            return None
+        ok = response.status_code in (200, 204)
+        self.stats.record(label, time.perf_counter() - start, ok=ok)
+        if not ok or response.status_code == 204:
+            return None
+        return json.loads(content) if method == "POST" or path.startswith("/_dash") else content
+
+    def load_page(self):
+        self.props = {}
+        if self.request("GET", "/", "GET /") is None:
+            return
+        layout = self.request("GET", "/_dash-layout", "GET /_dash-layout")
+        dependencies = self.request("GET", "/_dash-dependencies", "GET /_dash-dependencies")
+        if layout is None or dependencies is None:
+            return
+        walk_components(layout, self.props)
+        # Pattern-matching ids and browser-side callbacks never reach the server here
+        self.callbacks = [dep for dep in dependencies
+                          if not dep.get("clientside_function") and "{" not in dep["output"]]
+        self.tabs = [tab["props"]["value"] for tab in self.props.get("dashboard-tabs.children") or []]
+        self.cascade([dep for dep in self.callbacks if not dep.get("prevent_initial_call")], [])
+
+    def fire(self, dep, triggered):
+        """POST one callback and apply its response; returns the props it changed"""
+        label = "POST " + dep["output"].strip(".").split("...")[0].split(".")[0]
+        body = self.request("POST", "/_dash-update-component", label,
+                            json=callback_body(dep, self.props, triggered))
+        changed = []
+        for component_id, updates in ((body or {}).get("response") or {}).items():
+            for name, value in updates.items():
+                self.props[f"{component_id}.{name}"] = value
+                changed.append(f"{component_id}.{name}")
+                walk_components(value, self.props)
+        return changed
+
+    def set(self, values):
+        """Change props ('id.prop' -> value) as the user would, and run the callbacks that follow"""
+        self.props.update(values)
+        self.cascade(None, list(values))
+
+    def cascade(self, initial, changed):
+        wave = [(dep, []) for dep in initial] if initial is not None else self.triggered_by(changed)
+        for _ in range(MAX_CASCADE):
+            if not wave:
+                return
+            changed = []
+            for dep, triggered in wave:
+                changed.extend(self.fire(dep, triggered))
+            wave = self.triggered_by(changed)
+
+    def triggered_by(self, changed):
+        changed = set(changed)
+        wave = []
+        for dep in self.callbacks:
+            triggered = [key for key in (f"{i['id']}.{i['property']}" for i in dep["inputs"]) if key in changed]
+            if triggered:
+                wave.append((dep, triggered))
+        return wave
+
+    def open_tab(self, tab):
+        if tab in self.tabs and self.props.get("dashboard-tabs.value") != tab:
+            self.set({"dashboard-tabs.value": tab})
+
+    def drag(self, key, low, high):
+        value = self.props.get(key) or 0
+        for _ in range(DRAG_STEPS):
+            value = min(high, max(low, value + self.rng.choice((-1, 1)) * self.rng.uniform(0, (high - low) / 20)))
+            self.set({key: round(value, 2)})
+
+    # Scenarios
+    def page_load(self):
+        self.load_page()
+
+    def poll(self):
+        self.set({"refresh-poll.n_intervals": (self.props.get("refresh-poll.n_intervals") or 0) + 1})
+
+    def refresh(self):
+        self.set({"refresh-button.n_clicks": (self.props.get("refresh-button.n_clicks") or 0) + 1})
+
+    def tab_switch(self):
+        others = [tab for tab in self.tabs if tab != self.props.get("dashboard-tabs.value")]
+        if others:
+            self.open_tab(self.rng.choice(others))
+
+    def corr_drag(self):
+        self.open_tab("correlation")
+        self.drag("corr-threshold-slider.value", 0, 1)
+
+    def whatif_drag(self):
+        self.open_tab("whatif")
+        self.drag("whatif-change.value", -100, 100)
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_user(user, mix, deadline, think, stats):
+    names, weights = list(mix), list(mix.values())
+    scenario = "page_load"
+    while True:
+        start = time.perf_counter()
+        getattr(user, scenario)()
+        stats.record(f"scenario {scenario}", time.perf_counter() - start)
+        if time.time() + think >= deadline:
+            return
+        time.sleep(user.rng.uniform(0.5, 1.5) * think)
+        scenario = user.rng.choices(names, weights)[0]
+
+
+def run_level(base_url, users, duration, mix, think, timeout, ramp, seed):
+    """Drive users concurrent users for duration seconds; returns (stats, elapsed)"""
+    stats = Stats()
+    start = time.time()
+    deadline = start + duration
+    threads = []
+    for n in range(users):
+        user = VirtualUser(base_url, stats, timeout, random.Random(seed + n))
+        thread = threading.Thread(target=run_user, args=(user, mix, deadline, think, stats), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(ramp / users)
+    for thread in threads:
+        thread.join()
+    return stats, time.time() - start
+
+
+def process_tree(root):
+    """pid -> parent pid of root and every process below it (Linux /proc)"""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat", "rb") as f:
+                    # The command name may contain spaces, so split after its closing parenthesis
+                    parents[int(entry)] = int(f.read().rsplit(b")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree, frontier = {root: None}, [root]
+    while frontier:
+        parent = frontier.pop()
+        for pid, ppid in parents.items():
+            if ppid == parent and pid not in tree:
+                tree[pid] = parent
+                frontier.append(pid)
+    return tree
+
+
+def resident_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemorySampler:
+    """Peak and last resident memory of a server process and its workers"""
+
+    def __init__(self, root_pid, interval=MEMORY_SAMPLE_INTERVAL):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak = {}
+        self.last = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.root_pid is None or not os.path.isdir("/proc"):
+            return self
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return {
+            str(pid): {"role": "master" if pid == self.root_pid else "worker",
+                       "peak_mb": round(self.peak[pid], 1), "last_mb": round(self.last.get(pid, 0), 1)}
+            for pid in sorted(self.peak)
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in process_tree(self.root_pid):
+                rss = resident_mb(pid)
+                if rss is not None:
+                    self.last[pid] = rss
+                    self.peak[pid] = max(rss, self.peak.get(pid, 0))
+            self._stop.wait(self.interval)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(source_url, workdir, workers, threads, preload):
+    """Run the app under gunicorn against the stand-in source; returns (process, base URL, log path)"""
+    port = free_port()
+    env = dict(os.environ, PORTFOLIO_JSON_URL=source_url, PORTFOLIO_CACHE_DIR=os.path.join(workdir, "cache"))
+    env.pop("PORTFOLIO_SOURCES", None)
+    command = [sys.executable, "-m", "gunicorn", "app:server", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "--threads", str(threads), "--timeout", "120"]
+    if preload:
+        command.append("--preload")
+    log_path = os.path.join(workdir, "gunicorn.log")
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}", log_path
+
+
+def wait_until_ready(base_url, process=None, timeout=180):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if requests.get(base_url + "/_dash-layout", timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{base_url} did not come up within {timeout}s")
+
+
+def warm_up(base_url, loads, timeout):
+    """Page loads until every worker has loaded the dataset; not part of the results"""
+    stats = Stats()
+    for n in range(loads):
+        VirtualUser(base_url, stats, timeout, random.Random(n)).load_page()
+
+
+def format_row(label, row):
+    return (f"   {label:<40} {row['count']:>7} {row['per_second']:>9.1f}/s {row['error_rate']:>8.2%}"
+            + "".join(f" {row[f'p{p}_ms']:>10.1f}" for p in PERCENTILES))
+
+
+def print_level(users, result):
+    print(f"\n👥 {users} users: {result['requests']} requests in {result['elapsed_s']:.1f}s "
+          f"({result['throughput']:.1f} req/s, {result['error_rate']:.2%} errors)")
+    print(f"   {'':<40} {'count':>7} {'rate':>11} {'errors':>8}" + "".join(f" {f'p{p} ms':>10}" for p in PERCENTILES))
+    for label, row in result["scenarios"].items():
+        print(format_row(label, row))
+    for label, row in result["requests_by_label"].items():
+        print(format_row(label, row))
+    for pid, memory in result["memory"].items():
+        print(f"   🧠 {memory['role']:<6} {pid:>7}  peak {memory['peak_mb']:>7.1f} MB  last {memory['last_mb']:>7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the dashboard with concurrent simulated users")
+    parser.add_argument("--scale", default="29x248", help="HOLDINGSxDAYS of the synthetic portfolio")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10], help="concurrency levels to run")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. poll=5,whatif_drag=1")
+    parser.add_argument("--think", type=float, default=1.0, help="mean pause between a user's scenarios")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which users start")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--preload", action="store_true", help="import the app before forking workers")
+    parser.add_argument("--source-latency", type=float, default=0.0, help="seconds added by the stand-in source")
+    parser.add_argument("--url", help="drive this running deployment instead of starting one")
+    parser.add_argument("--pid", type=int, help="with --url, the server process whose memory to sample")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    (holdings, days), = parse_scales([args.scale])
+    process = httpd = None
+    if args.url:
+        base_url, root_pid = args.url.rstrip("/"), args.pid
+    else:
+        workdir = tempfile.mkdtemp(prefix="portfolio-load-")
+        print(f"🔧 Generating {holdings}x{days}...")
+        raw = json.dumps(synthetic.generate(holdings, days, seed=args.seed)).encode("utf-8")
+        httpd, source_url = ingest_server.serve({"/portfolio_data.json": raw}, latency=args.source_latency)
+        process, base_url, log_path = start_server(f"{source_url}/portfolio_data.json", workdir,
+                                                   args.workers, args.threads, args.preload)
+        root_pid = process.pid
+        print(f"🚀 gunicorn with {args.workers} workers x {args.threads} threads at {base_url} (log: {log_path})")
+
+    try:
+        wait_until_ready(base_url, process)
+        warm_up(base_url, 2 * args.workers, args.timeout)
+        levels = {}
+        for users in args.users:
+            sampler = MemorySampler(root_pid).start()
+            stats, elapsed = run_level(base_url, users, args.duration, mix, args.think, args.timeout,
+                                       min(args.ramp, args.duration / 2), args.seed)
+            rows = stats.summary(elapsed)
+            requests_by_label = {label: row for label, row in rows.items() if not label.startswith("scenario ")}
+            total = sum(row["count"] for row in requests_by_label.values())
+            errors = sum(row["count"] * row["error_rate"] for row in requests_by_label.values())
+            levels[str(users)] = {
+                "elapsed_s": round(elapsed, 2),
+                "requests": total,
+                "throughput": round(total / elapsed, 2),
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "scenarios": {label: row for label, row in rows.items() if label.startswith("scenario ")},
+                "requests_by_label": requests_by_label,
+                "memory": sampler.stop(),
+            }
+            print_level(users, levels[str(users)])
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if httpd is not None:
+            print(f"\n📡 Source requests: {dict(httpd.hits)}")
+            httpd.shutdown()
+
+    if args.output:
+        report = {"scale": args.scale, "workers": args.workers, "threads": args.threads, "mix": mix,
+                  "duration": args.duration, "think": args.think, "levels": levels}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
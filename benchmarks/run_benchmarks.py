@@ -0,0 +1,378 @@
+"""Offline benchmark suite for the dashboard's load, build and callback paths.
+
+For every scale (holdings x days) a synthetic export is generated (see
+synthetic.py) and served from a local HTTP server, then each stage is timed:
+
+* ``parse_json``            - json.loads + build_current_data, the pre-snapshot path
+* ``encode_snapshot``       - converting the download into the binary store format
+* ``load_data_from_github`` - full download, publish, decode and build
+* ``create_*``              - every figure/table builder, with a cold figure cache
+* ``update_all_components`` and the per-section callbacks, through Dash's HTTP
+  endpoint so serialization is included
+* ``update_corr_heatmap``   - the correlation payload shipped to the browser
+
+Each stage reports the best and median wall time over ``--repeat`` runs, the
+peak Python heap (tracemalloc, measured in a separate run) and the size of the
+JSON it sends to the browser (for ``encode_snapshot``, the snapshot size).
+Results can be saved as a baseline and later
+runs compared against it:
+
+    python benchmarks/run_benchmarks.py --scales default --save-baseline
+    python benchmarks/run_benchmarks.py --scales default --compare benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import functools
+import gc
+import http.server
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+SCALE_PRESETS = {
+    "quick": ["29x248"],
+    "default": ["29x248", "500x2500"],
+    "full": ["29x248", "500x2500", "1000x5000", "2500x7500", "5000x10000"],
+}
+
+# A stage regresses when it is this much worse than the baseline. Heap peaks
+# and payload sizes are deterministic for a seed; wall times only compare
+# meaningfully on the machine that recorded the baseline, and loosely at that
+REGRESSION_TOLERANCE = {"wall_ms": 1.5, "peak_mb": 1.10, "payload_kb": 1.05}
+
+# Timings below this are too noisy to flag
+MIN_COMPARABLE_MS = 20.0
+
+
+def parse_scales(values):
+    scales = []
+    for value in values:
+        for token in SCALE_PRESETS.get(value, [value]):
+            holdings, days = token.lower().split("x")
+            scales.append((int(holdings), int(days)))
+    return scales
+
+
+def scale_name(holdings, days):
+    return f"{holdings}x{days}"
+
+
+def serve_directory(directory):
+    """Serve a directory on an ephemeral localhost port from a daemon thread"""
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    handler = functools.partial(QuietHandler, directory=directory)
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def payload_bytes(value):
+    """Size of the JSON Dash would send for a figure, component or callback response"""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    import plotly.utils
+    return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder).encode("utf-8"))
+
+
+def measure(stage, repeat, setup=None, sized=True):
+    """Time stage() repeat times, then trace one more run for the heap peak"""
+    timings, result = [], None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = stage()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "peak_mb": round((peak - baseline) / 1e6, 3),
+        "payload_kb": round(payload_bytes(result) / 1e3, 3) if sized else 0.0,
+    }
+
+
+def find_dependency(dependencies, output_id):
+    """The callback in a /_dash-dependencies listing that updates a component"""
+    for dep in dependencies:
+        outputs = dep["output"].strip(".").split("...")
+        if any(o.split(".")[0] == output_id and "@" not in o for o in outputs):
+            return dep
+    raise KeyError(output_id)
+
+
+def callback_body(dep, values, triggered):
+    """/_dash-update-component request for a callback; values maps 'id.prop' to its current value"""
+    outputs = [{"id": o.split(".")[0], "property": o.split(".")[1]}
+               for o in dep["output"].strip(".").split("...")]
+    return {
+        "output": dep["output"],
+        "outputs": outputs if dep["output"].startswith("..") else outputs[0],
+        "inputs": [dict(i, value=values.get(f"{i['id']}.{i['property']}")) for i in dep["inputs"]],
+        "state": [dict(s, value=values.get(f"{s['id']}.{s['property']}")) for s in dep["state"]],
+        "changedPropIds": triggered,
+    }
+
+
+class CallbackClient:
+    """Invoke Dash callbacks through the test client, like the browser does"""
+
+    def __init__(self, dash_app):
+        self.client = dash_app.server.test_client()
+        self.client.get("/")
+        self.dependencies = self.client.get("/_dash-dependencies").get_json()
+
+    def dependency(self, output_id):
+        return find_dependency(self.dependencies, output_id)
+
+    def call(self, output_id, values, triggered):
+        """POST one callback; values maps 'id.prop' to its current value"""
+        body = callback_body(self.dependency(output_id), values, triggered)
+        response = self.client.post("/_dash-update-component", json=body)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"{output_id} callback failed with HTTP {response.status_code}")
+        return response.get_data()
+
+
+def builder_stages(app, data):
+    """The create_* builders, each run against the given dataset"""
+    stages = {
+        "create_performance_figure": app.create_performance_figure,
+        "create_ticker_weight_figure": app.create_ticker_weight_figure,
+        "create_sector_figure": app.create_sector_figure,
+        "create_pnl_figure": app.create_pnl_figure,
+        "create_abs_contribution_figure": app.create_abs_contribution_figure,
+        "create_risk_table": app.create_risk_table,
+        "create_correlation_heatmap": app.create_correlation_heatmap,
+        "create_returns_distribution": app.create_returns_distribution,
+        "create_cumulative_returns": app.create_cumulative_returns,
+        "create_drawdown_chart": app.create_drawdown_chart,
+        "create_rolling_volatility": app.create_rolling_volatility,
+        "create_rolling_beta": app.create_rolling_beta,
+        "create_recent_returns_2m": functools.partial(app.create_recent_returns, months=2),
+        "create_recent_returns_1m": functools.partial(app.create_recent_returns, months=1),
+        "create_asset_risk_table": app.create_asset_risk_table,
+        "create_sector_risk_table": app.create_sector_risk_table,
+        "create_nudges_list": app.create_nudges_list,
+        "create_portfolio_table": app.create_portfolio_table,
+        "create_corr_payload": app.create_corr_payload,
+    }
+    return {name: functools.partial(build, data) for name, build in stages.items()}
+
+
+def callback_stages(app, callbacks, portfolio_id, data):
+    """Refresh callback plus every section callback it fans out to, on a first render"""
+    values = {"portfolio-selector.value": portfolio_id, "refresh-poll.n_intervals": 0}
+    values.update({f"slice-{name}.data": version for name, version in data["slices"].items()})
+    stages = {
+        "update_all_components": functools.partial(
+            callbacks.call, "refresh-status", values, ["portfolio-selector.value"]),
+    }
+    # Lazy sections only build with their tab open
+    sections = {
+        "update_performance_section": ("bar-perf", ["performance"], None),
+        "update_distribution_section": ("ticker-weight-chart", ["holdings", "sectors"], None),
+        "update_risk_metrics_section": ("risk-table-container", ["risk_summary"], None),
+        "update_risk_analysis_section": ("correlation-heatmap", ["correlation", "returns", "timeseries"], "risk"),
+        "update_risk_contribution_section": ("asset-risk-table", ["risk_contrib"], "contribution"),
+        "update_nudges_section": ("nudges-container", ["nudges"], None),
+        "update_portfolio_table_section": ("portfolio-table-container", ["holdings"], "holdings"),
+        "update_corr_heatmap": ("corr-payload", ["correlation"], "correlation"),
+    }
+    for name, (output_id, slices, tab) in sections.items():
+        stages[name] = functools.partial(callbacks.call, output_id, dict(values, **{"dashboard-tabs.value": tab}),
+                                         [f"slice-{s}.data" for s in slices])
+    return stages
+
+
+def wait_for_boot_poll(registry, timeout=300):
+    """Block until the poll the app starts at boot has published (and recorded) every source"""
+    def settled(refresher):
+        version = refresher.store.current_version()
+        history = refresher.fetcher.history
+        return version is not None and (history is None or history.latest_version() == version)
+
+    deadline = time.time() + timeout
+    while not all(settled(r) for r in registry.refreshers.values()):
+        if time.time() > deadline:
+            raise RuntimeError("the boot poll did not publish every source in time")
+        time.sleep(0.05)
+
+
+def run_scale(app, callbacks, portfolio_id, raw, repeat):
+    import data_loader
+
+    results = {}
+
+    def record(name, stage, setup=None, sized=True):
+        try:
+            results[name] = measure(stage, repeat, setup, sized)
+        except Exception as e:  # record where a scale falls over and keep going
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+        print(f"   {name:<36} {format_result(results[name])}")
+
+    record("parse_json", lambda: app.build_current_data(json.loads(raw)), sized=False)
+    record("encode_snapshot", lambda: data_loader.encode_for_store(raw))
+
+    fetcher = app.registry.refreshers[portfolio_id].fetcher
+
+    def forget_validators():
+        # Force a full download instead of a 304
+        fetcher.etag = fetcher.last_modified = fetcher.version = None
+
+    def load():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return app.load_data_from_github(portfolio_id)
+
+    record("load_data_from_github", load, setup=forget_validators, sized=False)
+
+    data = app.get_portfolio_data(portfolio_id)
+    for name, stage in builder_stages(app, data).items():
+        record(name, stage, setup=app.figure_cache.clear)
+    for name, stage in callback_stages(app, callbacks, portfolio_id, data).items():
+        record(name, stage, setup=app.figure_cache.clear)
+    return results
+
+
+def format_result(result):
+    if "error" in result:
+        return f"FAILED ({result['error']})"
+    return (f"{result['wall_ms']:>10.2f} ms  (median {result['median_ms']:.2f})"
+            f"  {result['peak_mb']:>9.2f} MB peak  {result['payload_kb']:>10.1f} kB")
+
+
+def environment():
+    import numpy
+    import pandas
+    import plotly
+    return {
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "plotly": plotly.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Print stage-by-stage ratios against a baseline; return the regressions"""
+    regressions = []
+    for scale, stages in results.items():
+        base_stages = baseline.get("results", {}).get(scale)
+        if base_stages is None:
+            print(f"⚠️ {scale}: not in baseline")
+            continue
+        print(f"\n📊 {scale} vs baseline")
+        for stage, result in stages.items():
+            base = base_stages.get(stage)
+            if base is None or "error" in base or "error" in result:
+                print(f"   {stage:<36} {'no comparable baseline' if 'error' not in result else 'FAILED'}")
+                continue
+            ratios = []
+            for metric, limit in tolerance.items():
+                ratio = result[metric] / base[metric] if base[metric] else 1.0
+                noisy = metric == "wall_ms" and max(result[metric], base[metric]) < MIN_COMPARABLE_MS
+                flagged = ratio > limit and not noisy
+                if flagged:
+                    regressions.append((scale, stage, metric, ratio))
+                ratios.append(f"{metric} x{ratio:.2f}{' ❌' if flagged else ''}")
+            print(f"   {stage:<36} " + "  ".join(ratios))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the portfolio dashboard offline")
+    parser.add_argument("--scales", nargs="+", default=["default"],
+                        help="HOLDINGSxDAYS values or presets: " + ", ".join(SCALE_PRESETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE_PATH}")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved baseline")
+    parser.add_argument("--time-tolerance", type=float, default=REGRESSION_TOLERANCE["wall_ms"],
+                        help="wall-time ratio above which a stage counts as a regression")
+    args = parser.parse_args()
+
+    scales = parse_scales(args.scales)
+    workdir = tempfile.mkdtemp(prefix="portfolio-bench-")
+    raw_documents = {}
+    for holdings, days in scales:
+        name = scale_name(holdings, days)
+        print(f"🔧 Generating {name}...")
+        raw = json.dumps(synthetic.generate(holdings, days, seed=args.seed)).encode("utf-8")
+        with open(os.path.join(workdir, f"{name}.json"), "wb") as f:
+            f.write(raw)
+        raw_documents[name] = raw
+
+    httpd, base_url = serve_directory(workdir)
+    # The app loads its sources at import, so point it at the local server first
+    os.environ["PORTFOLIO_SOURCES"] = json.dumps({name: f"{base_url}/{name}.json" for name in raw_documents})
+    os.environ["PORTFOLIO_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ.setdefault("PORTFOLIO_CACHE_MB", str(64 * 1024))
+    # Keep the background poller and warm-up from competing with the timed stages
+    os.environ["PORTFOLIO_REFRESH_INTERVAL"] = os.environ["PORTFOLIO_STORE_CHECK_INTERVAL"] = "3600"
+    os.environ["WARM_PORTFOLIOS"] = "0"
+    # Builders are timed cold, so keep pre-rendered bundles out of the figure cache
+    os.environ["PRERENDER"] = "0"
+    import app
+
+    # The app downloads every source in the background at boot; time nothing until that is done
+    wait_for_boot_poll(app.registry)
+    callbacks = CallbackClient(app.app)
+    results = {}
+    for name, raw in raw_documents.items():
+        print(f"\n⏱️ {name} ({len(raw) / 1e6:.1f} MB source)")
+        results[name] = run_scale(app, callbacks, name, raw, args.repeat)
+    httpd.shutdown()
+
+    report = {"environment": environment(), "repeat": args.repeat, "seed": args.seed, "results": results}
+    for path in filter(None, [args.output, BASELINE_PATH if args.save_baseline else None]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Wrote results to {path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            tolerance = dict(REGRESSION_TOLERANCE, wall_ms=args.time_tolerance)
+            regressions = compare(results, json.load(f), tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond tolerance")
+            sys.exit(1)
+        print("\n✅ No regressions beyond tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Synthetic portfolio_data.json documents for benchmarking.
+
+Produces the same schema as the offline export at any scale, from a
+one-market, one-factor-per-sector model, so correlations, component VaR and
+the risk series are internally consistent. Portfolio returns are simulated
+from the factors directly, which keeps generation O(days x sectors) rather
+than O(days x holdings) unless per-asset returns are requested.
+
+    python benchmarks/synthetic.py 5000 10000 synthetic.json [--asset-returns]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import covariance_engine  # noqa: E402
+import risk_engine  # noqa: E402
+
+SECTORS = [
+    'AUTO ANCILLARY', 'BANKING', 'CHEMICALS', 'CHINA TECH', 'ENGINEERING & CAPITAL GOODS',
+    'FINANCIAL SERVICES', 'FLEXI CAP', 'FMCG', 'GLOBAL', 'IT', 'LARGECAP INDEX', 'MIDCAP INDEX',
+    'PRECIOUS METAL', 'REAL ESTATE', 'SMALLCAP', 'TELECOM', 'TOURISM & HOSPITALITY',
+    'US NASDAQ', 'US S&P', 'US TECH',
+]
+BENCHMARK = 'Nifty (^NSEI)'
+
+
+def _factor_model(rng, n_holdings):
+    sector_codes = rng.integers(0, len(SECTORS), n_holdings)
+    betas = rng.uniform(0.3, 1.4, n_holdings)
+    sector_loadings = rng.uniform(0.2, 1.0, n_holdings)
+    idio_vol = rng.uniform(0.006, 0.025, n_holdings)
+    return sector_codes, betas, sector_loadings, idio_vol
+
+
+def _daily_covariance(betas, sector_codes, sector_loadings, idio_vol, market_vol, sector_vol):
+    """Asset covariance implied by the factor model, (holdings x holdings)"""
+    cov = np.outer(betas, betas) * market_vol ** 2
+    same_sector = sector_codes[:, None] == sector_codes[None, :]
+    cov += same_sector * np.outer(sector_loadings, sector_loadings) * sector_vol ** 2
+    cov[np.diag_indices(len(betas))] += idio_vol ** 2
+    return cov
+
+
+def _holdings(rng, n_holdings, sector_codes, weights, total_value, returns_1w, returns_1m):
+    names = [f"SYN{i:05d}" for i in range(n_holdings)]
+    current_value = weights * total_value
+    closing = rng.uniform(20, 4000, n_holdings).round(2)
+    quantity = np.maximum(np.round(current_value / closing), 1).astype(int)
+    average = (closing * rng.uniform(0.5, 1.6, n_holdings)).round(2)
+    pnl = (closing - average) * quantity
+    cost = average * quantity
+    previous_1w = current_value / (1 + returns_1w)
+    previous_1m = current_value / (1 + returns_1m)
+    return pd.DataFrame({
+        'Name': names,
+        'ISIN': [f"INE{i:06d}01011" for i in range(n_holdings)],
+        'Sector': [SECTORS[c] for c in sector_codes],
+        'Quantity Available': quantity,
+        'Quantity Discrepant': 0,
+        'Quantity Long Term': quantity,
+        'Quantity Pledged (Margin)': 0,
+        'Quantity Pledged (Loan)': 0,
+        'Average Price': average,
+        'Previous Closing Price': closing,
+        'Unrealized P&L': pnl.round(2),
+        'Unrealized P&L Pct.': (pnl / cost * 100).round(3),
+        'Ticker': [f"{name}.NS" for name in names],
+        '1W % Change': returns_1w,
+        '1M % Change': returns_1m,
+        'Current Value': current_value,
+        '1W Abs Change': current_value - previous_1w,
+        '1M Abs Change': current_value - previous_1m,
+        'Weight': weights,
+        'Profit Contribution %': pnl / np.abs(pnl).sum(),
+        'Drawdown %': np.minimum(closing / average - 1, 0),
+    })
+
+
+def _nudges(holdings):
+    by_profit = holdings.nlargest(min(5, len(holdings)), 'Profit Contribution %')
+    by_loss = holdings.nsmallest(min(5, len(holdings)), 'Unrealized P&L Pct.')
+    nudges = [f"💰 {t} contributes {p * 100:.1f}% of total profit — consider trimming to book gains."
+              for t, p in zip(by_profit['Ticker'], by_profit['Profit Contribution %'])]
+    nudges += [f"⚠️ {t} is down {p:.1f}% from buy price — consider cutting the loss."
+               for t, p in zip(by_loss['Ticker'], by_loss['Unrealized P&L Pct.'])]
+    return nudges
+
+
+def generate(n_holdings=29, n_days=248, seed=0, asset_returns=False, total_value=821038.0):
+    """Build a portfolio_data.json-shaped dict with n_holdings and n_days of history"""
+    rng = np.random.default_rng(seed)
+    market_vol, sector_vol = 0.009, 0.006
+    sector_codes, betas, sector_loadings, idio_vol = _factor_model(rng, n_holdings)
+    weights = rng.lognormal(0, 1, n_holdings)
+    weights /= weights.sum()
+
+    market = rng.normal(0.0004, market_vol, n_days)
+    sector_factors = rng.normal(0, sector_vol, (n_days, len(SECTORS)))
+    sector_weights = np.bincount(sector_codes, weights=weights * sector_loadings, minlength=len(SECTORS))
+    idio_portfolio_vol = np.sqrt(np.sum((weights * idio_vol) ** 2))
+    portfolio_returns = (market * (weights @ betas) + sector_factors @ sector_weights
+                         + rng.normal(0, idio_portfolio_vol, n_days))
+    benchmark_returns = market + rng.normal(0, 0.002, n_days)
+    dates = pd.bdate_range(end='2025-06-30', periods=n_days)
+
+    cov = _daily_covariance(betas, sector_codes, sector_loadings, idio_vol, market_vol, sector_vol)
+    component_var, component_pct, component_vol, _ = covariance_engine.component_risk(cov, weights)
+    sector_contrib = covariance_engine.sector_contribution(component_pct, [SECTORS[c] for c in sector_codes])
+    corr = covariance_engine.correlation_from_covariance(cov)
+    del cov
+
+    # Trailing holding returns consistent with the simulated history
+    week, month = market[-5:].sum(), market[-21:].sum()
+    returns_1w = betas * week + rng.normal(0, 0.01, n_holdings)
+    returns_1m = betas * month + rng.normal(0, 0.03, n_holdings)
+    holdings = _holdings(rng, n_holdings, sector_codes, weights, total_value, returns_1w, returns_1m)
+    tickers = holdings['Ticker'].tolist()
+
+    metrics = risk_engine.compute_risk_metrics(portfolio_returns, benchmark_returns)
+    sector_dist = holdings.groupby('Sector')['Weight'].sum()
+    data = {
+        'portfolio': holdings.to_dict(orient='records'),
+        'comparison': [
+            {'Portfolio': float(portfolio_returns[-5:].sum()), BENCHMARK: float(benchmark_returns[-5:].sum())},
+            {'Portfolio': float(portfolio_returns[-21:].sum()), BENCHMARK: float(benchmark_returns[-21:].sum())},
+        ],
+        'sector_dist': [{'Sector': s, 'Current Value': float(w)} for s, w in sector_dist.items()],
+        'risk_summary': [
+            {'Metric': 'Portfolio Beta', 'Value': round(metrics['beta_full'], 2)},
+            {'Metric': 'Annual Volatility', 'Value': f"{metrics['portfolio_vol_annual'] * 100:.2f}%"},
+            {'Metric': '95% VaR', 'Value': f"{metrics['VaR_pct'] * 100:.2f}%"},
+            {'Metric': 'CVaR', 'Value': f"{metrics['CVaR_pct'] * 100:.2f}%"},
+        ],
+        'nudges': _nudges(holdings),
+        'portfolio_returns': portfolio_returns.tolist(),
+        'benchmark_returns': benchmark_returns.tolist(),
+        'dates': [d.strftime('%Y-%m-%d') for d in dates],
+        'component_var_df': pd.DataFrame({
+            'Ticker': tickers, 'Weight': weights, 'ComponentVar': component_var,
+            'ComponentVarPct': component_pct, 'ComponentVolAbs': component_vol,
+        }).to_dict(orient='records'),
+        'sector_contrib_pct': sector_contrib.to_dict(orient='records'),
+        'portfolio_tickers': tickers,
+        'weights': weights.tolist(),
+        'total_value': total_value,
+    }
+    for key in ('var_threshold', 'cvar_threshold', 'cum_port', 'cum_bench', 'drawdown', 'rolling_vol',
+                'rolling_beta', 'max_drawdown', 'portfolio_vol_annual', 'beta_full', 'VaR_pct', 'CVaR_pct'):
+        value = metrics[key]
+        data[key] = value.tolist() if isinstance(value, np.ndarray) else float(value)
+
+    if asset_returns:
+        # Ship per-asset returns instead of the N x N matrix, as a richer export would
+        noise = rng.normal(0, 1, (n_days, n_holdings)) * idio_vol
+        returns = market[:, None] * betas + sector_factors[:, sector_codes] * sector_loadings + noise
+        frame = pd.DataFrame(returns, columns=tickers)
+        frame.insert(0, 'Date', data['dates'])
+        data['asset_returns'] = frame.to_dict(orient='records')
+        for key in ('corr_matrix', 'component_var_df', 'sector_contrib_pct'):
+            data.pop(key, None)
+    else:
+        corr_frame = pd.DataFrame(corr, columns=tickers)
+        corr_frame.insert(0, 'Ticker', tickers)
+        data['corr_matrix'] = corr_frame.to_dict(orient='records')
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic portfolio_data.json")
+    parser.add_argument("holdings", type=int)
+    parser.add_argument("days", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--asset-returns", action="store_true",
+                        help="ship per-asset returns instead of a precomputed corr_matrix")
+    args = parser.parse_args()
+    document = generate(args.holdings, args.days, seed=args.seed, asset_returns=args.asset_returns)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f)
+    print(f"✅ Wrote {args.holdings} holdings x {args.days} days to {args.output}")
@@ -0,0 +1,179 @@
+"""Small in-process caches for the portfolio dashboard.
+
+Figures and tables are memoized under a content hash of the slice of
+``current_data`` they are built from, so a refresh only rebuilds the parts of
+the page whose inputs actually changed.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# Every live cache, so a forked child can replace locks held by threads it lost
+_caches = weakref.WeakSet()
+
+
+def _reset_locks_after_fork():
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping with hit/miss counters.
+
+    Bounded by item count and, when ``sizeof`` is given, by the total
+    ``max_bytes`` of the values it holds.
+    """
+
+    def __init__(self, maxsize=128, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self.total_bytes += size - self._sizes.get(key, 0)
+            self._items[key] = value
+            self._sizes[key] = size
+            self._items.move_to_end(key)
+            # Always keep the newest entry, even if it alone exceeds max_bytes
+            while len(self._items) > 1 and (
+                    len(self._items) > self.maxsize
+                    or (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+                evicted, _ = self._items.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self.total_bytes -= self._sizes.pop(key, 0)
+            return self._items.pop(key, default)
+
+    def get_or_create(self, key, factory):
+        """Return the cached value for key, building it with factory() on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # Build outside the lock; a concurrent miss just builds twice
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+
+def nbytes(value, _seen=None):
+    """Approximate memory held by DataFrames and arrays inside a (nested) value.
+
+    Categories shared by several categorical columns are counted once.
+    """
+    seen = set() if _seen is None else _seen
+    if isinstance(value, pd.DataFrame):
+        total = int(value.index.memory_usage(deep=True))
+        for _, column in value.items():
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                total += column.cat.codes.nbytes
+                categories = column.cat.categories
+                if id(categories) not in seen:
+                    seen.add(id(categories))
+                    total += int(categories.memory_usage(deep=True))
+            else:
+                total += int(column.memory_usage(index=False, deep=True))
+        return total
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(nbytes(v, seen) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v, seen) for v in value) if value and not isinstance(value[0], (int, float)) else 8 * len(value)
+    if isinstance(value, str):
+        return len(value)
+    return int(getattr(value, 'nbytes', 0) or 0)
+
+
+def _hash_value(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(json.dumps([str(c) for c in value.columns]).encode("utf-8"))
+        if not value.empty:
+            h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(str(value.dtype).encode("utf-8"))
+        h.update(np.ascontiguousarray(value).tobytes())
+    else:
+        h.update(json.dumps(value, sort_keys=True, default=str).encode("utf-8"))
+
+
+def content_hash(*values):
+    """Stable short hash of DataFrames, arrays and JSON-able values"""
+    h = hashlib.blake2b(digest_size=8)
+    for value in values:
+        _hash_value(h, value)
+    return h.hexdigest()
+
+
+def slice_versions(data, slices):
+    """Map each slice name to a content hash of the data keys it covers"""
+    return {name: content_hash(*(data.get(k) for k in keys)) for name, keys in slices.items()}
+
+
+def memoize_by_slices(cache, *slice_names):
+    """Memoize a create_* builder under the versions of the data slices it reads"""
+    def decorator(func):
+        def cache_key(data, *args, **kwargs):
+            # None when the data carries no versions for these slices (not memoized)
+            versions = data.get("slices") or {}
+            if any(name not in versions for name in slice_names):
+                return None
+            return (func.__name__, args, tuple(sorted(kwargs.items())),
+                    tuple(versions[name] for name in slice_names))
+
+        @functools.wraps(func)
+        def wrapper(data, *args, **kwargs):
+            key = cache_key(data, *args, **kwargs)
+            if key is None:
+                return func(data, *args, **kwargs)
+            return cache.get_or_create(key, lambda: func(data, *args, **kwargs))
+        wrapper.cache = cache
+        wrapper.cache_key = cache_key
+        return wrapper
+    return decorator
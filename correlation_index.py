@@ -0,0 +1,60 @@
+"""Precomputed correlation views for the interactive heatmap.
+
+Built once per data version and shipped to the browser, where a clientside
+callback (assets/corr_filter.js) does all threshold filtering:
+
+* tickers in hierarchical-cluster order, so correlated blocks sit together;
+* the upper-triangle ticker pairs sorted by descending |r|, so "how many
+  pairs pass |r| >= t" and "top-k correlated pairs" are binary searches /
+  prefix slices instead of full matrix scans.
+"""
+
+import numpy as np
+
+try:
+    from scipy.cluster.hierarchy import leaves_list, linkage
+    from scipy.spatial.distance import squareform
+except ImportError:  # scipy is optional; fall back to spectral ordering
+    linkage = None
+
+
+def cluster_order(corr):
+    """Permutation of tickers that groups strongly correlated ones together"""
+    n = len(corr)
+    if n < 3:
+        return np.arange(n)
+    similarity = np.nan_to_num(np.abs(corr))
+    if linkage is not None:
+        distance = np.clip(1.0 - similarity, 0.0, None)
+        np.fill_diagonal(distance, 0.0)
+        distance = (distance + distance.T) / 2
+        return leaves_list(linkage(squareform(distance, checks=False), method="average"))
+    # Spectral seriation: sort by the Fiedler vector of the similarity graph
+    laplacian = np.diag(similarity.sum(axis=1)) - similarity
+    _, vectors = np.linalg.eigh(laplacian)
+    return np.argsort(vectors[:, 1], kind="stable")
+
+
+def sorted_pairs(corr):
+    """Upper-triangle pairs (i, j) ordered by descending |r|, NaNs dropped"""
+    i, j = np.triu_indices(len(corr), k=1)
+    values = corr[i, j]
+    keep = ~np.isnan(values)
+    i, j, values = i[keep], j[keep], values[keep]
+    order = np.argsort(-np.abs(values), kind="stable")
+    return i[order].astype(np.int32), j[order].astype(np.int32), values[order]
+
+
+def build_payload(tickers, corr, decimals=4):
+    """Browser payload: cluster-ordered matrix plus the |r|-sorted pair index"""
+    corr = np.asarray(corr, dtype=float)
+    order = cluster_order(corr)
+    ordered = corr[np.ix_(order, order)]
+    pair_i, pair_j, _ = sorted_pairs(ordered)
+    z = np.round(ordered, decimals, out=ordered)
+    return {
+        'tickers': [tickers[k] for k in order],
+        'z': [[None if np.isnan(v) else v for v in row] for row in z.tolist()],
+        'pair_i': pair_i.tolist(),
+        'pair_j': pair_j.tolist(),
+    }
@@ -0,0 +1,270 @@
+"""Covariance, correlation and component-VaR engine for large holdings universes.
+
+Works from a per-asset daily return matrix (days x tickers) and reproduces the
+tables the JSON export ships precomputed: ``corr_matrix``,
+``component_var_df`` (Weight, ComponentVar, ComponentVarPct, ComponentVolAbs)
+and ``sector_contrib_pct``. ComponentVar follows the export's definition:
+each holding's share of the annualized portfolio variance, w_i * (Sigma w)_i.
+
+The N x N products are built in column blocks into a single output array, so
+no intermediate N x N copies are materialised, and the whole pipeline can run
+in float32 to halve memory. Optional Ledoit-Wolf (or fixed-intensity)
+shrinkage towards a scaled identity keeps the matrix well-conditioned when
+tickers outnumber days. ``CovarianceAccumulator`` folds in (or drops) one day
+of returns at a time in O(N^2) without revisiting the history; ``extend``
+matches a new return matrix against the accumulator's last one, so a data
+version that appends days, or slides a fixed-length window, costs O(N^2) per
+changed day instead of a full O(T N^2) rebuild.
+"""
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+DEFAULT_BLOCK_SIZE = 512
+
+
+def _blocks(n, block_size):
+    return [slice(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+
+def _gram(x, block_size, out):
+    """out = x.T @ x, computed block by block into the preallocated output"""
+    n = x.shape[1]
+    blocks = _blocks(n, block_size)
+    for i, bi in enumerate(blocks):
+        for bj in blocks[i:]:
+            out[bi, bj] = x[:, bi].T @ x[:, bj]
+            if bj != bi:
+                out[bj, bi] = out[bi, bj].T
+    return out
+
+
+def ledoit_wolf_intensity(centered, gram):
+    """Ledoit-Wolf (2004) shrinkage intensity towards a scaled identity"""
+    t, n = centered.shape
+    sample = gram / t
+    mu = np.trace(sample) / n
+    d2 = (np.sum(sample * sample, dtype=np.float64) - 2 * mu * np.trace(sample) + n * mu * mu) / n
+    if d2 <= 0:
+        return 0.0
+    # sum_t ||x_t x_t' - S||_F^2 = sum_t ||x_t||^4 - T ||S||_F^2
+    row_norms = np.einsum('ij,ij->i', centered, centered, dtype=np.float64)
+    b2_bar = (np.sum(row_norms ** 2) - t * np.sum(sample * sample, dtype=np.float64)) / (t * t * n)
+    return float(min(max(b2_bar, 0.0), d2) / d2)
+
+
+def shrink(cov, intensity):
+    """Shrink a covariance towards its scaled identity, in place"""
+    if intensity > 0:
+        n = len(cov)
+        mu = np.trace(cov) / n
+        cov *= (1 - intensity)
+        cov[np.diag_indices(n)] += intensity * mu
+    return cov
+
+
+def covariance_matrix(returns, dtype=np.float64, block_size=DEFAULT_BLOCK_SIZE, shrinkage=None):
+    """Sample covariance of a (days x tickers) return matrix.
+
+    Missing (NaN) returns are left out pair by pair: each ticker is centred on
+    its own days, and each pair is divided by the days both tickers have minus
+    one, so gaps do not pull variances and covariances towards zero.
+
+    ``shrinkage`` is None, a fixed intensity in [0, 1], or "ledoit-wolf".
+    Returns (covariance, shrinkage intensity used).
+    """
+    x = np.array(returns, dtype=dtype, copy=True)
+    if x.ndim != 2 or x.shape[0] < 2:
+        raise ValueError("returns must be a (days x tickers) matrix with at least two days")
+    missing = np.isnan(x)
+    gaps = bool(missing.any())
+    if gaps:
+        # Gaps add nothing to the products; the overlap counts scale each pair below
+        x[missing] = 0
+        x -= x.sum(axis=0) / np.maximum((~missing).sum(axis=0), 1)
+        x[missing] = 0
+    else:
+        x -= x.mean(axis=0)
+
+    t, n = x.shape
+    cov = _gram(x, block_size, np.empty((n, n), dtype=dtype))
+
+    intensity = 0.0
+    if shrinkage == "ledoit-wolf":
+        intensity = ledoit_wolf_intensity(x, cov)
+    elif shrinkage:
+        intensity = float(shrinkage)
+    if gaps:
+        # Days each pair of tickers shares, minus one; pairs sharing under two days get no covariance
+        overlap = _gram((~missing).astype(dtype), block_size, np.empty((n, n), dtype=dtype))
+        overlap -= 1
+        np.divide(cov, overlap, out=cov, where=overlap > 0)
+        cov[overlap <= 0] = 0
+    else:
+        cov /= (t - 1)
+    return shrink(cov, intensity), intensity
+
+
+def correlation_from_covariance(cov, block_size=DEFAULT_BLOCK_SIZE, out=None):
+    """Correlation matrix from a covariance matrix, scaled block by block"""
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_std = np.where(std > 0, 1.0 / std, 0.0).astype(cov.dtype)
+    corr = np.empty_like(cov) if out is None else out
+    for bi in _blocks(len(std), block_size):
+        np.multiply(cov[bi], inv_std[bi, None], out=corr[bi])
+        corr[bi] *= inv_std[None, :]
+    corr[np.diag_indices(len(std))] = np.where(std > 0, 1.0, np.nan)
+    return corr
+
+
+def component_risk(cov, weights, periods_per_year=TRADING_DAYS):
+    """Per-holding contributions to annualized portfolio variance.
+
+    Returns (ComponentVar, ComponentVarPct, ComponentVolAbs, portfolio variance).
+    """
+    w = np.asarray(weights, dtype=np.float64)
+    sigma_w = (cov @ w.astype(cov.dtype)).astype(np.float64) * periods_per_year
+    component_var = w * sigma_w
+    port_var = float(component_var.sum())
+    if port_var <= 0:
+        zeros = np.zeros_like(component_var)
+        return component_var, zeros, zeros, port_var
+    return component_var, component_var / port_var, component_var / np.sqrt(port_var), port_var
+
+
+def sector_contribution(component_var_pct, sectors):
+    """Sum ComponentVarPct by sector with one bincount instead of a groupby"""
+    codes, names = pd.factorize(pd.Series(sectors), sort=True)
+    totals = np.bincount(codes[codes >= 0], weights=np.asarray(component_var_pct)[codes >= 0],
+                         minlength=len(names))
+    return pd.DataFrame({'Sector': names, 'ComponentVar': totals})
+
+
+def risk_tables(returns, tickers, weights, sectors, dtype=np.float64,
+                block_size=DEFAULT_BLOCK_SIZE, shrinkage=None):
+    """Build corr_matrix, component_var_df and sector_contrib_pct in one pass.
+
+    Also returns the annualized covariance so later stages can reuse it, with
+    its row/column tickers (``asset_covariance_tickers``): the order of the
+    return matrix, which need not match another source's risk table.
+    """
+    cov, _ = covariance_matrix(returns, dtype=dtype, block_size=block_size, shrinkage=shrinkage)
+    return tables_from_covariance(cov, tickers, weights, sectors, block_size)
+
+
+def tables_from_covariance(cov, tickers, weights, sectors, block_size=DEFAULT_BLOCK_SIZE):
+    """risk_tables from a daily covariance already computed (annualized in place)"""
+    component_var, component_pct, component_vol, _ = component_risk(cov, weights)
+    tables = {
+        'component_var_df': pd.DataFrame({
+            'Ticker': tickers,
+            'Weight': np.asarray(weights, dtype=float),
+            'ComponentVar': component_var,
+            'ComponentVarPct': component_pct,
+            'ComponentVolAbs': component_vol,
+        }),
+        'sector_contrib_pct': sector_contribution(component_pct, sectors),
+    }
+    # Annualize in place, then reuse the same buffer's scale for correlations
+    cov *= TRADING_DAYS
+    labels = pd.Index(tickers, name='Ticker')
+    tables['corr_matrix'] = pd.DataFrame(correlation_from_covariance(cov, block_size),
+                                         index=labels, columns=list(tickers), copy=False)
+    tables['asset_covariance'] = cov
+    tables['asset_covariance_tickers'] = list(tickers)
+    return tables
+
+
+class CovarianceAccumulator:
+    """Running mean and co-moment matrix updated one day at a time"""
+
+    def __init__(self, n_assets, dtype=np.float64, block_size=DEFAULT_BLOCK_SIZE):
+        self.n = 0
+        self.block_size = block_size
+        self.mean = np.zeros(n_assets, dtype=np.float64)
+        self.comoment = np.zeros((n_assets, n_assets), dtype=dtype)
+        # Days covered when seeded or extended, matched against the next version's
+        self.history = None
+        self._since_seed = 0
+
+    @classmethod
+    def from_returns(cls, returns, dtype=np.float64, block_size=DEFAULT_BLOCK_SIZE):
+        """Seed from a full history with one blocked pass"""
+        x = np.array(returns, dtype=dtype, copy=True)
+        acc = cls(x.shape[1], dtype=dtype, block_size=block_size)
+        acc.n = x.shape[0]
+        acc.mean = x.mean(axis=0, dtype=np.float64)
+        x -= acc.mean.astype(dtype)
+        _gram(x, block_size, acc.comoment)
+        acc.history = np.asarray(returns)
+        return acc
+
+    def update(self, row):
+        """Fold in one day of per-asset returns (Welford co-moment update)"""
+        row = np.asarray(row, dtype=np.float64)
+        self.n += 1
+        self._since_seed += 1
+        delta = row - self.mean
+        self.mean += delta / self.n
+        after = (row - self.mean).astype(self.comoment.dtype)
+        delta = delta.astype(self.comoment.dtype)
+        # Rank-1 update a block of rows at a time to bound the temporary
+        for bi in _blocks(len(row), self.block_size):
+            self.comoment[bi] += delta[bi, None] * after[None, :]
+
+    def remove(self, row):
+        """Drop one day of per-asset returns that was folded in earlier (the update reversed)"""
+        if self.n < 2:
+            raise ValueError("cannot drop the last day of returns")
+        row = np.asarray(row, dtype=np.float64)
+        before = self.mean
+        self.n -= 1
+        self._since_seed += 1
+        self.mean = (before * (self.n + 1) - row) / self.n
+        delta = (row - self.mean).astype(self.comoment.dtype)
+        after = (row - before).astype(self.comoment.dtype)
+        for bi in _blocks(len(row), self.block_size):
+            self.comoment[bi] -= delta[bi, None] * after[None, :]
+
+    def covariance(self, out=None):
+        if self.n < 2:
+            raise ValueError("need at least two days of returns")
+        out = np.empty_like(self.comoment) if out is None else out
+        np.divide(self.comoment, self.n - 1, out=out)
+        return out
+
+
+def _days_dropped(old, new):
+    """How many leading days of old are gone when new continues it (new[:m] == old[k:]); None if it does not"""
+    if len(old) == 0 or len(new) == 0:
+        return None
+    candidates = [0] if np.array_equal(old[0], new[0]) else np.flatnonzero((old == new[0]).all(axis=1))
+    for k in candidates:
+        kept = len(old) - k
+        if kept <= len(new) and np.array_equal(old[k:], new[:kept]):
+            return int(k)
+    return None
+
+
+def extend(acc, returns, dtype=np.float64, block_size=DEFAULT_BLOCK_SIZE):
+    """An accumulator for this (NaN-free) return matrix: acc itself when the
+    matrix continues acc's history - days appended, and possibly the oldest
+    dropped - updated day by day, otherwise a fresh one seeded from it"""
+    x = np.asarray(returns)
+    if (acc is not None and acc.history is not None and acc.comoment.dtype == np.dtype(dtype)
+            and acc.history.shape[1:] == x.shape[1:]):
+        old = acc.history
+        dropped = _days_dropped(old, x)
+        if dropped is not None:
+            added = x[len(old) - dropped:]
+            # Drops lose a little precision each; reseed once a history's worth of days has changed
+            if acc._since_seed + dropped + len(added) <= len(x) and len(old) - dropped >= 2:
+                for row in added:
+                    acc.update(row)
+                for row in old[:dropped]:
+                    acc.remove(row)
+                acc.history = x
+                return acc
+    return CovarianceAccumulator.from_returns(x, dtype=dtype, block_size=block_size)
@@ -0,0 +1,283 @@
+"""Data loading helpers for the portfolio dashboard.
+
+Fetches ``portfolio_data.json`` over a pooled HTTP session with conditional
+requests (ETag / If-Modified-Since) and publishes it to a shared snapshot
+store (see snapshot_store.py). Only the worker holding the store's writer lock
+talks to GitHub; every worker loads new versions from the store on a
+background poller, so Dash callbacks never wait on the network.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import metrics
+import snapshot_format
+from snapshot_store import SharedSnapshotStore
+
+# (connect, read) timeouts in seconds for every request to the data source
+REQUEST_TIMEOUT = (3.05, 15)
+
+# How often the writer checks the source for a new snapshot
+REFRESH_INTERVAL = float(os.environ.get("PORTFOLIO_REFRESH_INTERVAL", 300))
+
+# How often every worker checks the shared store for a newer version
+STORE_CHECK_INTERVAL = float(os.environ.get("PORTFOLIO_STORE_CHECK_INTERVAL", 5))
+
+# Format published to the shared store: "binary" (memory-mappable) or "json"
+SNAPSHOT_FORMAT = os.environ.get("PORTFOLIO_SNAPSHOT_FORMAT", "binary")
+
+# Where the shared snapshots and their validators are kept
+CACHE_DIR = os.environ.get(
+    "PORTFOLIO_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+
+
+def create_session(pool_size=4, retries=2):
+    """Create a pooled requests session with retries on transient errors"""
+    # requests is only needed once something is fetched, so keep it off the import path
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    )
+    # Without retries, 5xx answers come back as responses for the caller to handle
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry if retries else 0)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def content_version(content):
+    """Short content hash used as the data version of a snapshot"""
+    return hashlib.sha1(content).hexdigest()[:12]
+
+
+def store_for_url(url, cache_dir=CACHE_DIR):
+    """Shared snapshot store dedicated to one source URL"""
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    return SharedSnapshotStore(os.path.join(cache_dir, name), suffix=".snap")
+
+
+def encode_for_store(content):
+    """Convert fetched JSON to the binary snapshot format, keeping JSON as the fallback"""
+    if SNAPSHOT_FORMAT != "binary" or snapshot_format.is_binary_snapshot(content):
+        return content
+    try:
+        with metrics.LOADER_SECONDS.time(stage="encode"):
+            return snapshot_format.encode(json.loads(content))
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ Could not convert snapshot to binary, publishing JSON: {e}")
+        return content
+
+
+def decode_snapshot(buffer):
+    """Decode a binary or JSON snapshot into a data_dict for build_current_data"""
+    if snapshot_format.is_binary_snapshot(buffer):
+        return snapshot_format.decode(buffer)
+    return json.loads(bytes(buffer))
+
+
+class SnapshotFetcher:
+    """Conditional GET of a remote snapshot, published to a shared store"""
+
+    def __init__(self, url, store, session=None, timeout=REQUEST_TIMEOUT, session_factory=create_session,
+                 history=None):
+        self.url = url
+        self.store = store
+        self.history = history
+        self._session = session
+        self.session_factory = session_factory
+        self.timeout = timeout
+        self.meta_path = os.path.join(store.directory, "validators.json")
+        self.etag = None
+        self.last_modified = None
+        self.version = None
+        self._read_meta()
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = self.session_factory()
+        return self._session
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.etag = meta.get("etag")
+        self.last_modified = meta.get("last_modified")
+        self.version = meta.get("version")
+
+    def _write_meta(self):
+        meta = {"etag": self.etag, "last_modified": self.last_modified, "version": self.version}
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def fetch(self):
+        """Fetch the source and publish it if it changed; return True on a new version"""
+        headers = {}
+        # Validators are only useful while the matching snapshot is still published
+        if self.version is not None and self.version == self.store.current_version():
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+
+        try:
+            with metrics.LOADER_SECONDS.time(stage="fetch"):
+                response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+                content = response.content
+            if response.status_code == 304:
+                metrics.FETCHES.inc(result="not_modified")
+                return False
+            response.raise_for_status()
+        except Exception:
+            metrics.FETCHES.inc(result="error")
+            raise
+
+        metrics.FETCH_BYTES.inc(len(content))
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        return self.publish(content)
+
+    def publish(self, content):
+        """Publish fetched JSON to the store unless it is the current version; return True if it changed"""
+        version = content_version(content)
+        changed = version != self.store.current_version()
+        if changed:
+            self.store.publish(encode_for_store(content), version)
+        metrics.FETCHES.inc(result="changed" if changed else "unchanged")
+        self.version = version
+        self._write_meta()
+        return changed
+
+    def record_history(self):
+        """Append the store's current snapshot to the history if it is not the latest entry there"""
+        if self.history is None:
+            return False
+        version = self.store.current_version()
+        if version is None or version == self.history.latest_version():
+            return False
+        try:
+            _, mapped = self.store.open_current()
+            return self.history.append(version, decode_snapshot(mapped))
+        except Exception as e:
+            print(f"⚠️ Could not record snapshot {version} in the history: {e}")
+            return False
+
+
+class BackgroundRefresher:
+    """Keep a worker's copy of the data in step with the shared snapshot store"""
+
+    def __init__(self, fetcher, parse, on_update, interval=REFRESH_INTERVAL,
+                 check_interval=STORE_CHECK_INTERVAL):
+        self.fetcher = fetcher
+        self.store = fetcher.store
+        self.parse = parse
+        self.on_update = on_update
+        self.interval = interval
+        self.check_interval = min(check_interval, interval)
+        self.loaded_version = None
+        self.last_checked = None
+        self.last_updated = None
+        self.last_error = None
+        self._last_fetch = 0
+        self._handled_request = self.store.refresh_requested_at()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Start the poller thread; safe to call repeatedly and after a fork"""
+        with self._lock:
+            # Threads do not survive fork, so gunicorn workers restart their own
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="portfolio-refresher", daemon=True)
+            self._thread.start()
+
+    def request_refresh(self):
+        """Ask the writer to check the source now without waiting for it"""
+        self.start()
+        self.store.request_refresh()
+        self._wake.set()
+
+    def fetch_if_writer(self, force=False):
+        """Fetch from the source if this process holds the writer lock and it is due"""
+        requested = self.store.refresh_requested_at()
+        due = force or requested > self._handled_request or time.time() - self._last_fetch >= self.interval
+        if not due or not self.store.acquire_writer():
+            return False
+        self._handled_request = requested
+        self._last_fetch = time.time()
+        self.last_checked = self._last_fetch
+        try:
+            changed = self.fetcher.fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Error refreshing data from GitHub: {e}")
+            return False
+        self.last_error = None
+        # Also catches up on a snapshot published before the history existed
+        self.fetcher.record_history()
+        return changed
+
+    def load_current(self):
+        """Load the store's current snapshot, whatever this worker already has; None if empty"""
+        version, _ = self.store.current()
+        if version is None:
+            return None
+        try:
+            version, mapped = self.store.open_current()
+            with metrics.LOADER_SECONDS.time(stage="decode"):
+                data_dict = decode_snapshot(mapped)
+            if not snapshot_format.is_binary_snapshot(mapped):
+                # JSON was parsed into new objects; binary arrays still view the map
+                mapped.close()
+            with metrics.LOADER_SECONDS.time(stage="build"):
+                data = self.parse(data_dict, version)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Error loading shared snapshot {version}: {e}")
+            return None
+        self.loaded_version = version
+        self.last_updated = time.time()
+        return data
+
+    def load_if_newer(self):
+        """Load the store's current snapshot if it differs from ours; return the data or None"""
+        version = self.store.current_version()
+        if version is None or version == self.loaded_version:
+            return None
+        return self.load_current()
+
+    def refresh_once(self, force=False):
+        """Run one poll cycle; return True if new data was published to this worker"""
+        self.fetch_if_writer(force=force)
+        data = self.load_if_newer()
+        if data is None:
+            return False
+        self.on_update(data)
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            self.refresh_once()
@@ -0,0 +1,86 @@
+"""Point-budget downsampling for the time-series charts.
+
+Long daily (or intraday) histories are reduced to a fixed number of points
+before they are sent to the browser. Two methods are available:
+
+* ``lttb`` - Largest-Triangle-Three-Buckets, which keeps the visual shape of
+  a line with very few points;
+* ``minmax`` - the minimum and maximum of each bucket, which never hides a
+  spike (useful for drawdowns).
+
+Charts sharing an x axis are downsampled to the union of the indices picked
+for each of their series, so all traces stay aligned.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    """Indices selected by Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        start, end = edges[b], edges[b + 1]
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """Indices of the minimum and maximum of each of n_out / 2 buckets"""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(int)
+    picks = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = y[start:end]
+            picks.extend((start + int(np.argmin(bucket)), start + int(np.argmax(bucket))))
+    return np.unique(picks)
+
+
+def select_indices(x, ys, budget, method="lttb"):
+    """Indices to keep so that every series in ys fits the point budget together"""
+    n = len(x)
+    if n <= budget or not ys:
+        return np.arange(n)
+    per_series = max(budget // len(ys), 4)
+    picks = [lttb_indices(x, y, per_series) if method == "lttb" else minmax_indices(y, per_series)
+             for y in ys]
+    return np.unique(np.concatenate(picks))
+
+
+def as_datetime_index(dates):
+    """Numeric (int64 ns) positions for ISO date strings or datetime64 values"""
+    return pd.to_datetime(np.asarray(dates)).values.astype("datetime64[ns]").astype(np.int64)
+
+
+def parse_x_range(relayout_data):
+    """Visible x range from a graph's relayoutData as int64 ns, 'auto', or None"""
+    if not relayout_data:
+        return None
+    if relayout_data.get("xaxis.autorange"):
+        return "auto"
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        bounds = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    elif "xaxis.range" in relayout_data:
+        bounds = relayout_data["xaxis.range"]
+    else:
+        return None
+    return tuple(pd.Timestamp(b).value for b in bounds)
@@ -0,0 +1,333 @@
+"""Append-only on-disk history of every published portfolio version.
+
+Each source keeps a ``history`` directory next to its snapshot store:
+
+    history.log   | length-prefixed, zlib-compressed JSON records, append-only
+    history.idx   | one fixed-width row per record (see INDEX_DTYPE), append-only
+    calendar.bin  | int32 day numbers of every date seen, append-only
+
+A record stores one version's keyed tables (holdings by Ticker, risk
+contributions by Ticker and by Sector) and its scalar risk metrics. Every
+KEYFRAME_INTERVAL-th record is a keyframe with full tables. The others only
+hold the cells that changed since the previous version, plus added and
+dropped rows. ``dates`` is never stored per version: each record lists runs
+of indices into the shared calendar, so years of overlapping history cost a
+few integers per snapshot.
+
+The index is sorted by snapshot date (the last entry of ``dates``), so finding
+the version in effect N days ago is a binary search. Rebuilding it replays at
+most KEYFRAME_INTERVAL records. Only the worker holding the snapshot store's
+writer lock appends; readers pick up new rows when the index grows.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache
+
+# Every n-th record holds full tables; the rest are deltas against the previous version
+KEYFRAME_INTERVAL = int(os.environ.get("HISTORY_KEYFRAME_INTERVAL", 30))
+
+# Keyed tables kept per version and the column that identifies a row
+TABLES = {
+    'portfolio': 'Ticker',
+    'component_var_df': 'Ticker',
+    'sector_contrib_pct': 'Sector',
+}
+
+# Scalar risk metrics kept per version
+METRICS = ('total_value', 'portfolio_vol_annual', 'beta_full', 'VaR_pct', 'CVaR_pct',
+           'max_drawdown', 'var_threshold', 'cvar_threshold')
+
+INDEX_DTYPE = np.dtype([
+    ('as_of', '<i8'),          # snapshot date, days since the epoch
+    ('recorded_at', '<f8'),    # when the version was appended
+    ('offset', '<u8'),         # record position in history.log
+    ('length', '<u4'),
+    ('keyframe', '<u4'),       # record number of the keyframe this record builds on
+    ('version', 'S16'),
+])
+
+_LENGTH = struct.Struct("<I")
+
+
+def _native(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _same(a, b):
+    return a == b or (isinstance(a, float) and isinstance(b, float) and a != a and b != b)
+
+
+def _keyed_rows(table, key):
+    """{key: {column: value}} and the column order of a records list or DataFrame"""
+    frame = pd.DataFrame(table)
+    if frame.empty or key not in frame.columns:
+        return {}, []
+    records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+    return {str(r[key]): r for r in records}, list(frame.columns)
+
+
+def table_delta(previous, current):
+    """Cells of current that differ from previous, plus added/dropped rows and order changes"""
+    prev_rows, prev_columns = previous
+    rows, columns = current
+    delta = {}
+    if columns != prev_columns:
+        delta['columns'] = columns
+    changed = {}
+    for key, row in rows.items():
+        before = prev_rows.get(key)
+        cells = row if before is None else {c: v for c, v in row.items() if c not in before or not _same(v, before[c])}
+        if cells:
+            changed[key] = cells
+    if changed:
+        delta['set'] = changed
+    dropped = [key for key in prev_rows if key not in rows]
+    if dropped:
+        delta['drop'] = dropped
+    # Order after applying the delta: survivors in their old order, then new rows
+    implied = [k for k in prev_rows if k in rows] + [k for k in rows if k not in prev_rows]
+    if implied != list(rows):
+        delta['order'] = list(rows)
+    return delta
+
+
+def apply_delta(previous, delta):
+    prev_rows, prev_columns = previous
+    columns = delta.get('columns', prev_columns)
+    dropped = set(delta.get('drop', ()))
+    changed = delta.get('set', {})
+    rows = {k: dict(r) for k, r in prev_rows.items() if k not in dropped}
+    for key, cells in changed.items():
+        rows.setdefault(key, {}).update(cells)
+    # Columns that disappeared from the table disappear from every row
+    if 'columns' in delta:
+        rows = {k: {c: r.get(c) for c in columns} for k, r in rows.items()}
+    if 'order' in delta:
+        rows = {k: rows[k] for k in delta['order']}
+    return rows, columns
+
+
+class HistoryStore:
+    """Append-only, delta-encoded history of one portfolio source"""
+
+    def __init__(self, directory, keyframe_interval=KEYFRAME_INTERVAL, cache_size=16):
+        self.directory = directory
+        self.keyframe_interval = max(int(keyframe_interval), 1)
+        self.log_path = os.path.join(directory, "history.log")
+        self.index_path = os.path.join(directory, "history.idx")
+        self.calendar_path = os.path.join(directory, "calendar.bin")
+        os.makedirs(directory, exist_ok=True)
+        self._index = np.empty(0, dtype=INDEX_DTYPE)
+        self._order = np.empty(0, dtype=np.int64)
+        self._calendar = np.empty(0, dtype='<i4')
+        self._calendar_lookup = {}
+        self._states = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+        self._last = None
+
+    # --- reader side ---
+
+    def _refresh(self):
+        """Pick up rows and calendar days appended since the last look"""
+        with self._lock:
+            try:
+                index_size = os.path.getsize(self.index_path)
+            except OSError:
+                return
+            # Only whole rows: the writer may be half-way through appending one
+            count = index_size // INDEX_DTYPE.itemsize
+            if count != len(self._index):
+                self._index = np.fromfile(self.index_path, dtype=INDEX_DTYPE, count=count)
+                self._order = np.argsort(self._index['as_of'], kind='stable')
+            calendar_size = os.path.getsize(self.calendar_path) // 4 if os.path.exists(self.calendar_path) else 0
+            if calendar_size != len(self._calendar):
+                self._calendar = np.fromfile(self.calendar_path, dtype='<i4', count=calendar_size)
+
+    def __len__(self):
+        self._refresh()
+        return len(self._index)
+
+    def versions(self):
+        """One row per stored version: snapshot date, recorded time and content version"""
+        self._refresh()
+        index = self._index[self._order]
+        return pd.DataFrame({
+            'as_of': index['as_of'].astype('datetime64[D]'),
+            'recorded_at': pd.to_datetime(index['recorded_at'], unit='s'),
+            'version': [v.decode('ascii') for v in index['version']],
+        })
+
+    def _read_record(self, row):
+        with open(self.log_path, 'rb') as f:
+            f.seek(int(row['offset']) + _LENGTH.size)
+            return json.loads(zlib.decompress(f.read(int(row['length']))))
+
+    def _tables_at(self, number):
+        """Keyed tables of record `number`, replayed from its keyframe"""
+        row = self._index[number]
+        tables = None
+        for i in range(int(row['keyframe']), number + 1):
+            record = self._read_record(self._index[i])
+            if record['keyframe']:
+                tables = {name: (t['rows'], t['columns']) for name, t in record['tables'].items()}
+            else:
+                tables = {name: apply_delta(tables.get(name, ({}, [])), delta)
+                          for name, delta in record['tables'].items()}
+        return tables, record
+
+    def state(self, number):
+        """Full state of the number-th appended version (cached)"""
+        self._refresh()
+        cached = self._states.get(number)
+        if cached is not None:
+            return cached
+        tables, record = self._tables_at(number)
+        runs = record['dates']
+        calendar_index = np.concatenate([np.arange(a, b) for a, b in runs]) if runs else np.empty(0, dtype=np.int64)
+        state = {
+            'version': record['version'],
+            'as_of': np.datetime64(int(self._index[number]['as_of']), 'D'),
+            'recorded_at': float(self._index[number]['recorded_at']),
+            'dates': self._calendar[calendar_index].astype('datetime64[D]'),
+            'metrics': record['metrics'],
+            'tables': {name: pd.DataFrame(list(rows.values()), columns=columns)
+                       for name, (rows, columns) in tables.items()},
+        }
+        self._states.put(number, state)
+        return state
+
+    def at(self, as_of):
+        """State of the latest version whose snapshot date is on or before as_of; None if none"""
+        self._refresh()
+        dates = self._index['as_of'][self._order]
+        position = np.searchsorted(dates, np.datetime64(as_of, 'D').astype(np.int64), side='right') - 1
+        if position < 0:
+            return None
+        return self.state(int(self._order[position]))
+
+    def latest_version(self):
+        """Content version of the most recently appended record, without replaying it"""
+        self._refresh()
+        return self._index[-1]['version'].decode('ascii') if len(self._index) else None
+
+    def latest(self):
+        self._refresh()
+        return self.state(int(self._order[-1])) if len(self._order) else None
+
+    def days_ago(self, days, reference=None):
+        """State in effect `days` calendar days before reference (default: the latest snapshot date)"""
+        latest = self.latest()
+        if latest is None:
+            return None
+        reference = np.datetime64(reference, 'D') if reference is not None else latest['as_of']
+        return self.at(reference - np.timedelta64(int(days), 'D'))
+
+    # --- writer side ---
+
+    def _calendar_runs(self, dates):
+        """Runs [start, stop) of calendar indices for dates, appending unseen days"""
+        if not len(self._calendar_lookup) and len(self._calendar):
+            self._calendar_lookup = {int(d): i for i, d in enumerate(self._calendar)}
+        days = pd.to_datetime(np.asarray(dates)).values.astype('datetime64[D]').astype(np.int64)
+        new_days = [int(d) for d in dict.fromkeys(days.tolist()) if int(d) not in self._calendar_lookup]
+        if new_days:
+            with open(self.calendar_path, 'ab') as f:
+                f.write(np.asarray(new_days, dtype='<i4').tobytes())
+            for d in new_days:
+                self._calendar_lookup[d] = len(self._calendar_lookup)
+            self._calendar = np.append(self._calendar, np.asarray(new_days, dtype='<i4'))
+        positions = np.fromiter((self._calendar_lookup[d] for d in days.tolist()), dtype=np.int64, count=len(days))
+        if not len(positions):
+            return [], None
+        breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+        starts = np.concatenate(([0], breaks))
+        stops = np.concatenate((breaks, [len(positions)]))
+        return [[int(positions[a]), int(positions[b - 1]) + 1] for a, b in zip(starts, stops)], int(days[-1])
+
+    def append(self, version, data_dict, recorded_at=None):
+        """Append one version; a repeat of the latest version is ignored. Returns True if written."""
+        self._refresh()
+        with self._lock:
+            if self._last is None and len(self._index):
+                tables, _ = self._tables_at(len(self._index) - 1)
+                self._last = (self._index[-1]['version'].decode('ascii'), tables)
+            if self._last is not None and self._last[0] == version:
+                return False
+
+            recorded_at = time.time() if recorded_at is None else recorded_at
+            runs, last_day = self._calendar_runs(data_dict.get('dates', []))
+            as_of = last_day if last_day is not None else int(recorded_at // 86400)
+            tables = {name: _keyed_rows(data_dict.get(name, []), key) for name, key in TABLES.items()}
+
+            number = len(self._index)
+            keyframe = self._last is None or number % self.keyframe_interval == 0
+            record = {
+                'version': version,
+                'keyframe': keyframe,
+                'dates': runs,
+                'metrics': {k: data_dict.get(k) for k in METRICS},
+            }
+            if keyframe:
+                record['tables'] = {name: {'rows': rows, 'columns': columns} for name, (rows, columns) in tables.items()}
+            else:
+                record['tables'] = {name: table_delta(self._last[1].get(name, ({}, [])), tables[name])
+                                    for name in tables}
+            payload = zlib.compress(json.dumps(record, default=_native, separators=(',', ':')).encode('utf-8'))
+
+            # Record first, then its index row: readers only follow complete index rows
+            offset = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+            with open(self.log_path, 'ab') as f:
+                f.write(_LENGTH.pack(len(payload)) + payload)
+                f.flush()
+                os.fsync(f.fileno())
+            row = np.zeros(1, dtype=INDEX_DTYPE)
+            row[0] = (as_of, recorded_at, offset, len(payload),
+                      number if keyframe else int(self._index[-1]['keyframe']), version.encode('ascii')[:16])
+            with open(self.index_path, 'ab') as f:
+                f.write(row.tobytes())
+            self._index = np.append(self._index, row)
+            self._order = np.argsort(self._index['as_of'], kind='stable')
+            self._last = (version, tables)
+            return True
+
+
+def compare(then, now):
+    """Metric and per-holding differences between two states (then -> now)"""
+    metric_rows = [{'Metric': name, 'Then': then['metrics'].get(name), 'Now': now['metrics'].get(name)}
+                   for name in METRICS if then['metrics'].get(name) is not None or now['metrics'].get(name) is not None]
+    metrics = pd.DataFrame(metric_rows, columns=['Metric', 'Then', 'Now'])
+    metrics['Change'] = pd.to_numeric(metrics['Now'], errors='coerce') - pd.to_numeric(metrics['Then'], errors='coerce')
+
+    def holdings(state):
+        portfolio = state['tables'].get('portfolio', pd.DataFrame())
+        risk = state['tables'].get('component_var_df', pd.DataFrame())
+        frame = pd.DataFrame(index=pd.Index([], name='Ticker'))
+        if 'Ticker' in portfolio.columns:
+            frame = portfolio.set_index('Ticker')[[c for c in ('Sector', 'Weight', 'Current Value') if c in portfolio]]
+        held = frame.index
+        if 'Ticker' in risk.columns and 'ComponentVarPct' in risk.columns:
+            frame = frame.join(risk.set_index('Ticker')['ComponentVarPct'], how='outer')
+        return frame, held
+
+    (before, held_before), (after, held_after) = holdings(then), holdings(now)
+    merged = before.join(after, how='outer', lsuffix=' Then', rsuffix=' Now')
+    for column in ('Weight', 'Current Value', 'ComponentVarPct'):
+        if f'{column} Then' in merged and f'{column} Now' in merged:
+            merged[f'{column} Change'] = merged[f'{column} Now'].fillna(0) - merged[f'{column} Then'].fillna(0)
+    if 'Sector Then' in merged:
+        merged['Sector'] = merged.pop('Sector Now').fillna(merged.pop('Sector Then'))
+    status = np.where(merged.index.isin(held_before), 'held', 'added').astype(object)
+    status[~merged.index.isin(held_after)] = 'removed'
+    merged.insert(0, 'Status', status)
+    return {'metrics': metrics, 'holdings': merged.reset_index()}
@@ -0,0 +1,222 @@
+"""Compact, index-aligned holdings tables for one portfolio book.
+
+The export ships the holdings, the correlation matrix and the component-VaR
+and sector-risk tables as separate records lists, each repeating the ticker
+and sector strings. HoldingsStore rebuilds them around two shared indexes:
+
+* ``tickers`` - every ticker of the book (holdings first, then any extra ones
+  the risk tables mention), with interned strings so books that hold the same
+  stocks share them;
+* ``sectors`` - the sorted sector names.
+
+Ticker and Sector columns become categoricals over those indexes, so each
+table stores int8/int16 codes and one copy of the labels. Name and ISIN are
+unique per holding, where a categorical would only add a hash table, so they
+stay object columns of interned strings. Ratios, weights and percentages are
+stored as float32; currency amounts and quantities (EXACT_COLUMNS) stay
+float64 because their totals must be exact to the paisa. Integer columns are
+downcast to the smallest integer type.
+
+The correlation matrix is symmetric, so only its upper triangle is kept, row
+by row, as float32 against ticker codes: a quarter of the float64 matrix,
+which is most of a large book. ``correlation()`` unpacks it for the builders
+that need the square matrix; they are memoized per data version.
+
+The holding rows are also grouped by sector once: ``sector_order`` lists the
+rows sector by sector and ``sector_offsets[k]:sector_offsets[k + 1]`` is the
+slice of sector k, so a per-sector total is one ``np.add.reduceat`` and
+ticker -> sector lookups are integer gathers instead of string groupbys and
+reindexes.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Columns kept in float64: currency amounts and quantities that get summed
+EXACT_COLUMNS = frozenset({
+    'Quantity Available', 'Quantity Long Term', 'Average Price', 'Previous Closing Price',
+    'Current Value', 'Unrealized P&L', '1W Abs Change', '1M Abs Change',
+})
+
+# Free-text identifiers stored as interned strings
+IDENTIFIER_COLUMNS = ('Name', 'ISIN')
+
+
+def interned_index(labels):
+    """Object Index of interned strings (missing labels dropped, order kept)"""
+    return pd.Index([sys.intern(str(label)) for label in labels if isinstance(label, str) or pd.notna(label)],
+                    dtype=object)
+
+
+# Signed integer types tried, smallest first, when downcasting a numpy column
+INTEGER_TYPES = (np.int8, np.int16, np.int32)
+
+
+def compact_numeric(series):
+    """Smallest dtype that keeps a numeric column's precision (see EXACT_COLUMNS).
+
+    Numpy-typed columns come back as arrays, which the compact frame takes
+    without building a Series per column; others come back as Series.
+    """
+    values = series.to_numpy() if isinstance(series.dtype, np.dtype) else None
+    if values is not None and values.dtype.kind in 'iuf':
+        if values.dtype.kind == 'f':
+            return values.astype(np.float64 if series.name in EXACT_COLUMNS else np.float32, copy=False)
+        if len(values):
+            low, high = values.min(), values.max()
+            for dtype in INTEGER_TYPES:
+                if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                    return values.astype(dtype)
+        return values
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if series.name in EXACT_COLUMNS:
+        return series.astype(np.float64)
+    return series.astype(np.float32)
+
+
+class HoldingsStore:
+    """Holdings, correlation and risk tables of one book on shared ticker/sector indexes"""
+
+    def __init__(self, portfolio, corr_matrix=None, component_var_df=None, sector_contrib_pct=None):
+        portfolio = pd.DataFrame(portfolio)
+        corr_matrix = pd.DataFrame(corr_matrix) if corr_matrix is not None else pd.DataFrame()
+        component_var_df = pd.DataFrame(component_var_df) if component_var_df is not None else pd.DataFrame()
+        sector_contrib_pct = pd.DataFrame(sector_contrib_pct) if sector_contrib_pct is not None else pd.DataFrame()
+
+        corr_tickers, corr_values = self._split_corr(corr_matrix)
+        held = portfolio['Ticker'].tolist() if 'Ticker' in portfolio.columns else []
+        risk = component_var_df['Ticker'].tolist() if 'Ticker' in component_var_df.columns else []
+        self.tickers = interned_index(pd.unique(pd.Series(held + list(corr_tickers) + risk, dtype=object)))
+        sectors = portfolio['Sector'].tolist() if 'Sector' in portfolio.columns else []
+        sectors += sector_contrib_pct['Sector'].tolist() if 'Sector' in sector_contrib_pct.columns else []
+        self.sectors = interned_index(sorted({s for s in sectors if isinstance(s, str)}))
+        self.ticker_dtype = pd.CategoricalDtype(self.tickers)
+        self.sector_dtype = pd.CategoricalDtype(self.sectors)
+
+        self.portfolio = self._compact(portfolio)
+        self.component_var_df = self._compact(component_var_df)
+        self.sector_contrib_pct = self._compact(sector_contrib_pct)
+
+        # Correlations: the packed float32 upper triangle over ticker codes
+        self.corr_codes = self.tickers.get_indexer(corr_tickers).astype(np.int32)
+        self.corr_packed = np.asarray(corr_values, dtype=np.float32)[np.triu_indices(len(corr_tickers))]
+
+        # Ticker -> sector code (-1 when unknown) and rows grouped by sector
+        self.holding_codes = self.codes(self.portfolio, 'Ticker')
+        self.holding_sectors = self.codes(self.portfolio, 'Sector')
+        self.ticker_sector = np.full(len(self.tickers), -1, dtype=np.int32)
+        known = self.holding_codes >= 0
+        self.ticker_sector[self.holding_codes[known]] = self.holding_sectors[known]
+        self.sector_order = np.argsort(self.holding_sectors, kind='stable').astype(np.int32)
+        counts = np.bincount(self.holding_sectors[self.holding_sectors >= 0], minlength=len(self.sectors))
+        unsectored = int((self.holding_sectors < 0).sum())
+        self.sector_order = self.sector_order[unsectored:]  # Rows without a sector sort first
+        self.sector_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    @staticmethod
+    def _split_corr(corr_matrix):
+        # The label column is 'Ticker' in the JSON export and 'index' in older files
+        if corr_matrix.empty:
+            return [], np.empty((0, 0))
+        label_col = next((c for c in ('Ticker', 'index') if c in corr_matrix.columns), None)
+        if label_col is None:
+            return corr_matrix.columns.tolist(), corr_matrix.to_numpy(dtype=float)
+        return corr_matrix[label_col].tolist(), corr_matrix.drop(label_col, axis=1).to_numpy(dtype=float)
+
+    def _compact(self, frame):
+        columns = {}
+        for name, column in frame.items():
+            if name == 'Ticker':
+                columns[name] = pd.Categorical(column, dtype=self.ticker_dtype)
+            elif name == 'Sector':
+                columns[name] = pd.Categorical(column, dtype=self.sector_dtype)
+            elif name in IDENTIFIER_COLUMNS:
+                columns[name] = pd.Series([sys.intern(v) if isinstance(v, str) else v for v in column],
+                                          index=frame.index, dtype=object)
+            else:
+                columns[name] = compact_numeric(column)
+        return pd.DataFrame(columns, index=frame.index)
+
+    def correlation(self, dtype=np.float64):
+        """(tickers, correlation matrix) unpacked from the stored triangle.
+
+        The triangle is float32, so a float32 matrix loses nothing and takes
+        half the memory for callers that copy it anyway.
+        """
+        n = len(self.corr_codes)
+        corr = np.empty((n, n), dtype=dtype)
+        for i in range(n):
+            start = i * n - i * (i - 1) // 2
+            row = self.corr_packed[start:start + n - i]
+            corr[i, i:] = row
+            corr[i:, i] = row
+        return self.tickers[self.corr_codes].tolist(), corr
+
+    def codes(self, frame, column):
+        """int32 codes of a Ticker/Sector column of one of the store's tables (-1 when missing)"""
+        if column not in frame.columns:
+            return np.full(len(frame), -1, dtype=np.int32)
+        return frame[column].cat.codes.to_numpy().astype(np.int32)
+
+    def ticker_codes(self, tickers):
+        """Codes of ticker labels in the shared index (-1 for unknown tickers)"""
+        return self.tickers.get_indexer(list(tickers)).astype(np.int32)
+
+    def sectors_of(self, codes, missing='UNKNOWN'):
+        """Sector name of each ticker code, from an integer gather"""
+        sector_codes = self.ticker_sector[codes]
+        names = self.sectors.to_numpy()[np.maximum(sector_codes, 0)] if len(self.sectors) else np.empty(len(codes), dtype=object)
+        return np.where((codes >= 0) & (sector_codes >= 0), names, missing)
+
+    def by_ticker(self, frame, column, codes, fill=0.0):
+        """Values of a table column reordered onto ticker codes (fill where absent)"""
+        values = np.full(len(self.tickers) + 1, fill, dtype=float)  # Last slot catches code -1
+        table_codes = self.codes(frame, 'Ticker')
+        keep = table_codes >= 0
+        values[table_codes[keep]] = frame[column].to_numpy(dtype=float)[keep]
+        return values[np.where(np.asarray(codes) >= 0, codes, len(self.tickers))]
+
+    def square_by_ticker(self, matrix, matrix_tickers, codes):
+        """Rows and columns of a ticker x ticker matrix reordered onto ticker codes (None if any is absent)"""
+        positions = np.full(len(self.tickers) + 1, -1, dtype=np.int64)  # Last slot catches code -1
+        matrix_codes = self.ticker_codes(matrix_tickers)
+        keep = matrix_codes >= 0
+        positions[matrix_codes[keep]] = np.flatnonzero(keep)
+        rows = positions[np.where(np.asarray(codes) >= 0, codes, len(self.tickers))]
+        if (rows < 0).any():
+            return None
+        return matrix[np.ix_(rows, rows)]
+
+    def sector_sum(self, values):
+        """Per-sector totals of a per-holding array, via the precomputed sector offsets"""
+        values = np.asarray(values, dtype=float)[self.sector_order]
+        if not len(values):
+            return np.zeros(len(self.sectors))
+        starts = np.minimum(self.sector_offsets[:-1], len(values) - 1)
+        totals = np.add.reduceat(values, starts)
+        # reduceat returns the element at the start for empty groups
+        return np.where(np.diff(self.sector_offsets) > 0, totals, 0.0)
+
+    def sector_weights(self):
+        """Sector / Weight table summed from the holdings' weights"""
+        if 'Weight' not in self.portfolio.columns or not len(self.sectors):
+            return pd.DataFrame()
+        totals = self.sector_sum(np.nan_to_num(self.portfolio['Weight'].to_numpy(dtype=float)))
+        held = np.diff(self.sector_offsets) > 0
+        return pd.DataFrame({'Sector': pd.Categorical.from_codes(np.flatnonzero(held), dtype=self.sector_dtype),
+                             'Weight': totals[held]})
+
+    def held_sectors(self):
+        """Names of the sectors with at least one holding, sorted"""
+        return self.sectors[np.diff(self.sector_offsets) > 0].tolist()
+
+    @property
+    def nbytes(self):
+        """Bytes of the index arrays (the tables and packed correlations are counted where the data holds them)"""
+        return int(sum(a.nbytes for a in (self.corr_codes, self.holding_codes, self.holding_sectors,
+                                          self.ticker_sector, self.sector_order, self.sector_offsets)))
@@ -0,0 +1,352 @@
+"""Multi-resource ingest: holdings, per-ticker price histories and a benchmark.
+
+Instead of one pre-built ``portfolio_data.json``, a portfolio source can be a
+manifest of separate resources (an object in PORTFOLIO_SOURCES instead of a
+URL):
+
+    {"holdings": "https://host/holdings.json",
+     "prices": "https://host/prices/{ticker}.csv",
+     "benchmark": "^NSEI",
+     "history_days": 500}
+
+``holdings`` is a list of holding records (or a document with a
+``portfolio`` list, whose ``nudges``, ``sector_dist`` and ``risk_summary`` are
+kept). ``prices`` is a URL template filled with each URL-quoted ticker, and
+the benchmark is fetched through the same template. A price history is CSV
+(``Date,Close`` with an optional ``Adj Close``) or JSON records of the same
+columns.
+
+ManifestFetcher fetches every history concurrently on a bounded thread pool
+over one pooled session, one connection per worker. Each request has the
+loader's (connect, read) timeouts, is retried with jittered exponential
+backoff on connection errors, timeouts and 429/5xx answers (honouring
+Retry-After), and is revalidated with its ETag / Last-Modified on the next
+round, so unchanged histories cost a 304.
+
+A failed holdings request fails the round and leaves the published snapshot
+in place. A failed history falls back to the last good copy of that ticker;
+tickers with no copy at all are left out of the return series, unless more
+than INGEST_MAX_MISSING_SHARE of the holdings are, which fails the round.
+
+The assembled document has the export's shape - holdings re-valued at the
+latest closes, dates, portfolio and benchmark returns, per-asset returns - and
+goes through the same snapshot store, so build_current_data derives the risk
+series and tables from it as it does for a richer export.
+"""
+
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import metrics
+
+# Parallel history requests per ingest round (and pooled connections)
+INGEST_WORKERS = int(os.environ.get("PORTFOLIO_INGEST_WORKERS", 16))
+
+# Retries per request and the backoff they start from and are capped at, in seconds
+INGEST_RETRIES = int(os.environ.get("PORTFOLIO_INGEST_RETRIES", 3))
+INGEST_BACKOFF = float(os.environ.get("PORTFOLIO_INGEST_BACKOFF", 0.5))
+INGEST_MAX_BACKOFF = 8.0
+
+# Largest share of holdings allowed to have no price history before a round fails
+INGEST_MAX_MISSING_SHARE = float(os.environ.get("PORTFOLIO_INGEST_MAX_MISSING_SHARE", 0.5))
+
+# Statuses worth retrying; other errors fail the request at once
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Keys of a holdings document carried into the assembled snapshot
+PASSTHROUGH_KEYS = ('nudges', 'sector_dist', 'risk_summary')
+
+DEFAULT_BENCHMARK = '^NSEI'
+
+
+def manifest_key(manifest):
+    """Stable string naming a manifest, used to pick its snapshot store"""
+    return json.dumps(manifest, sort_keys=True)
+
+
+class RetryableStatus(Exception):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code} from {response.url}")
+        self.retry_after = response.headers.get("Retry-After")
+
+
+class ResourceClient:
+    """GETs with per-request timeouts, retries with backoff and conditional revalidation"""
+
+    def __init__(self, session, timeout=data_loader.REQUEST_TIMEOUT, retries=INGEST_RETRIES,
+                 backoff=INGEST_BACKOFF, sleep=time.sleep):
+        self.session = session
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self._cached = {}   # url -> (etag, last_modified, content)
+        self._lock = threading.Lock()
+
+    def delay(self, attempt, retry_after=None):
+        """Jittered exponential backoff, at least Retry-After when the server sent seconds"""
+        delay = min(INGEST_MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+        try:
+            return min(INGEST_MAX_BACKOFF, max(delay, float(retry_after)))
+        except (TypeError, ValueError):
+            return delay
+
+    def get(self, url, resource):
+        """Body of url, or its cached body on a 304; raises once the retries are spent"""
+        import requests
+
+        with self._lock:
+            cached = self._cached.get(url)
+        headers = {}
+        if cached is not None:
+            if cached[0]:
+                headers["If-None-Match"] = cached[0]
+            if cached[1]:
+                headers["If-Modified-Since"] = cached[1]
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES:
+                    raise RetryableStatus(response)
+                if response.status_code == 304 and cached is not None:
+                    metrics.INGEST_REQUESTS.inc(resource=resource, result="not_modified")
+                    return cached[2]
+                response.raise_for_status()
+                content = response.content
+            except (requests.ConnectionError, requests.Timeout, RetryableStatus) as e:
+                if attempt == self.retries:
+                    metrics.INGEST_REQUESTS.inc(resource=resource, result="error")
+                    raise
+                metrics.INGEST_REQUESTS.inc(resource=resource, result="retry")
+                self.sleep(self.delay(attempt, getattr(e, "retry_after", None)))
+                continue
+            except Exception:
+                metrics.INGEST_REQUESTS.inc(resource=resource, result="error")
+                raise
+
+            metrics.INGEST_REQUESTS.inc(resource=resource, result="ok")
+            metrics.FETCH_BYTES.inc(len(content))
+            with self._lock:
+                self._cached[url] = (response.headers.get("ETag"), response.headers.get("Last-Modified"), content)
+            return content
+
+    def retain(self, urls):
+        """Forget the cached bodies of every URL not in urls"""
+        urls = set(urls)
+        with self._lock:
+            self._cached = {url: entry for url, entry in self._cached.items() if url in urls}
+
+
+def parse_history(content):
+    """Close prices indexed by day from a CSV or JSON price history"""
+    if content.lstrip()[:1] in (b'[', b'{'):
+        document = json.loads(content)
+        if isinstance(document, dict) and 'prices' in document:
+            document = document['prices']
+        frame = pd.DataFrame(document)
+    else:
+        frame = pd.read_csv(io.BytesIO(content))
+    date_col = next((c for c in frame.columns if str(c).lower() == 'date'), None)
+    close_col = next((c for c in ('Adj Close', 'Close', 'close', 'price') if c in frame.columns), None)
+    if date_col is None or close_col is None:
+        raise ValueError(f"price history needs Date and Close columns, got {list(frame.columns)}")
+    closes = pd.Series(pd.to_numeric(frame[close_col], errors='coerce').to_numpy(dtype=float),
+                       index=pd.DatetimeIndex(pd.to_datetime(frame[date_col])).normalize())
+    closes = closes[closes > 0]
+    closes = closes[~closes.index.duplicated(keep='last')].sort_index()
+    if closes.empty:
+        raise ValueError("price history has no valid closes")
+    return closes
+
+
+def _assign(portfolio, column, rows, values):
+    # Whole-column float assignment, so integer or missing columns take the new values
+    current = (portfolio[column].to_numpy(dtype=float, na_value=np.nan) if column in portfolio.columns
+               else np.full(len(portfolio), np.nan))
+    portfolio[column] = np.where(rows, values, current)
+
+
+def revalue_holdings(portfolio, closes):
+    """Holdings with the price-derived columns recomputed from the latest closes"""
+    portfolio = portfolio.copy()
+    if 'Ticker' not in portfolio.columns or closes.empty:
+        return portfolio
+    price = portfolio['Ticker'].map(closes.iloc[-1]).to_numpy(dtype=float, na_value=np.nan)
+    priced = ~np.isnan(price)
+    if 'Quantity Available' in portfolio.columns:
+        quantity = pd.to_numeric(portfolio['Quantity Available'], errors='coerce').to_numpy(dtype=float)
+        value = quantity * price
+        _assign(portfolio, 'Previous Closing Price', priced, price)
+        _assign(portfolio, 'Current Value', priced, value)
+        for label, periods in (('1W', 5), ('1M', 21)):
+            if len(closes) <= periods:
+                continue
+            past = portfolio['Ticker'].map(closes.iloc[-1 - periods]).to_numpy(dtype=float, na_value=np.nan)
+            known = priced & ~np.isnan(past)
+            _assign(portfolio, f'{label} % Change', known, price / past - 1)
+            _assign(portfolio, f'{label} Abs Change', known, quantity * (price - past))
+        if 'Average Price' in portfolio.columns:
+            average = pd.to_numeric(portfolio['Average Price'], errors='coerce').to_numpy(dtype=float)
+            cost = quantity * average
+            with np.errstate(divide='ignore', invalid='ignore'):
+                _assign(portfolio, 'Unrealized P&L', priced, value - cost)
+                _assign(portfolio, 'Unrealized P&L Pct.', priced, (value - cost) / cost * 100)
+                _assign(portfolio, 'Drawdown %', priced, price / average - 1)
+    if 'Current Value' in portfolio.columns:
+        total = portfolio['Current Value'].sum()
+        portfolio['Weight'] = portfolio['Current Value'] / total if total else 0.0
+    if 'Unrealized P&L' in portfolio.columns:
+        total_pnl = portfolio['Unrealized P&L'].sum()
+        portfolio['Profit Contribution %'] = portfolio['Unrealized P&L'] / total_pnl if total_pnl else 0.0
+    return portfolio
+
+
+def assemble_document(portfolio, histories, benchmark_closes=None, benchmark=DEFAULT_BENCHMARK,
+                      history_days=None, passthrough=None):
+    """portfolio_data.json-shaped document from holdings and per-ticker close histories"""
+    closes = pd.DataFrame(histories).sort_index()
+    # Trade on the benchmark's calendar; a ticker's last close carries over its own holidays
+    calendar = benchmark_closes.index if benchmark_closes is not None else closes.index
+    closes = closes.reindex(closes.index.union(calendar)).ffill().reindex(calendar)
+    if history_days:
+        closes = closes.iloc[-(history_days + 1):]
+    portfolio = revalue_holdings(portfolio, closes)
+
+    tickers = list(closes.columns)
+    returns = closes.pct_change(fill_method=None).iloc[1:].fillna(0.0)  # 0 before a ticker listed
+    held = (portfolio['Weight'] if 'Weight' in portfolio.columns else pd.Series(1.0, index=portfolio.index))
+    weights = held.groupby(portfolio['Ticker']).sum().reindex(tickers).fillna(0.0).to_numpy(dtype=float)
+    priced_weight = weights.sum()
+    portfolio_returns = returns.to_numpy() @ (weights / priced_weight) if priced_weight else np.zeros(len(returns))
+    if benchmark_closes is not None:
+        bench = benchmark_closes.reindex(closes.index).ffill()
+        benchmark_returns = bench.pct_change(fill_method=None).iloc[1:].fillna(0.0).to_numpy()
+    else:
+        benchmark_returns = np.array([])
+
+    dates = returns.index.strftime('%Y-%m-%d').tolist()
+    asset_returns = returns.copy()
+    asset_returns.insert(0, 'Date', dates)
+
+    def period_return(values, periods):
+        return float(np.prod(1 + values[-periods:]) - 1) if len(values) else 0.0
+
+    comparison = {'Portfolio': {label: period_return(portfolio_returns, n) for label, n in (('1W', 5), ('1M', 21))}}
+    if len(benchmark_returns):
+        comparison[f'Benchmark ({benchmark})'] = {label: period_return(benchmark_returns, n)
+                                                  for label, n in (('1W', 5), ('1M', 21))}
+
+    document = {
+        'portfolio': portfolio.replace({np.nan: None}).to_dict(orient='records'),
+        'comparison': comparison,
+        'dates': dates,
+        'portfolio_returns': portfolio_returns.tolist(),
+        'benchmark_returns': benchmark_returns.tolist(),
+        'asset_returns': asset_returns.to_dict(orient='records'),
+        'portfolio_tickers': tickers,
+        'weights': weights.tolist(),
+        'total_value': float(portfolio['Current Value'].sum()) if 'Current Value' in portfolio.columns else 0.0,
+    }
+    document.update({k: v for k, v in (passthrough or {}).items() if k in PASSTHROUGH_KEYS})
+    return document
+
+
+class ManifestFetcher(data_loader.SnapshotFetcher):
+    """Fetch a manifest's resources concurrently and publish them as one snapshot"""
+
+    def __init__(self, manifest, store, session=None, session_factory=None, history=None,
+                 workers=INGEST_WORKERS, timeout=data_loader.REQUEST_TIMEOUT):
+        missing = [key for key in ('holdings', 'prices') if key not in manifest]
+        if missing:
+            raise ValueError(f"Portfolio manifest is missing {missing}")
+        super().__init__(manifest_key(manifest), store, session=session, timeout=timeout, history=history,
+                         session_factory=session_factory or (
+                             lambda: data_loader.create_session(pool_size=workers, retries=0)))
+        self.manifest = dict(manifest)
+        self.benchmark = manifest.get('benchmark', DEFAULT_BENCHMARK)
+        self.workers = workers
+        self.last_report = None
+        self._client = None
+        self._histories = {}   # ticker -> last good closes
+        self._fetch_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = ResourceClient(self.session, timeout=self.timeout)
+        return self._client
+
+    def price_url(self, ticker):
+        return self.manifest['prices'].format(ticker=quote(ticker, safe=''))
+
+    def _history(self, ticker):
+        resource = 'benchmark' if ticker == self.benchmark else 'history'
+        return parse_history(self.client.get(self.price_url(ticker), resource))
+
+    def fetch_histories(self, tickers):
+        """{ticker: closes} fetched in parallel, falling back to the last good copy; and the failures"""
+        histories, failed = {}, {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(tickers))),
+                                thread_name_prefix="portfolio-ingest") as pool:
+            futures = {pool.submit(self._history, ticker): ticker for ticker in tickers}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    histories[ticker] = future.result()
+                except Exception as e:
+                    failed[ticker] = str(e)
+                    if ticker in self._histories:
+                        histories[ticker] = self._histories[ticker]
+        # In ticker order, so an unchanged round assembles the same document
+        self._histories = {ticker: histories[ticker] for ticker in tickers if ticker in histories}
+        return dict(self._histories), failed
+
+    def fetch(self):
+        """Fetch every resource and publish the assembled snapshot if it changed"""
+        # The poller and an explicit load may both ask; one round at a time
+        with self._fetch_lock:
+            return self._fetch()
+
+    def _fetch(self):
+        try:
+            with metrics.LOADER_SECONDS.time(stage="fetch"):
+                document = json.loads(self.client.get(self.manifest['holdings'], 'holdings'))
+                records = document.get('portfolio', []) if isinstance(document, dict) else document
+                portfolio = pd.DataFrame(records)
+                if 'Ticker' not in portfolio.columns:
+                    raise ValueError("holdings have no Ticker column")
+                tickers = portfolio['Ticker'].dropna().unique().tolist()
+                symbols = list(dict.fromkeys(tickers + ([self.benchmark] if self.benchmark else [])))
+                histories, failed = self.fetch_histories(symbols)
+                self.client.retain([self.manifest['holdings']] + [self.price_url(t) for t in symbols])
+            fallbacks = sum(ticker in histories for ticker in failed)
+            benchmark_closes = histories.get(self.benchmark)
+            if self.benchmark not in tickers:
+                histories.pop(self.benchmark, None)
+            missing = [t for t in tickers if t not in histories]
+            self.last_report = {'failed': failed, 'missing': missing, 'at': time.time()}
+            if failed:
+                print(f"⚠️ {len(failed)} of {len(symbols)} price histories failed; "
+                      f"{fallbacks} fell back to their last good copy")
+            if not histories or len(missing) > INGEST_MAX_MISSING_SHARE * len(tickers):
+                raise RuntimeError(f"{len(missing)} of {len(tickers)} holdings have no price history")
+            with metrics.LOADER_SECONDS.time(stage="assemble"):
+                document = assemble_document(portfolio, histories, benchmark_closes, self.benchmark,
+                                             self.manifest.get('history_days'),
+                                             document if isinstance(document, dict) else None)
+                content = json.dumps(document).encode("utf-8")
+        except Exception:
+            metrics.FETCHES.inc(result="error")
+            raise
+        return self.publish(content)
@@ -0,0 +1,350 @@
+"""Hot-path instrumentation for the portfolio dashboard.
+
+A small, dependency-free set of Prometheus-style metrics (counters, gauges and
+histograms) rendered in the text exposition format on ``/metrics``:
+
+* ``portfolio_callback_seconds`` / ``portfolio_callback_response_bytes`` -
+  latency and response size of every Dash callback, labelled by callback;
+* ``portfolio_callback_wire_bytes`` / ``portfolio_callback_encode_seconds`` -
+  size after content encoding and the time spent compressing (payload.py);
+* ``portfolio_builder_seconds`` - time spent in each create_* builder on a
+  figure-cache miss;
+* ``portfolio_loader_seconds`` - loader stages: fetch, assemble, encode,
+  decode, build;
+* ``portfolio_ingest_requests_total`` - requests of the multi-resource ingest
+  by resource and outcome, including retries (ingest.py);
+* ``portfolio_cache_*_total`` - hits, misses and evictions of the in-process
+  caches;
+* ``portfolio_price_ticks_total`` - live price ticks accepted, dropped as
+  stale or rejected as malformed (price_feed.py).
+
+Metrics are per process: under gunicorn each worker answers ``/metrics`` with
+its own numbers, so the figures describe whichever worker served the scrape.
+An opt-in sampling profiler (PORTFOLIO_PROFILE_INTERVAL_MS) aggregates the
+stacks of the request threads into collapsed-stack text on
+``/metrics/profile``, ready for flamegraph tools.
+"""
+
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+
+# Latency buckets in seconds, from cache hits to full rebuilds of large books
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Payload buckets in bytes, 1 kB to 64 MB in powers of four
+SIZE_BUCKETS = tuple(1024 * 4 ** k for k in range(9))
+
+# Sampling period of the opt-in profiler; 0 disables it
+PROFILE_INTERVAL_MS = float(os.environ.get("PORTFOLIO_PROFILE_INTERVAL_MS", 0))
+
+# Innermost frames of threads parked waiting for work, left out of profiles
+IDLE_FRAMES = {"wait", "_worker", "select", "accept", "sleep", "serve_forever"}
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {value:.10g}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, set directly or read from a callable"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.collect is not None:
+            items = [(self._key(labels), value) for labels, value in self.collect()]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class CollectedCounter(Gauge):
+    """Counter whose values are read from another object when scraped"""
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with a running sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:.10g}"
+                samples.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, [("le", le)]), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """Ordered collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        if hasattr(os, "register_at_fork"):
+            # A forked child may have lost the thread holding a metric's lock
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def _reset_locks(self):
+        for metric in self._metrics.values():
+            metric._lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+CALLBACK_SECONDS = REGISTRY.register(Histogram(
+    "portfolio_callback_seconds", "Dash callback latency, request to response.", ["callback"]))
+CALLBACK_RESPONSE_BYTES = REGISTRY.register(Histogram(
+    "portfolio_callback_response_bytes", "Dash callback response body size.", ["callback"], SIZE_BUCKETS))
+CALLBACK_WIRE_BYTES = REGISTRY.register(Histogram(
+    "portfolio_callback_wire_bytes", "Dash callback response size as sent, after compression.",
+    ["callback"], SIZE_BUCKETS))
+CALLBACK_ENCODE_SECONDS = REGISTRY.register(Histogram(
+    "portfolio_callback_encode_seconds", "Time spent compressing a Dash callback response.", ["callback"]))
+CALLBACK_ERRORS = REGISTRY.register(Counter(
+    "portfolio_callback_errors_total", "Dash callbacks answered with a 5xx status.", ["callback"]))
+BUILDER_SECONDS = REGISTRY.register(Histogram(
+    "portfolio_builder_seconds", "Time spent building a figure or table on a cache miss.", ["builder"]))
+LOADER_SECONDS = REGISTRY.register(Histogram(
+    "portfolio_loader_seconds", "Data loader stage latency (fetch, assemble, encode, decode, build).", ["stage"]))
+FETCHES = REGISTRY.register(Counter(
+    "portfolio_fetches_total", "Source fetches by outcome (changed, unchanged, not_modified, error).", ["result"]))
+FETCH_BYTES = REGISTRY.register(Counter(
+    "portfolio_fetch_bytes_total", "Bytes downloaded from the data source."))
+INGEST_REQUESTS = REGISTRY.register(Counter(
+    "portfolio_ingest_requests_total", "Ingest requests by resource (holdings, history, benchmark) and outcome "
+    "(ok, not_modified, retry, error).", ["resource", "result"]))
+PRICE_TICKS = REGISTRY.register(Counter(
+    "portfolio_price_ticks_total", "Live price ticks by outcome (accepted, stale, malformed).", ["result"]))
+
+_caches = {}
+
+
+def _cache_stats(attribute):
+    def collect():
+        return [({"cache": name}, getattr(cache, attribute)) for name, cache in list(_caches.items())]
+    return collect
+
+
+for _attribute in ("hits", "misses", "evictions"):
+    REGISTRY.register(CollectedCounter(
+        f"portfolio_cache_{_attribute}_total", f"Cache {_attribute} by cache.", ["cache"],
+        collect=_cache_stats(_attribute)))
+REGISTRY.register(Gauge(
+    "portfolio_cache_entries", "Entries currently held by each cache.", ["cache"],
+    collect=lambda: [({"cache": name}, len(cache)) for name, cache in list(_caches.items())]))
+REGISTRY.register(Gauge(
+    "portfolio_cache_bytes", "Approximate bytes held by each size-bounded cache.", ["cache"],
+    collect=lambda: [({"cache": name}, cache.total_bytes) for name, cache in list(_caches.items())]))
+
+
+def register_cache(name, cache):
+    """Export an LRUCache's hit, miss and eviction counters under a cache label"""
+    _caches[name] = cache
+    return cache
+
+
+def timed_builder(func):
+    """Record how long a create_* builder takes; place it under the memoize decorator"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with BUILDER_SECONDS.time(builder=func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class SamplingProfiler:
+    """Periodically sample every thread's stack and count collapsed stacks"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = StackCounter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own or frame.f_code.co_name in IDLE_FRAMES:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self, limit=None, reset=False):
+        """Collapsed-stack text ("frame;frame;frame count" per line), busiest first"""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.stacks.most_common(limit)]
+            if reset:
+                self.stacks.clear()
+                self.samples = 0
+        return "\n".join(lines) + "\n"
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000) if PROFILE_INTERVAL_MS > 0 else None
+
+
+def instrument_dash(dash_app):
+    """Time every Dash callback on the Flask server and add the /metrics routes"""
+    import flask
+
+    server = dash_app.server
+    names = {}
+
+    def callback_name(output):
+        if output not in names:
+            entry = dash_app.callback_map.get(output, {})
+            name = getattr(entry.get("callback"), "__name__", None)
+            # Lambdas (the zoom handlers) are named after the component they update
+            names[output] = name if name and name != "<lambda>" else output.strip(".").split(".")[0]
+        return names[output]
+
+    @server.before_request
+    def _start_timer():
+        flask.g.metrics_start = time.perf_counter()
+        if profiler is not None:
+            profiler.start()
+
+    @server.after_request
+    def _record_callback(response):
+        start = flask.g.pop("metrics_start", None)
+        if start is None or not flask.request.path.endswith("_dash-update-component"):
+            return response
+        body = flask.request.get_json(silent=True) or {}
+        name = callback_name(body.get("output", "unknown"))
+        CALLBACK_SECONDS.observe(time.perf_counter() - start, callback=name)
+        if not response.direct_passthrough:
+            wire_bytes = len(response.get_data())
+            CALLBACK_RESPONSE_BYTES.observe(flask.g.get("uncompressed_bytes", wire_bytes), callback=name)
+            CALLBACK_WIRE_BYTES.observe(wire_bytes, callback=name)
+        if "encode_seconds" in flask.g:
+            CALLBACK_ENCODE_SECONDS.observe(flask.g.encode_seconds, callback=name)
+        if response.status_code >= 500:
+            CALLBACK_ERRORS.inc(callback=name)
+        return response
+
+    @server.route("/metrics")
+    def _metrics():
+        return flask.Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+    @server.route("/metrics/profile")
+    def _profile():
+        if profiler is None:
+            return flask.Response("Profiler disabled; set PORTFOLIO_PROFILE_INTERVAL_MS to enable it.\n",
+                                  status=404, mimetype="text/plain")
+        limit = flask.request.args.get("limit", type=int)
+        reset = flask.request.args.get("reset") == "1"
+        return flask.Response(profiler.collapsed(limit, reset), mimetype="text/plain")
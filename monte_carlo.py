@@ -0,0 +1,296 @@
+"""Monte Carlo VaR / CVaR and sector stress testing.
+
+Scenarios are drawn from the asset covariance: either the one built from
+per-asset returns (covariance_engine.py), or the one implied by the export's
+``corr_matrix`` and ``component_var_df``. The export ships correlations and
+each holding's component variance w_i (Sigma w)_i but no volatilities. Writing
+Sigma = D R D with D = diag(sigma), the products x = w * sigma solve the
+risk-budgeting equations x_i (R x)_i = ComponentVar_i, which are the optimality
+conditions of a convex problem (see ``risk_budget_solve``). Holdings with
+non-positive component variance (hedges) cannot be inverted and get the
+lowest solved volatility. The result is rescaled so that w' Sigma w matches
+the exported portfolio variance exactly.
+
+Distributions:
+
+* ``normal``    - multivariate normal, r = B z with B B' = Sigma;
+* ``student-t`` - multivariate t with the same covariance, r = B z sqrt((nu-2)/W);
+* ``bootstrap`` - portfolio returns resampled from ``portfolio_returns``.
+
+Sector shocks shift every scenario by a fixed return per sector. The results
+are VaR/CVaR, a histogram of the portfolio-return distribution, and each
+holding's contribution to CVaR (w_i E[r_i | tail]).
+
+Draws are made in a rotated basis: one standard normal along the portfolio
+direction c = B'w, plus a complement orthogonal to it. The portfolio return
+depends only on the first, so pass one draws a single number per scenario
+(1M scenarios take milliseconds) and finds VaR/CVaR. Pass two replays each
+batch's seeded stream and completes the draws of the tail rows only. These
+are the rows that carry the asset-level tail contributions. The joint
+distribution is the same as drawing every full vector up front, at about
+(1 - confidence) of the cost. Tail batches fan out over a process pool when
+they are large. Draws live in the rank of Sigma, which is at most the
+number of history days. Results are cached by (inputs, spec) hash.
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache, content_hash
+
+TRADING_DAYS = 252
+
+DEFAULT_SPEC = {
+    'distribution': 'normal',
+    'n_scenarios': 100_000,
+    'confidence': 0.95,
+    'horizon_days': 1,
+    'dof': 5,
+    'seed': 0,
+    'shocks': {},
+    'contributions': True,
+}
+DISTRIBUTIONS = ('normal', 'student-t', 'bootstrap')
+
+# Scenarios per batch: bounds the (tail rows x rank) draw matrix held at once
+DEFAULT_BATCH_SIZE = int(os.environ.get("MONTE_CARLO_BATCH_SIZE", 50_000))
+
+# Worker processes for large runs (1 keeps everything in-process)
+DEFAULT_PROCESSES = int(os.environ.get("MONTE_CARLO_PROCESSES", os.cpu_count() or 1))
+
+# Tail passes drawing fewer values than this stay in-process even when a pool is configured
+MIN_POOL_DRAWS = 50_000_000
+
+HISTOGRAM_BINS = 100
+
+results_cache = LRUCache(maxsize=32)
+
+
+def risk_budget_solve(corr, budgets, tol=1e-12, max_iter=100):
+    """Positive x with x_i (corr x)_i = budgets_i, by Newton's method.
+
+    Minimizes 0.5 x'Rx - sum(b log x), whose stationarity conditions are the
+    budget equations, with a backtracking line search that keeps x > 0.
+    """
+    corr = np.asarray(corr, dtype=float)
+    budgets = np.asarray(budgets, dtype=float)
+    x = np.sqrt(budgets / np.diag(corr))
+
+    def objective(v):
+        return 0.5 * v @ corr @ v - budgets @ np.log(v)
+
+    for _ in range(max_iter):
+        rx = corr @ x
+        if np.max(np.abs(x * rx - budgets)) <= tol * budgets.sum():
+            break
+        gradient = rx - budgets / x
+        step = np.linalg.solve(corr + np.diag(budgets / x ** 2), gradient)
+        alpha, current = 1.0, objective(x)
+        while alpha > 1e-12:
+            candidate = x - alpha * step
+            if np.all(candidate > 0) and objective(candidate) <= current - 1e-4 * alpha * gradient @ step:
+                break
+            alpha *= 0.5
+        x = x - alpha * step
+    return x
+
+
+def implied_volatilities(corr, weights, component_var):
+    """Annualized volatilities implied by correlations and component variances"""
+    corr = np.nan_to_num(np.asarray(corr, dtype=float))
+    np.fill_diagonal(corr, 1.0)
+    weights = np.asarray(weights, dtype=float)
+    component_var = np.asarray(component_var, dtype=float)
+
+    solvable = (component_var > 0) & (weights > 0)
+    sigma = np.full(len(weights), np.nan)
+    if solvable.any():
+        sub = np.ix_(solvable, solvable)
+        x = risk_budget_solve(corr[sub], component_var[solvable])
+        sigma[solvable] = x / weights[solvable]
+    fill = np.nanmin(sigma) if solvable.any() else 0.0
+    sigma = np.where(np.isnan(sigma), fill, sigma)
+
+    # Match the exported portfolio variance exactly
+    total = component_var.sum()
+    u = weights * sigma
+    modelled = u @ corr @ u
+    if total > 0 and modelled > 0:
+        sigma *= np.sqrt(total / modelled)
+    return sigma
+
+
+def covariance_from_correlation(corr, sigma):
+    corr = np.nan_to_num(np.asarray(corr, dtype=float))
+    np.fill_diagonal(corr, 1.0)
+    return corr * np.outer(sigma, sigma)
+
+
+def scenario_loadings(cov, rel_tol=1e-10):
+    """B with B B' = cov, truncated to the numerical rank of cov"""
+    values, vectors = np.linalg.eigh(np.asarray(cov, dtype=float))
+    keep = values > rel_tol * max(values.max(), 0.0)
+    return vectors[:, keep] * np.sqrt(values[keep])
+
+
+def normalize_spec(spec):
+    """Fill in defaults and validate a scenario spec"""
+    spec = dict(DEFAULT_SPEC, **{k: v for k, v in (spec or {}).items() if v is not None})
+    if spec['distribution'] not in DISTRIBUTIONS:
+        raise ValueError(f"distribution must be one of {DISTRIBUTIONS}")
+    spec['n_scenarios'] = int(spec['n_scenarios'])
+    spec['horizon_days'] = int(spec['horizon_days'])
+    spec['confidence'] = float(spec['confidence'])
+    spec['dof'] = float(spec['dof'])
+    spec['seed'] = int(spec['seed'])
+    if spec['n_scenarios'] < 100:
+        raise ValueError("n_scenarios must be at least 100")
+    if not 0.5 < spec['confidence'] < 1:
+        raise ValueError("confidence must be between 0.5 and 1")
+    if spec['distribution'] == 'student-t' and spec['dof'] <= 2:
+        raise ValueError("Student-t needs more than 2 degrees of freedom for a finite covariance")
+    spec['shocks'] = {str(k): float(v) for k, v in (spec['shocks'] or {}).items() if v}
+    spec['contributions'] = bool(spec['contributions'])
+    return spec
+
+
+def _portfolio_draws(rng, size, distribution, dof):
+    """Standard-normal draw along the portfolio direction and the t scale (None for normal)"""
+    u = rng.standard_normal(size)
+    scale = np.sqrt((dof - 2) / rng.chisquare(dof, size)) if distribution == 'student-t' else None
+    return u, scale
+
+
+def _portfolio_batch(loadings, direction, seed, size, distribution, dof, dtype):
+    u, scale = _portfolio_draws(np.random.default_rng(seed), size, distribution, dof)
+    p = u * np.linalg.norm(direction)
+    return p * scale if scale is not None else p
+
+
+def _tail_batch(loadings, direction, seed, size, distribution, dof, dtype, tail_rows):
+    """Sum of asset returns over the tail rows of a batch, completing their draws"""
+    rng = np.random.default_rng(seed)
+    u, scale = _portfolio_draws(rng, size, distribution, dof)
+    unit = (direction / np.linalg.norm(direction)).astype(dtype)
+    # Orthogonal complement of the portfolio direction, drawn for tail rows only
+    g = rng.standard_normal((len(tail_rows), loadings.shape[1]), dtype=dtype)
+    z = g - np.outer(g @ unit, unit) + np.outer(u[tail_rows].astype(dtype), unit)
+    if scale is not None:
+        z *= scale[tail_rows, None].astype(dtype)
+    return loadings @ z.sum(axis=0, dtype=np.float64)
+
+
+_worker_arrays = None
+
+
+def _init_worker(loadings, direction):
+    global _worker_arrays
+    _worker_arrays = (loadings, direction)
+
+
+def _pool_tail_batch(args):
+    return _tail_batch(*_worker_arrays, *args)
+
+
+class MonteCarloEngine:
+    """Scenario engine for one set of holdings, covariance and return history"""
+
+    def __init__(self, cov, weights, tickers, sectors=None, history=None,
+                 batch_size=DEFAULT_BATCH_SIZE, processes=DEFAULT_PROCESSES, dtype=np.float32):
+        self.cov = np.asarray(cov, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.tickers = list(tickers)
+        self.sectors = np.asarray(sectors if sectors is not None else ['UNKNOWN'] * len(self.tickers), dtype=object)
+        self.history = np.asarray(history if history is not None else [], dtype=float)
+        self.batch_size = batch_size
+        self.processes = processes
+        self.dtype = np.dtype(dtype)
+        self.loadings = scenario_loadings(self.cov)
+        self.fingerprint = content_hash(self.cov, self.weights, self.tickers, self.sectors.tolist(), self.history)
+
+    def _batches(self, spec):
+        n, size = spec['n_scenarios'], self.batch_size
+        seeds = np.random.SeedSequence(spec['seed']).spawn((n + size - 1) // size)
+        return [(seed, min(size, n - i * size)) for i, seed in enumerate(seeds)]
+
+    def _tail_sums(self, tasks, loadings, direction):
+        draws = sum(len(task[-1]) for task in tasks) * loadings.shape[1]
+        if self.processes <= 1 or draws < MIN_POOL_DRAWS:
+            return [_tail_batch(loadings, direction, *task) for task in tasks]
+        # Only large runs use a pool, so the multiprocessing machinery loads on the first one
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(self.processes, initializer=_init_worker, initargs=(loadings, direction)) as pool:
+            return list(pool.map(_pool_tail_batch, tasks))
+
+    def run(self, spec=None):
+        """Simulate (or fetch from the cache) the result for a scenario spec"""
+        spec = normalize_spec(spec)
+        key = (self.fingerprint, content_hash(spec))
+        return results_cache.get_or_create(key, lambda: self._simulate(spec))
+
+    def _simulate(self, spec):
+        start = time.perf_counter()
+        shift = np.array([spec['shocks'].get(s, 0.0) for s in self.sectors])
+        stress_return = float(self.weights @ shift)
+        horizon = spec['horizon_days']
+
+        method = 'simulated'
+        tail_sum = None
+        if spec['distribution'] == 'bootstrap':
+            if len(self.history) == 0:
+                raise ValueError("bootstrap needs a portfolio return history")
+            rng = np.random.default_rng(spec['seed'])
+            picks = rng.integers(0, len(self.history), (spec['n_scenarios'], horizon))
+            p = self.history[picks].sum(axis=1) + stress_return
+            var_threshold = float(np.percentile(p, (1 - spec['confidence']) * 100))
+            cvar_threshold = float(p[p <= var_threshold].mean())
+            method = 'covariance'
+        else:
+            loadings = self.loadings * np.sqrt(horizon)
+            direction = loadings.T @ self.weights
+            batches = self._batches(spec)
+            args = [(seed, size, spec['distribution'], spec['dof'], self.dtype) for seed, size in batches]
+            p = np.concatenate([_portfolio_batch(loadings, direction, *arg) for arg in args]) + stress_return
+            var_threshold = float(np.percentile(p, (1 - spec['confidence']) * 100))
+            cvar_threshold = float(p[p <= var_threshold].mean())
+
+            if spec['contributions'] and np.any(direction):
+                # Pass two: replay each batch's stream and complete the draws of its tail rows
+                bounds = np.cumsum([0] + [size for _, size in batches])
+                tail_args = [arg + (np.flatnonzero(p[lo:hi] <= var_threshold),)
+                             for arg, lo, hi in zip(args, bounds[:-1], bounds[1:])]
+                tail_sum = np.sum(self._tail_sums(tail_args, loadings, direction), axis=0)
+
+        n_tail = int(np.count_nonzero(p <= var_threshold))
+        if tail_sum is not None:
+            tail_contrib = self.weights * (tail_sum / n_tail + shift)
+        else:
+            # Euler allocation of CVaR along Sigma w, exact in expectation for elliptical returns
+            sigma_w = self.cov @ self.weights
+            total = self.weights @ sigma_w
+            shares = self.weights * sigma_w / total if total > 0 else np.zeros_like(self.weights)
+            tail_contrib = shares * (cvar_threshold - stress_return) + self.weights * shift
+
+        counts, edges = np.histogram(p, bins=HISTOGRAM_BINS)
+        return {
+            'spec': spec,
+            'var_threshold': var_threshold,
+            'cvar_threshold': cvar_threshold,
+            'VaR_pct': -var_threshold,
+            'CVaR_pct': -cvar_threshold,
+            'stress_return': stress_return,
+            'n_tail': n_tail,
+            'loss_histogram': {'counts': counts, 'edges': edges},
+            'tail_contrib': pd.DataFrame({
+                'Ticker': self.tickers,
+                'Sector': self.sectors,
+                'Weight': self.weights,
+                'TailContribution': tail_contrib,
+                'TailContributionPct': tail_contrib / cvar_threshold if cvar_threshold else 0.0,
+            }),
+            'contribution_method': method,
+            'elapsed': time.perf_counter() - start,
+        }
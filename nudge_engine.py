@@ -0,0 +1,171 @@
+"""Server-side nudge rules evaluated over whole columns.
+
+The export ships ``nudges`` as fixed strings, so they describe the book as it
+was when it was exported. NudgeEngine regenerates them from the holdings and
+sector tables of every data version:
+
+* RowRule    - a vectorized condition over a few columns, e.g. Drawdown % <
+  -20%, producing one nudge per matching row;
+* TopRule    - the k largest (or smallest) values of a column, e.g. the top
+  weekly gainers.
+
+Row rules are incremental. Each row is hashed on the rule's key and input
+columns (one vectorized ``hash_pandas_object`` call), and the outcome for that
+hash is remembered. On the next data version only rows whose inputs changed
+have their condition evaluated and their message formatted; the others are
+looked up in one ``get_indexer`` call. Top-k rules select with one partial
+sort and format k messages.
+
+The built-in rules reproduce the export's messages for profit concentration,
+drawdown from cost, weekly drops, sector concentration and weekly movers, and
+add risk-versus-weight checks for holdings and sectors. Shipped nudges that
+no active rule produces (the export's per-asset history extremes) are kept,
+after the generated ones.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Thresholds of the built-in rules, as fractions
+PROFIT_SHARE_THRESHOLD = 0.10
+DRAWDOWN_THRESHOLD = -0.20
+WEEKLY_DROP_THRESHOLD = -0.05
+SECTOR_WEIGHT_THRESHOLD = 0.25
+RISK_WEIGHT_RATIO = 1.5
+MIN_RISK_SHARE = 0.05
+MIN_SECTOR_RISK_SHARE = 0.10
+TOP_MOVERS = 3
+
+# Row outcomes remembered per rule before its cache is rebuilt from scratch
+MAX_CACHED_ROWS = 200_000
+
+
+class RowRule:
+    """One nudge per row whose columns satisfy a vectorized condition"""
+
+    def __init__(self, name, table, key, columns, condition, template, marker):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.columns = list(columns)
+        self.condition = condition
+        self.template = template
+        self.marker = marker
+        self.evaluated = 0
+        self._hashes = pd.Index(np.empty(0, dtype=np.uint64))
+        self._messages = np.empty(0, dtype=object)
+
+    def applies_to(self, frame):
+        return all(c in frame.columns for c in [self.key] + self.columns)
+
+    def evaluate(self, frame):
+        inputs = frame[[self.key] + self.columns]
+        hashes = pd.util.hash_pandas_object(inputs, index=False).to_numpy()
+        positions = self._hashes.get_indexer(hashes)
+        messages = np.full(len(frame), None, dtype=object)
+        known = positions >= 0
+        messages[known] = self._messages[positions[known]]
+
+        fresh = np.flatnonzero(~known)
+        if len(fresh):
+            subset = inputs.iloc[fresh]
+            mask = np.asarray(self.condition({c: subset[c].to_numpy(dtype=float) for c in self.columns}), dtype=bool)
+            hits = np.flatnonzero(mask)
+            outcomes = np.full(len(fresh), None, dtype=object)
+            outcomes[hits] = [self.template.format(**row) for row in subset.iloc[hits].to_dict('records')]
+            messages[fresh] = outcomes
+            self._remember(hashes[fresh], outcomes)
+            self.evaluated += len(fresh)
+        return messages[np.not_equal(messages, None)].tolist()
+
+    def _remember(self, hashes, outcomes):
+        hashes, first = np.unique(hashes, return_index=True)
+        if len(self._hashes) + len(hashes) > MAX_CACHED_ROWS:
+            self._hashes, self._messages = pd.Index(np.empty(0, dtype=np.uint64)), np.empty(0, dtype=object)
+        self._hashes = self._hashes.append(pd.Index(hashes))
+        self._messages = np.concatenate([self._messages, outcomes[first]])
+
+
+class TopRule:
+    """One nudge for each of the k rows with the largest (or smallest) value of a column"""
+
+    def __init__(self, name, table, key, column, template, marker, k=TOP_MOVERS, largest=True):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.columns = [column]
+        self.template = template
+        self.marker = marker
+        self.k = k
+        self.largest = largest
+
+    def applies_to(self, frame):
+        return self.key in frame.columns and self.columns[0] in frame.columns
+
+    def evaluate(self, frame):
+        values = frame[self.columns[0]].to_numpy(dtype=float)
+        # Gainers must have gained and losers lost; NaNs never qualify
+        eligible = np.flatnonzero(values > 0 if self.largest else values < 0)
+        if not len(eligible):
+            return []
+        keys = -values[eligible] if self.largest else values[eligible]
+        k = min(self.k, len(eligible))
+        top = np.argpartition(keys, k - 1)[:k] if k < len(eligible) else np.arange(len(eligible))
+        top = eligible[top[np.lexsort((eligible[top], keys[top]))]]  # Ties keep row order
+        rows = frame.iloc[top][[self.key] + self.columns].to_dict('records')
+        return [self.template.format(**row) for row in rows]
+
+
+def default_rules():
+    return [
+        RowRule('profit-concentration', 'holdings', 'Ticker', ['Profit Contribution %'],
+                lambda c: c['Profit Contribution %'] > PROFIT_SHARE_THRESHOLD,
+                "💰 {Ticker} contributes {Profit Contribution %:.1%} of total profit — consider trimming to book gains.",
+                "of total profit"),
+        RowRule('drawdown-from-cost', 'holdings', 'Ticker', ['Drawdown %'],
+                lambda c: c['Drawdown %'] < DRAWDOWN_THRESHOLD,
+                "⚠️ {Ticker} is down {Drawdown %:.1%} from buy price — consider cutting the loss.",
+                "from buy price"),
+        RowRule('weekly-drop', 'holdings', 'Ticker', ['1W % Change'],
+                lambda c: c['1W % Change'] < WEEKLY_DROP_THRESHOLD,
+                "⚠️ {Ticker} is down {1W % Change:.1%} in a week — consider cutting the loss.",
+                "in a week — consider cutting"),
+        RowRule('risk-weight-mismatch', 'holdings', 'Ticker', ['ComponentVarPct', 'Weight'],
+                lambda c: (c['ComponentVarPct'] >= MIN_RISK_SHARE) & (c['ComponentVarPct'] > RISK_WEIGHT_RATIO * c['Weight']),
+                "⚖️ {Ticker} carries {ComponentVarPct:.1%} of portfolio risk on {Weight:.1%} of its value — consider resizing.",
+                "of portfolio risk on"),
+        RowRule('sector-concentration', 'sectors', 'Sector', ['Weight'],
+                lambda c: c['Weight'] > SECTOR_WEIGHT_THRESHOLD,
+                "🏦 Sector concentration: {Sector} is {Weight:.0%} of portfolio — consider diversifying.",
+                "Sector concentration:"),
+        RowRule('sector-risk-mismatch', 'sectors', 'Sector', ['Risk', 'Weight'],
+                lambda c: (c['Risk'] >= MIN_SECTOR_RISK_SHARE) & (c['Risk'] > RISK_WEIGHT_RATIO * c['Weight']),
+                "⚖️ Sector {Sector} drives {Risk:.0%} of portfolio risk on {Weight:.0%} of its value — consider hedging.",
+                "of portfolio risk on"),
+        TopRule('weekly-gainers', 'holdings', 'Ticker', '1W Abs Change',
+                "🚀 Top gainer this week: {Ticker} (+₹{1W Abs Change:.0f}).", "Top gainer this week"),
+        TopRule('weekly-losers', 'holdings', 'Ticker', '1W Abs Change',
+                "📉 Top loser this week: {Ticker} (₹{1W Abs Change:.0f}).", "Top loser this week", largest=False),
+    ]
+
+
+class NudgeEngine:
+    """Evaluates nudge rules over the holdings and sector tables of each data version"""
+
+    def __init__(self, rules=None):
+        self.rules = list(rules) if rules is not None else default_rules()
+        self._lock = threading.Lock()
+
+    def generate(self, tables, shipped=()):
+        """Nudges from every rule whose table has its columns, then the shipped ones no such rule covers"""
+        nudges, markers = [], []
+        with self._lock:
+            for rule in self.rules:
+                frame = tables.get(rule.table)
+                if frame is None or frame.empty or not rule.applies_to(frame):
+                    continue
+                nudges += rule.evaluate(frame)
+                markers.append(rule.marker)
+        return nudges + [n for n in shipped if not any(marker in n for marker in markers)]
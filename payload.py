@@ -0,0 +1,169 @@
+"""Smaller figure payloads and compressed HTTP responses.
+
+Figures: plotly serializes numpy arrays as base64 typed arrays
+(``{"dtype": "f8", "bdata": ...}``) but plain lists and pandas objects built
+from lists as JSON text. ``compact_figure`` converts every numeric trace array
+to a typed array, at a configurable precision:
+
+* ``float64`` - exact, base64 ``f8`` (about 10.7 bytes per value);
+* ``float32`` - base64 ``f4`` (about 5.3 bytes per value, ~7 significant digits);
+* ``<n>``     - rounded to n decimals and sent as JSON text, which gzip
+  compresses best for short decimals.
+
+Integer arrays are downcast to the smallest integer type that holds them.
+
+Responses: ``install_compression`` gzip- (or brotli-, when the optional
+``brotli`` package is installed) encodes JSON and text responses for clients
+that accept it. Dash's own ``compress=True`` needs flask-compress, which is
+not a dependency here.
+"""
+
+import base64
+import functools
+import gzip
+import os
+import time
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Precision of numeric figure arrays: "float64", "float32" or a number of decimals
+FIGURE_PRECISION = os.environ.get("FIGURE_PRECISION", "float64")
+
+# Responses smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = int(os.environ.get("MIN_COMPRESS_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+
+# Trace properties that may hold numeric arrays
+NUMERIC_PROPS = ('x', 'y', 'z', 'values', 'customdata')
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/javascript', 'text/')
+
+TYPED_ARRAY_CODES = {
+    'float64': 'f8', 'float32': 'f4', 'int8': 'i1', 'int16': 'i2', 'int32': 'i4',
+    'uint8': 'u1', 'uint16': 'u2', 'uint32': 'u4',
+}
+
+
+def compact_array(values, precision=FIGURE_PRECISION):
+    """Typed (or rounded) version of a numeric array; other values are returned as is"""
+    if values is None or isinstance(values, (str, dict)):
+        return values
+    try:
+        array = np.asarray(values)
+    except (TypeError, ValueError):
+        return values
+    if array.ndim == 0 or array.size == 0 or array.dtype.kind not in 'fiub':
+        return values
+
+    if array.dtype.kind in 'iu':
+        for dtype in (np.int8, np.int16, np.int32) if array.dtype.kind == 'i' else (np.uint8, np.uint16, np.uint32):
+            info = np.iinfo(dtype)
+            if array.min() >= info.min and array.max() <= info.max:
+                return array.astype(dtype)
+        return array
+    if array.dtype.kind == 'b':
+        return array.astype(np.uint8)
+
+    if precision == 'float32':
+        return array.astype(np.float32)
+    if precision not in (None, '', 'float64'):
+        # Rounded decimals travel best as JSON text; NaN becomes null
+        rounded = np.round(array.astype(float), int(precision))
+        return np.where(np.isnan(rounded), None, rounded).tolist()
+    return array.astype(np.float64, copy=False)
+
+
+def typed_array(values, precision=FIGURE_PRECISION):
+    """Plotly typed-array spec for a numeric array, for payloads built outside a Figure (Patch)"""
+    compacted = compact_array(values, precision)
+    if not isinstance(compacted, np.ndarray) or str(compacted.dtype) not in TYPED_ARRAY_CODES:
+        return compacted
+    spec = {
+        'dtype': TYPED_ARRAY_CODES[str(compacted.dtype)],
+        'bdata': base64.b64encode(np.ascontiguousarray(compacted).tobytes()).decode('ascii'),
+    }
+    if compacted.ndim > 1:
+        spec['shape'] = ','.join(str(n) for n in compacted.shape)
+    return spec
+
+
+def compact_figure(fig, precision=FIGURE_PRECISION):
+    """Convert the numeric arrays of every trace in place; return the figure"""
+    for trace in getattr(fig, 'data', ()):
+        for prop in NUMERIC_PROPS:
+            if prop in trace and trace[prop] is not None:
+                compacted = compact_array(trace[prop], precision)
+                if compacted is not trace[prop]:
+                    # Plotly coerces a new value to the type of the one it replaces
+                    # (list -> tuple, f4 -> f8), so clear the property first
+                    trace[prop] = None
+                    trace[prop] = compacted
+    return fig
+
+
+def compact_figures(func):
+    """Builder decorator: compact the figure it returns (other results pass through)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        return compact_figure(result) if hasattr(result, 'data') and hasattr(result, 'layout') else result
+    return wrapper
+
+
+def accepted_encoding(accept_encoding):
+    """Best content coding the client accepts: 'br', 'gzip' or None"""
+    accepted = set()
+    for token in (accept_encoding or '').split(','):
+        coding, _, params = token.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def install_compression(server):
+    """Compress JSON and text responses on a Flask server.
+
+    The uncompressed size and the time spent compressing are left on
+    ``flask.g`` (``uncompressed_bytes``, ``encode_seconds``) for metrics.
+    """
+    import flask
+
+    @server.after_request
+    def _compress_response(response):
+        if (response.direct_passthrough or response.status_code < 200 or response.status_code >= 300
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_MIMETYPES)):
+            return response
+        body = response.get_data()
+        flask.g.uncompressed_bytes = len(body)
+        encoding = accepted_encoding(flask.request.headers.get('Accept-Encoding'))
+        response.vary.add('Accept-Encoding')
+        if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+            return response
+        start = time.perf_counter()
+        response.set_data(compress(body, encoding))
+        flask.g.encode_seconds = time.perf_counter() - start
+        response.headers['Content-Encoding'] = encoding
+        return response
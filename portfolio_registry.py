@@ -0,0 +1,173 @@
+"""Registry of named portfolio sources for multi-book deployments.
+
+Each portfolio has its own conditional fetcher, shared snapshot store and
+append-only version history (see data_loader.py, snapshot_store.py and
+history_store.py). A source is either the URL of one portfolio_data.json or
+a manifest of separate holdings and price-history resources (ingest.py). Parsed datasets live in one LRU that is bounded by both
+count and memory, so dozens of books can be served from one process without
+all of them being resident. Loading and polling fan out over
+a thread pool: the work is dominated by network I/O and by decoding binary
+snapshots, which costs little GIL time.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import data_loader
+from caching import LRUCache, nbytes
+
+
+class PortfolioRegistry:
+    """Named portfolio sources sharing one bounded LRU of parsed datasets
+
+    parse(data_dict, version, name) turns a decoded snapshot into a dataset;
+    the name lets it keep per-portfolio state across versions.
+    """
+
+    def __init__(self, sources, parse, empty, max_bytes=None, max_workers=8,
+                 check_interval=data_loader.STORE_CHECK_INTERVAL, keep_history=True, on_load=None):
+        self.sources = dict(sources)
+        self.empty = empty
+        # Called with (name, data) whenever a worker parses a dataset
+        self.on_load = on_load
+        self.check_interval = check_interval
+        self.max_workers = max_workers
+        self._session = None
+        self.refreshers = {}
+        self.histories = {}
+        # The ingest and history modules load only for deployments that use them
+        if keep_history:
+            from history_store import HistoryStore
+        for name, source in self.sources.items():
+            manifest = isinstance(source, dict)
+            if manifest:
+                import ingest
+                store = data_loader.store_for_url(ingest.manifest_key(source))
+            else:
+                store = data_loader.store_for_url(source)
+            if keep_history:
+                self.histories[name] = HistoryStore(os.path.join(store.directory, "history"))
+            if manifest:
+                # Many requests per round: the ingest pools its own connections and retries
+                fetcher = ingest.ManifestFetcher(source, store, history=self.histories.get(name))
+            else:
+                fetcher = data_loader.SnapshotFetcher(source, store, session_factory=self._shared_session,
+                                                      history=self.histories.get(name))
+            self.refreshers[name] = data_loader.BackgroundRefresher(
+                fetcher, lambda data_dict, version, name=name: parse(data_dict, version, name), on_update=lambda data, name=name: self._loaded(name, data))
+        self.datasets = LRUCache(maxsize=max(len(self.sources), 1), max_bytes=max_bytes, sizeof=nbytes)
+        self._pool = None
+        self._pool_pid = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _loaded(self, name, data):
+        self.datasets.put(name, data)
+        if self.on_load is not None:
+            self.on_load(name, data)
+
+    @property
+    def names(self):
+        return list(self.sources)
+
+    def _shared_session(self):
+        # Created on the first fetch, off the startup path, and shared by every source
+        with self._lock:
+            if self._session is None:
+                self._session = data_loader.create_session(pool_size=self.max_workers)
+            return self._session
+
+    def _executor(self):
+        # Pools do not survive fork either; give each worker process its own
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="portfolio-loader")
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def load(self, name, fetch=True):
+        """Parse one portfolio now, fetching first if asked and this worker is the store's writer"""
+        refresher = self.refreshers[name]
+        if fetch:
+            refresher.fetch_if_writer(force=True)
+        data = refresher.load_current()
+        if data is not None:
+            self._loaded(name, data)
+        return data
+
+    def load_all(self, names=None, fetch=True, fill=None):
+        """Load several portfolios in parallel; return {name: data or None}.
+
+        With ``fill``, a portfolio is skipped (None) once the parsed datasets
+        take that share of the memory budget, so a bulk load cannot evict the
+        books already in use.
+        """
+        names = list(names or self.sources)
+
+        def load(name):
+            budget = self.datasets.max_bytes
+            if fill is not None and budget and self.datasets.total_bytes >= fill * budget:
+                return None
+            return self.load(name, fetch)
+        return dict(zip(names, self._executor().map(load, names)))
+
+    def warm(self, names=None, fill=0.5):
+        """Parse portfolios from their local snapshots on a background thread; return the thread"""
+        names = [name for name in (names or self.sources) if name not in self.datasets]
+        thread = threading.Thread(target=self.load_all, args=(names, False, fill), name="portfolio-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def get(self, name):
+        """Parsed dataset for a portfolio, loading it from its shared store on a miss"""
+        if name not in self.refreshers:
+            return self.empty
+        data = self.datasets.get(name)
+        if data is None:
+            # Evicted or never loaded: re-map the shared snapshot (no network)
+            data = self.refreshers[name].load_current()
+            if data is None:
+                self.request_refresh(name)
+                return self.empty
+            self._loaded(name, data)
+        return data
+
+    def request_refresh(self, name):
+        """Ask the writer of one portfolio's store to fetch now, without waiting"""
+        self.start()
+        self.refreshers[name].store.request_refresh()
+        self._wake.set()
+
+    def _poll(self, name):
+        refresher = self.refreshers[name]
+        refresher.fetch_if_writer()
+        # Only keep parsing books someone is looking at; the rest load on demand
+        if name in self.datasets:
+            data = refresher.load_if_newer()
+            if data is not None:
+                self._loaded(name, data)
+
+    def poll_once(self):
+        list(self._executor().map(self._poll, self.sources))
+
+    def start(self):
+        """Start the shared poller thread; safe to call repeatedly and after a fork"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Poll right away so a fresh worker fetches without waiting a full interval
+            self._wake.set()
+            self._thread = threading.Thread(target=self._run, name="portfolio-registry", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"❌ Error polling portfolio sources: {e}")
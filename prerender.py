@@ -0,0 +1,339 @@
+"""Pre-rendered, static dashboard bundles for read-only viewers.
+
+Whenever a portfolio's data version changes, the worker that writes its
+snapshot store builds every section output once - the builders registered in
+app.py - across a process pool. The children are forked, so they start with
+the parsed data and each returns its output already serialized by the
+encoder Dash uses. Where fork is unavailable the builds share a thread pool
+instead. The serialized outputs, a manifest and an HTML report of them are
+written as one bundle per version:
+
+    <PRERENDER_DIR>/<portfolio key>/<version>/<output>.json[.gz]
+                                    <version>/manifest.json
+                                    <version>/report.html[.gz]
+                                    current      -> version of the newest complete bundle
+
+Bundles are written under a temporary name and renamed into place, and files
+above MIN_COMPRESS_BYTES get a gzip sidecar so they are compressed once, not
+per request. install_routes serves them:
+
+* ``/prerender/<key>/<version>/<file>`` - immutable (the version is in the
+  URL), with a strong ETag;
+* ``/prerender/<key>/current.json`` and ``/report[?portfolio=<name>]`` - the
+  current bundle's manifest and report, revalidated with their ETag so an
+  unchanged page costs a 304;
+* ``/prerender/plotly.min.js`` - the plotly.js bundled with plotly.py, for
+  the report.
+
+Every worker also seeds its figure cache from the current bundle when it
+serves the matching data version (warm), so the section callbacks a page load
+fires return the prebuilt outputs; only interactive controls build anything.
+"""
+
+import functools
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from html import escape
+
+import metrics
+import payload
+
+# Parallel builds per bundle
+PRERENDER_WORKERS = int(os.environ.get("PRERENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Bundles kept per portfolio (the current one and the ones before it)
+KEEP_BUNDLES = 2
+
+# Cache-Control of versioned files and of the current manifest and report
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# Builders and data of a forked build worker, inherited from the parent
+_worker_builders = None
+_worker_data = None
+
+
+def _init_worker(builders, data):
+    global _worker_builders, _worker_data
+    _worker_builders, _worker_data = builders, data
+
+
+def _render(output, builders=None, data=None):
+    from plotly.io.json import to_json_plotly
+
+    builders = builders if builders is not None else _worker_builders
+    data = data if data is not None else _worker_data
+    builder, kwargs = builders[output]
+    start = time.perf_counter()
+    body = to_json_plotly(builder(data, **kwargs))
+    return output, body, time.perf_counter() - start
+
+
+def _write(path, body):
+    with open(path, "wb") as f:
+        f.write(body)
+    if len(body) >= payload.MIN_COMPRESS_BYTES:
+        with open(f"{path}.gz", "wb") as f:
+            f.write(gzip.compress(body, compresslevel=9))
+
+
+def component_html(node):
+    """Static HTML for a serialized Dash component tree (DataTables as plain tables)"""
+    if node is None or isinstance(node, bool):
+        return ""
+    if isinstance(node, (str, int, float)):
+        return escape(str(node))
+    if isinstance(node, list):
+        return "".join(component_html(child) for child in node)
+    if not isinstance(node, dict) or "props" not in node:
+        return ""
+    props, kind = node["props"], node.get("type", "")
+    if kind == "DataTable":
+        columns = props.get("columns") or [{"id": key, "name": key} for key in (props.get("data") or [{}])[0]]
+        head = "".join(f"<th>{escape(str(c.get('name', c['id'])))}</th>" for c in columns)
+        rows = "".join("<tr>" + "".join(f"<td>{component_html(row.get(c['id']))}</td>" for c in columns) + "</tr>"
+                       for row in props.get("data") or [])
+        return f"<table><thead><tr>{head}</tr></thead><tbody>{rows}</tbody></table>"
+    children = component_html(props.get("children"))
+    if node.get("namespace") == "dash_html_components" and kind.isalnum():
+        return f"<{kind.lower()}>{children}</{kind.lower()}>"
+    return children
+
+
+def render_report(title, version, outputs, built_at):
+    """Self-contained HTML page of every figure and table of a bundle"""
+    sections = []
+    for i, (output, body) in enumerate(outputs.items()):
+        value = json.loads(body)
+        if isinstance(value, dict) and "data" in value and "layout" in value:
+            figure = body.replace("</", "<\\/")
+            sections.append(f'<div id="figure-{i}" class="figure"></div><script>(function () {{'
+                            f'var f = {figure}; Plotly.newPlot("figure-{i}", f.data, f.layout, '
+                            f'{{responsive: true, displaylogo: false}});}})();</script>')
+        else:
+            content = component_html(value)
+            if content:
+                sections.append(f'<section id="{escape(output)}">{content}</section>')
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(built_at))
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{escape(title)}</title>'
+            '<script src="/prerender/plotly.min.js"></script><style>'
+            'body{font-family:sans-serif;max-width:1200px;margin:0 auto;padding:0 16px}'
+            'table{border-collapse:collapse;margin:16px auto;font-size:12px}'
+            'td,th{border:1px solid #ddd;padding:4px 8px;text-align:center}th{background:#f2f2f2}'
+            '.figure{margin-bottom:32px}</style></head><body>'
+            f'<h1 style="text-align:center">📈 {escape(title)}</h1>'
+            f'<p style="text-align:center">Data version {escape(str(version))} · rendered {stamp}</p>'
+            + "".join(sections) + "</body></html>").encode("utf-8")
+
+
+class BundleStore:
+    """Versioned static bundles of every section output, one directory per portfolio"""
+
+    def __init__(self, directory, builders, workers=PRERENDER_WORKERS, keep=KEEP_BUNDLES):
+        self.directory = directory
+        self.builders = dict(builders)   # output name -> (memoized builder, kwargs)
+        self.workers = workers
+        self.keep = keep
+        self._building = set()
+        self._warmed = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(name):
+        return hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+
+    def path(self, name, *parts):
+        return os.path.join(self.directory, self.key(name), *parts)
+
+    def current(self, name):
+        """Version of the portfolio's newest complete bundle, or None"""
+        try:
+            with open(self.path(name, "current"), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def manifest(self, name, version=None):
+        version = version or self.current(name)
+        if version is None:
+            return None
+        try:
+            with open(self.path(name, version, "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _executor(self, data):
+        if self.workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"),
+                                       initializer=_init_worker, initargs=(self.builders, data)), _render
+        return (ThreadPoolExecutor(max(self.workers, 1), thread_name_prefix="prerender"),
+                functools.partial(_render, builders=self.builders, data=data))
+
+    def build(self, name, data):
+        """Build, write and publish the bundle of one data version; returns its manifest"""
+        version = str(data["version"])
+        with self._build_lock:
+            if self.current(name) == version:
+                return self.manifest(name, version)
+            with metrics.LOADER_SECONDS.time(stage="prerender"):
+                pool, render = self._executor(data)
+                with pool:
+                    results = list(pool.map(render, self.builders))
+                outputs = {output: body for output, body, _ in results}
+                built_at = time.time()
+                manifest = {
+                    "portfolio": name,
+                    "version": version,
+                    "built_at": built_at,
+                    "outputs": {output: {"file": f"{output}.json",
+                                         "etag": hashlib.sha1(body.encode("utf-8")).hexdigest()[:16],
+                                         "bytes": len(body), "build_seconds": round(seconds, 4)}
+                                for output, body, seconds in results},
+                }
+                tmp = self.path(name, f".{version}.{os.getpid()}.tmp")
+                shutil.rmtree(tmp, ignore_errors=True)
+                os.makedirs(tmp)
+                for output, body in outputs.items():
+                    _write(os.path.join(tmp, f"{output}.json"), body.encode("utf-8"))
+                _write(os.path.join(tmp, "report.html"), render_report(name, version, outputs, built_at))
+                _write(os.path.join(tmp, "manifest.json"), json.dumps(manifest).encode("utf-8"))
+                final = self.path(name, version)
+                shutil.rmtree(final, ignore_errors=True)
+                os.replace(tmp, final)
+                pointer = self.path(name, f"current.{os.getpid()}.tmp")
+                with open(pointer, "w", encoding="utf-8") as f:
+                    f.write(version)
+                os.replace(pointer, self.path(name, "current"))
+                self._prune(name, keep=version)
+        print(f"🖼️ Pre-rendered {len(outputs)} outputs of {name} ({version})")
+        return manifest
+
+    def _prune(self, name, keep):
+        root = self.path(name)
+        bundles = [os.path.join(root, entry) for entry in os.listdir(root)
+                   if not entry.startswith((".", "current")) and os.path.isdir(os.path.join(root, entry))]
+        bundles.sort(key=os.path.getmtime, reverse=True)
+        for path in bundles[self.keep:]:
+            if os.path.basename(path) != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def submit(self, name, data):
+        """Build a version's bundle on a background thread, once"""
+        job = (name, str(data["version"]))
+        with self._lock:
+            if job in self._building or self.current(name) == job[1]:
+                return
+            self._building.add(job)
+
+        def run():
+            try:
+                self.build(name, data)
+                self.warm(name, data)
+            except Exception as e:
+                print(f"⚠️ Could not pre-render {name}: {e}")
+            finally:
+                with self._lock:
+                    self._building.discard(job)
+
+        threading.Thread(target=run, name="prerender", daemon=True).start()
+
+    def warm(self, name, data):
+        """Seed the builders' caches with the current bundle if it matches data; True if it did"""
+        version = str(data.get("version"))
+        if self._warmed.get(name) == version or self.current(name) != version:
+            return self._warmed.get(name) == version
+        for output, (builder, kwargs) in self.builders.items():
+            key = builder.cache_key(data, **kwargs)
+            if key is None:
+                continue
+            try:
+                with open(self.path(name, version, f"{output}.json"), "rb") as f:
+                    builder.cache.put(key, json.loads(f.read()))
+            except (OSError, ValueError):
+                continue
+        self._warmed[name] = version
+        return True
+
+
+def install_routes(server, bundles, default_portfolio):
+    """Serve the bundles, the current report and plotly.js with ETag / Cache-Control headers"""
+    import flask
+
+    def send(path, etag, cache_control, mimetype):
+        if not os.path.exists(path):
+            flask.abort(404)
+        # Serve the gzip sidecar to clients that take it; it carries its own ETag
+        if os.path.exists(f"{path}.gz") and "gzip" in (flask.request.headers.get("Accept-Encoding") or ""):
+            response = flask.send_file(f"{path}.gz", mimetype=mimetype, etag=f"{etag}-gz", conditional=True,
+                                       max_age=None)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = flask.send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=None)
+        response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = cache_control
+        return response
+
+    @server.route("/report")
+    def _prerendered_report():
+        name = flask.request.args.get("portfolio") or default_portfolio
+        version = bundles.current(name)
+        if version is None:
+            return flask.Response("The report has not been rendered yet.", status=503, mimetype="text/plain",
+                                  headers={"Retry-After": "30"})
+        return send(bundles.path(name, version, "report.html"), f"{bundles.key(name)}-{version}", REVALIDATE,
+                    "text/html")
+
+    @server.route("/prerender/<key>/current.json")
+    def _prerendered_manifest(key):
+        if not _SAFE_NAME.match(key):
+            flask.abort(404)
+        pointer = os.path.join(bundles.directory, key, "current")
+        try:
+            with open(pointer, "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        except OSError:
+            flask.abort(404)
+        return send(os.path.join(bundles.directory, key, version, "manifest.json"), f"{key}-{version}",
+                    REVALIDATE, "application/json")
+
+    @server.route("/prerender/<key>/<version>/<filename>")
+    def _prerendered_file(key, version, filename):
+        if not all(_SAFE_NAME.match(part) for part in (key, version, filename)) or filename.endswith(".gz"):
+            flask.abort(404)
+        mimetype = "text/html" if filename.endswith(".html") else "application/json"
+        return send(os.path.join(bundles.directory, key, version, filename), f"{key}-{version}-{filename}",
+                    IMMUTABLE, mimetype)
+
+    @server.route("/prerender/plotly.min.js")
+    def _plotly_js():
+        path = _plotly_js_file(bundles.directory)
+        return send(path, os.path.basename(path), IMMUTABLE, "application/javascript")
+
+
+@functools.lru_cache(maxsize=None)
+def _plotly_js_file(directory):
+    # Written once per plotly version, with its gzip sidecar
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    path = os.path.join(directory, f"plotly-{plotly.__version__}.min.js")
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        _write(tmp, get_plotlyjs().encode("utf-8"))
+        if os.path.exists(f"{tmp}.gz"):
+            os.replace(f"{tmp}.gz", f"{path}.gz")
+        os.replace(tmp, path)
+    return path
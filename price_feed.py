@@ -0,0 +1,285 @@
+"""Live price ticks for the holdings of a portfolio.
+
+A feed thread parses ticks and pushes them into a TickBook, which keeps only
+the latest price of every ticker and a sequence number that grows with each
+accepted tick. A burst of ticks for one ticker collapses into a single entry,
+so the dashboard's interval callback finds at most one change per ticker
+however many ticks arrived since it last looked.
+
+Two stand-in feeds take ticks from outside the process:
+
+* ``file:<path>``        - tails a file (replaying what is already in it) and
+  follows appended lines, starting over when it is truncated or replaced;
+* ``udp://<host>:<port>`` - listens for datagrams of one or more lines.
+
+A tick line is either JSON (``{"ticker": "ITC.NS", "price": 431.2}``, with an
+optional ``"ts"``) or CSV (``ITC.NS,431.2[,ts]``). Malformed lines are counted
+and dropped.
+
+LivePortfolio re-values one portfolio snapshot at the latest prices. Only the
+holdings that ticked since the last refresh are touched: their Current Value
+and Unrealized P&L move by the change in value and the total moves by the sum
+of those changes. Weights are value / total, so they are recomputed in one
+vector division when read. The latest cumulative-return and drawdown point
+follow from the total: the export values the holdings at the last close, so
+cum_port[-1] * total / snapshot total is the portfolio's growth so far today.
+
+Each process runs its own feed. Under several gunicorn workers use a file
+feed; a UDP port can only be bound by one of them.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+import metrics
+
+# Seconds between polls of a followed tick file
+FILE_POLL_SECONDS = float(os.environ.get("PRICE_FEED_POLL_SECONDS", 0.1))
+
+# Largest datagram accepted by the UDP feed
+MAX_DATAGRAM_BYTES = 64 * 1024
+
+
+def parse_tick(line):
+    """(ticker, price, ts) from a JSON or CSV tick line; ValueError when malformed"""
+    line = line.strip()
+    if line.startswith('{'):
+        tick = json.loads(line)
+        ticker, price, ts = tick['ticker'], tick['price'], tick.get('ts')
+    else:
+        fields = line.split(',')
+        if len(fields) not in (2, 3):
+            raise ValueError(f"expected ticker,price[,ts], got {line!r}")
+        ticker, price, ts = fields[0].strip(), fields[1], fields[2] if len(fields) == 3 else None
+    price = float(price)
+    if not ticker or not np.isfinite(price) or price <= 0:
+        raise ValueError(f"invalid tick {line!r}")
+    return str(ticker), price, float(ts) if ts is not None else time.time()
+
+
+def parse_ticks(lines):
+    """Well-formed ticks among lines; malformed ones are counted and skipped"""
+    ticks = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            ticks.append(parse_tick(line))
+        except (ValueError, KeyError, TypeError):
+            metrics.PRICE_TICKS.inc(result="malformed")
+    return ticks
+
+
+class TickBook:
+    """Latest price per ticker, coalescing bursts of ticks under a sequence number"""
+
+    def __init__(self):
+        self.seq = 0
+        self.last_tick_at = None
+        self._prices = {}   # ticker -> (price, ts, seq of its last change)
+        self._lock = threading.Lock()
+
+    def push(self, ticks):
+        """Record (ticker, price, ts) ticks; a ticker's older ticks are dropped"""
+        accepted = 0
+        with self._lock:
+            for ticker, price, ts in ticks:
+                current = self._prices.get(ticker)
+                if current is not None and ts < current[1]:
+                    continue  # Out of order: keep the newer price
+                accepted += 1
+                if current is not None and current[0] == price:
+                    self._prices[ticker] = (price, ts, current[2])
+                    continue
+                self.seq += 1
+                self._prices[ticker] = (price, ts, self.seq)
+            if accepted:
+                self.last_tick_at = time.time()
+        metrics.PRICE_TICKS.inc(accepted, result="accepted")
+        metrics.PRICE_TICKS.inc(len(ticks) - accepted, result="stale")
+        return accepted
+
+    def changed_since(self, seq):
+        """(current seq, {ticker: price}) for tickers whose price changed after seq"""
+        with self._lock:
+            return self.seq, {ticker: price for ticker, (price, _, changed) in self._prices.items()
+                              if changed > seq}
+
+    def __len__(self):
+        return len(self._prices)
+
+
+class PriceFeed:
+    """Background thread moving ticks from a source into a TickBook"""
+
+    def __init__(self, book, name):
+        self.book = book
+        self.name = name
+        self.error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the feed thread (again after a fork); a no-op while it runs"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._guarded_run, name=f"price-feed-{self.name}",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _guarded_run(self):
+        while not self._stop.is_set():
+            try:
+                self.run()
+            except OSError as e:
+                self.error = str(e)
+                print(f"⚠️ Price feed {self.name} failed: {e} - retrying")
+                self._stop.wait(1.0)
+
+    def run(self):
+        raise NotImplementedError
+
+
+class FilePriceFeed(PriceFeed):
+    """Follow a file of tick lines, like tail -F"""
+
+    def __init__(self, book, path, poll_interval=FILE_POLL_SECONDS):
+        super().__init__(book, path)
+        self.path = path
+        self.poll_interval = poll_interval
+
+    def run(self):
+        while not os.path.exists(self.path):
+            if self._stop.wait(self.poll_interval):
+                return
+        with open(self.path, 'rb') as f:
+            inode, partial = os.fstat(f.fileno()).st_ino, b''
+            while not self._stop.is_set():
+                chunk = f.read()
+                if chunk:
+                    lines = (partial + chunk).split(b'\n')
+                    partial = lines.pop()
+                    self.book.push(parse_ticks(line.decode('utf-8', 'replace') for line in lines))
+                    continue
+                try:
+                    stat = os.stat(self.path)
+                except FileNotFoundError:
+                    stat = None
+                if stat is None or stat.st_ino != inode or stat.st_size < f.tell():
+                    return  # Rotated or truncated: reopen from the start
+                self._stop.wait(self.poll_interval)
+
+
+class SocketPriceFeed(PriceFeed):
+    """Receive tick lines as UDP datagrams"""
+
+    def __init__(self, book, host, port):
+        super().__init__(book, f"{host}:{port}")
+        self.address = (host, port)
+
+    def run(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.bind(self.address)
+            sock.settimeout(0.5)
+            while not self._stop.is_set():
+                try:
+                    datagram = sock.recv(MAX_DATAGRAM_BYTES)
+                except socket.timeout:
+                    continue
+                self.book.push(parse_ticks(datagram.decode('utf-8', 'replace').splitlines()))
+
+
+def open_feed(spec, book):
+    """Feed for a PRICE_FEED spec (file:<path> or udp://host:port), or None when unset"""
+    if not spec:
+        return None
+    parsed = urlparse(spec)
+    if parsed.scheme == 'udp':
+        return SocketPriceFeed(book, parsed.hostname or '127.0.0.1', parsed.port)
+    if parsed.scheme in ('file', ''):
+        return FilePriceFeed(book, parsed.path if parsed.scheme else spec)
+    raise ValueError(f"Unsupported price feed {spec!r}: use file:<path> or udp://host:port")
+
+
+class LivePortfolio:
+    """A portfolio snapshot re-valued at the latest ticked prices"""
+
+    def __init__(self, portfolio, cum_port, drawdown):
+        self.tickers = portfolio['Ticker'].tolist() if 'Ticker' in portfolio.columns else []
+        self.positions = {t: i for i, t in enumerate(self.tickers)}
+
+        def column(name):
+            if name not in portfolio.columns:
+                return np.zeros(len(self.tickers))
+            return np.nan_to_num(portfolio[name].to_numpy(dtype=float, na_value=np.nan))
+
+        self.quantity = column('Quantity Available')
+        self.base_value = column('Current Value')
+        self.base_pnl = column('Unrealized P&L')
+        self.base_total = float(self.base_value.sum())
+        self.value = self.base_value.copy()
+        self.pnl = self.base_pnl.copy()
+        self.total = self.base_total
+
+        cum_port = np.asarray(cum_port, dtype=float)
+        self.last_cum = float(cum_port[-1]) if len(cum_port) else 1.0
+        self.last_drawdown = float(drawdown[-1]) if len(drawdown) else 0.0
+        self.peak = float(cum_port.max()) if len(cum_port) else 1.0
+
+        self.seq = 0        # Last tick book seq applied
+        self.revision = 0   # Bumped whenever a held price changes
+        self.updated_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, book):
+        """Apply the prices that changed since the last refresh; returns the revision of the values"""
+        with self._lock:
+            seq, prices = book.changed_since(self.seq)
+            held = [(self.positions[t], p) for t, p in prices.items() if t in self.positions]
+            if held:
+                rows = np.fromiter((i for i, _ in held), dtype=np.int64, count=len(held))
+                new_value = np.fromiter((p for _, p in held), dtype=float, count=len(held)) * self.quantity[rows]
+                # Holdings without a quantity keep their exported value
+                new_value = np.where(self.quantity[rows] > 0, new_value, self.value[rows])
+                delta = new_value - self.value[rows]
+                self.value[rows] = new_value
+                self.pnl[rows] += delta
+                self.total += float(delta.sum())
+                self.updated_at = time.time()
+                self.revision += 1
+            self.seq = seq
+            return self.revision
+
+    def snapshot(self):
+        """Current Value, Unrealized P&L, Weight and the latest cum_port/drawdown point"""
+        with self._lock:
+            value, pnl, total = self.value.copy(), self.pnl.copy(), self.total
+        growth = total / self.base_total if self.base_total else 1.0
+        cum = self.last_cum * growth
+        return {
+            'current_value': value,
+            'unrealized_pnl': pnl,
+            'weight': value / total if total else np.zeros_like(value),
+            'total_value': total,
+            'day_change': total - self.base_total,
+            'day_change_pct': growth - 1,
+            'cum_port': cum,
+            'drawdown': cum / max(self.peak, cum) - 1,
+            'last_drawdown': self.last_drawdown,
+            'last_cum': self.last_cum,
+        }
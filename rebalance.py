@@ -0,0 +1,96 @@
+"""What-if rebalancing with incremental risk updates.
+
+The baseline keeps the annualized covariance Sigma, the weights w, Sigma w and
+w' Sigma w. A what-if edits the weights of a few holdings (k of them) and
+returns the risk of the result:
+
+* ``cash``      - the freed or extra weight goes to cash (zero risk), so
+  w' = w + sum_j d_j e_j;
+* ``pro-rata``  - the untouched holdings are rescaled to keep the weights
+  summing to the same total, so w' = a w + sum_j c_j e_j.
+
+Both are a scaling plus k sparse columns, so Sigma w' = a Sigma w + sum_j c_j
+Sigma[:, j] costs O(n k). The full product costs O(n^2). Component variance
+w'_i (Sigma w')_i, its sector totals (one bincount) and the portfolio variance
+w'.(Sigma w') are then O(n) each.
+
+The export has no per-asset betas. Each holding's beta is taken as its beta
+to the current portfolio scaled by the portfolio's beta to the benchmark:
+beta_i = beta_p (Sigma w)_i / w' Sigma w. This is exact when the benchmark
+moves with the current portfolio, and the what-if beta is sum_i w'_i beta_i.
+"""
+
+import numpy as np
+import pandas as pd
+
+REBALANCE_MODES = ('pro-rata', 'cash')
+
+
+class RebalanceModel:
+    """Baseline risk of one portfolio and incremental what-if evaluation"""
+
+    def __init__(self, cov, weights, tickers, sectors=None, beta=0.0):
+        self.cov = np.asarray(cov, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.tickers = list(tickers)
+        self.positions = {t: i for i, t in enumerate(self.tickers)}
+        sectors = sectors if sectors is not None else ['UNKNOWN'] * len(self.tickers)
+        self.sector_codes, self.sector_names = pd.factorize(pd.Series(sectors, dtype=object).fillna('UNKNOWN'),
+                                                            sort=True)
+        self.sigma_w = self.cov @ self.weights
+        self.port_var = float(self.weights @ self.sigma_w)
+        self.asset_betas = (beta * self.sigma_w / self.port_var if self.port_var > 0
+                            else np.zeros_like(self.weights))
+
+    def rebalanced(self, edits, mode='pro-rata'):
+        """(scale, {position: column coefficient}, new weights) for relative weight edits"""
+        if mode not in REBALANCE_MODES:
+            raise ValueError(f"mode must be one of {REBALANCE_MODES}")
+        changes = {self.positions[t]: float(c) for t, c in (edits or {}).items() if t in self.positions and c}
+        positions = np.fromiter(changes, dtype=np.int64, count=len(changes))
+        old = self.weights[positions]
+        new = np.maximum(old * (1 + np.fromiter(changes.values(), dtype=float, count=len(changes))), 0.0)
+
+        scale = 1.0
+        if mode == 'pro-rata':
+            untouched = self.weights.sum() - old.sum()
+            if untouched > 0:
+                scale = (untouched - (new.sum() - old.sum())) / untouched
+            scale = max(scale, 0.0)
+        # w' = scale * w + sum_j coeff_j e_j, with coeff_j setting w'_j to its new weight
+        coefficients = dict(zip(positions.tolist(), (new - scale * old).tolist()))
+        weights = self.weights * scale
+        weights[positions] = new
+        return scale, coefficients, weights
+
+    def evaluate(self, edits=None, mode='pro-rata'):
+        """Risk of the rebalanced portfolio from sparse updates of the baseline"""
+        scale, coefficients, weights = self.rebalanced(edits, mode)
+        sigma_w = self.sigma_w * scale
+        if coefficients:
+            columns = np.fromiter(coefficients, dtype=np.int64, count=len(coefficients))
+            sigma_w += self.cov[:, columns] @ np.fromiter(coefficients.values(), dtype=float, count=len(columns))
+        return self._risk(weights, sigma_w)
+
+    def baseline(self):
+        return self._risk(self.weights, self.sigma_w)
+
+    def _risk(self, weights, sigma_w):
+        component_var = weights * sigma_w
+        port_var = float(component_var.sum())
+        component_pct = component_var / port_var if port_var > 0 else np.zeros_like(component_var)
+        sector_pct = np.bincount(self.sector_codes, weights=component_pct, minlength=len(self.sector_names))
+        return {
+            'weights': weights,
+            'portfolio_var': port_var,
+            'portfolio_vol_annual': float(np.sqrt(max(port_var, 0.0))),
+            'beta': float(weights @ self.asset_betas),
+            'component_var_df': pd.DataFrame({
+                'Ticker': self.tickers,
+                'Weight': weights,
+                'ComponentVar': component_var,
+                'ComponentVarPct': component_pct,
+                'ComponentVolAbs': component_var / np.sqrt(port_var) if port_var > 0 else component_pct,
+            }),
+            'sector_contrib_pct': pd.DataFrame({'Sector': self.sector_names, 'ComponentVar': sector_pct}),
+        }
@@ -0,0 +1,156 @@
+"""Return, volatility and relative-performance queries over any date window.
+
+ReturnsIndex is built once per data version from the parsed date index and
+the cumulative portfolio and benchmark series. It keeps, for each series,
+prefix arrays of length n + 1:
+
+* ``growth(k)``  - growth of 1 up to and including point k - 1 (growth(0) = 1),
+  read straight from ``cum_port`` without a copy;
+* ``sum1[k]`` / ``sum2[k]`` - running sums of the per-period returns and of
+  their squares, built on the first volatility query (the recent-returns
+  charts only need growth and the window bounds).
+
+A window is the points whose dates fall in (base, end]. Both ends are found
+by binary search on the int64 date index, so a window costs O(log n) however
+long or fine-grained the history is:
+
+    return      = growth[j] / growth[i] - 1
+    volatility  = sqrt((S2 - S1^2 / m) / (m - 1) * periods_per_year)
+
+with S1, S2 the differences of the running sums over the m points. Named
+windows (1W, 1M, MTD, QTD, YTD, 1Y, ...) are calendar windows ending at the
+latest date, not fixed point counts.
+"""
+
+import numpy as np
+import pandas as pd
+
+from risk_engine import TRADING_DAYS
+
+# Named windows offered by the dashboard, in display order
+WINDOWS = ('1W', '1M', 'MTD', '3M', 'QTD', '6M', 'YTD', '1Y', 'ALL')
+
+_CALENDAR_OFFSETS = {
+    '1W': pd.DateOffset(weeks=1),
+    '1M': pd.DateOffset(months=1),
+    '2M': pd.DateOffset(months=2),
+    '3M': pd.DateOffset(months=3),
+    '6M': pd.DateOffset(months=6),
+    '1Y': pd.DateOffset(years=1),
+    '3Y': pd.DateOffset(years=3),
+}
+
+
+class _Prefix:
+    """Growth and running return sums of one cumulative series"""
+
+    def __init__(self, cumulative):
+        self.cumulative = np.asarray(cumulative, dtype=float)
+        self._sums = None
+
+    def growth(self, k):
+        return self.cumulative[k - 1] if k > 0 else 1.0
+
+    def sums(self):
+        """(sum1, sum2), computed on first use; rebuilding them in a race gives the same arrays"""
+        if self._sums is None:
+            growth = np.concatenate(([1.0], self.cumulative))
+            returns = growth[1:] / growth[:-1] - 1
+            self._sums = (np.concatenate(([0.0], np.cumsum(returns))),
+                          np.concatenate(([0.0], np.cumsum(returns * returns))))
+        return self._sums
+
+    def total_return(self, i, j):
+        return self.growth(j) / self.growth(i) - 1 if j > i else 0.0
+
+    def volatility(self, i, j, periods_per_year):
+        m = j - i
+        if m < 2:
+            return np.nan
+        sum1, sum2 = self.sums()
+        s1, s2 = sum1[j] - sum1[i], sum2[j] - sum2[i]
+        return float(np.sqrt(max(s2 - s1 * s1 / m, 0.0) / (m - 1) * periods_per_year))
+
+
+class ReturnsIndex:
+    """Window queries over a portfolio and benchmark cumulative-return history"""
+
+    def __init__(self, date_index, cum_port, cum_bench=None, periods_per_year=TRADING_DAYS):
+        n = min(len(date_index), len(cum_port))
+        if cum_bench is not None and len(cum_bench):
+            n = min(n, len(cum_bench))
+        self.date_index = np.asarray(date_index[:n], dtype=np.int64)
+        self.portfolio = _Prefix(cum_port[:n])
+        self.benchmark = _Prefix(cum_bench[:n]) if cum_bench is not None and len(cum_bench) else None
+        self.periods_per_year = periods_per_year
+
+    def __len__(self):
+        return len(self.date_index)
+
+    def as_of(self):
+        """Latest date of the history as a Timestamp (None when empty)"""
+        return pd.Timestamp(self.date_index[-1]) if len(self) else None
+
+    def bounds(self, window, as_of=None):
+        """(base, end) Timestamps of a named window ending at as_of (the latest date by default)"""
+        end = pd.Timestamp(as_of) if as_of is not None else self.as_of()
+        day = end.normalize()
+        if window == 'ALL':
+            base = None
+        elif window == 'MTD':
+            base = day.replace(day=1)
+        elif window == 'QTD':
+            base = day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+        elif window == 'YTD':
+            base = day.replace(month=1, day=1)
+        elif window in _CALENDAR_OFFSETS:
+            return end - _CALENDAR_OFFSETS[window], end
+        else:
+            raise ValueError(f"Unknown window {window!r}; expected one of {WINDOWS} or a date range")
+        # Period-to-date windows include their first day
+        return (base - pd.Timedelta(1, 'ns') if base is not None else None), end
+
+    def span(self, base=None, end=None):
+        """(i, j): points i..j-1 are the ones dated after base and up to end"""
+        i = 0 if base is None else int(np.searchsorted(self.date_index, pd.Timestamp(base).value, side='right'))
+        j = len(self) if end is None else int(np.searchsorted(self.date_index, pd.Timestamp(end).value, side='right'))
+        return i, max(i, j)
+
+    def date_span(self, start=None, end=None):
+        """(i, j) for an inclusive range of calendar days, as picked in a date range picker"""
+        base = pd.Timestamp(start).normalize() - pd.Timedelta(1, 'ns') if start else None
+        end = pd.Timestamp(end).normalize() + pd.Timedelta(1, 'D') - pd.Timedelta(1, 'ns') if end else None
+        return self.span(base, end)
+
+    def window_span(self, window, as_of=None):
+        return self.span(*self.bounds(window, as_of))
+
+    def stats(self, i, j):
+        """Return, volatility and relative performance over points i..j-1"""
+        port = self.portfolio.total_return(i, j)
+        bench = self.benchmark.total_return(i, j) if self.benchmark is not None else np.nan
+        return {
+            'start': pd.Timestamp(self.date_index[i]) if j > i else None,
+            'end': pd.Timestamp(self.date_index[j - 1]) if j > i else None,
+            'points': j - i,
+            'portfolio_return': port,
+            'benchmark_return': bench,
+            'excess_return': port - bench,
+            'relative_return': (1 + port) / (1 + bench) - 1 if bench > -1 else np.nan,
+            'portfolio_vol': self.portfolio.volatility(i, j, self.periods_per_year),
+            'benchmark_vol': (self.benchmark.volatility(i, j, self.periods_per_year)
+                              if self.benchmark is not None else np.nan),
+        }
+
+    def query(self, window=None, start=None, end=None, as_of=None):
+        """Stats of a named window, or of an inclusive start/end date range when window is None"""
+        span = self.window_span(window, as_of) if window is not None else self.date_span(start, end)
+        return dict(self.stats(*span), window=window or 'Custom', span=span)
+
+    def summary(self, windows=WINDOWS, as_of=None):
+        """One row of stats per named window"""
+        return pd.DataFrame([self.query(w, as_of=as_of) for w in windows]).drop(columns='span')
+
+    def bases(self, i):
+        """Growth at the close before point i, to rebase the cumulative series of a window to 1"""
+        return [self.portfolio.growth(i)] + ([self.benchmark.growth(i)] if self.benchmark is not None else [])
@@ -0,0 +1,292 @@
+"""Vectorized risk analytics for the portfolio dashboard.
+
+Derives the series the JSON export ships precomputed (``cum_port``,
+``drawdown``, ``rolling_vol``, ``rolling_beta``, VaR/CVaR, ...) from the raw
+daily ``portfolio_returns`` / ``benchmark_returns``, using the same
+conventions as the export: sample (ddof=1) rolling moments, a zero-filled
+warm-up period, and historical VaR as the empirical percentile. The full-period
+``beta_full`` divides the sample (ddof=1) covariance by the population
+(ddof=0) benchmark variance, as the export does, so derived and shipped betas
+agree (a strict sample beta would be smaller by (n - 1) / n).
+
+``IncrementalRiskEngine`` keeps running sums over the rolling window, a
+running peak and running full-period moments, so appending a day of returns
+costs O(1) instead of a full recompute (the VaR percentile is still one O(n)
+partition of the returns). ``extend`` is how the app uses it: a new data
+version whose returns only append days to the engine's history is folded in
+day by day, anything else (a cold start, a revised history, another window)
+seeds a fresh engine with one vectorized pass.
+"""
+
+from collections import deque
+
+import numpy as np
+
+TRADING_DAYS = 252
+DEFAULT_WINDOW = 60
+DEFAULT_CONFIDENCE = 0.95
+
+
+def cumulative_returns(returns):
+    return np.cumprod(1.0 + np.asarray(returns, dtype=float))
+
+
+def drawdown_series(cumulative):
+    cumulative = np.asarray(cumulative, dtype=float)
+    if len(cumulative) == 0:
+        return cumulative
+    return cumulative / np.maximum.accumulate(cumulative) - 1.0
+
+
+def _window_sums(values, window):
+    """Sums over each trailing window, for windows ending at index window-1 onwards"""
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    return csum[window:] - csum[:-window]
+
+
+def rolling_covariance(x, y, window=DEFAULT_WINDOW):
+    """Sample covariance of each trailing window; NaN during the warm-up"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    out = np.full(len(x), np.nan)
+    if window < 2 or len(x) < window:
+        return out
+    # Centre first so the running sums do not lose precision to cancellation
+    x = x - x.mean()
+    y = y - y.mean()
+    sx = _window_sums(x, window)
+    sy = _window_sums(y, window)
+    sxy = _window_sums(x * y, window)
+    out[window - 1:] = (sxy - sx * sy / window) / (window - 1)
+    return out
+
+
+def rolling_volatility(returns, window=DEFAULT_WINDOW, periods_per_year=TRADING_DAYS):
+    """Annualized rolling volatility, zero-filled for the first window-1 days"""
+    variance = np.maximum(rolling_covariance(returns, returns, window), 0.0)
+    return np.nan_to_num(np.sqrt(variance * periods_per_year))
+
+
+def rolling_beta(returns, benchmark_returns, window=DEFAULT_WINDOW):
+    """Rolling beta against the benchmark, zero-filled for the first window-1 days"""
+    cov = rolling_covariance(returns, benchmark_returns, window)
+    var = rolling_covariance(benchmark_returns, benchmark_returns, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = cov / var
+    return np.nan_to_num(beta, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def historical_var(returns, confidence=DEFAULT_CONFIDENCE):
+    """Return-space VaR threshold and CVaR (mean of returns at or below it)"""
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) == 0:
+        return 0.0, 0.0
+    threshold = float(np.percentile(returns, 100 * (1 - confidence)))
+    return threshold, float(returns[returns <= threshold].mean())
+
+
+def compute_risk_metrics(portfolio_returns, benchmark_returns, window=DEFAULT_WINDOW,
+                         confidence=DEFAULT_CONFIDENCE, periods_per_year=TRADING_DAYS):
+    """Derive every risk series and scalar used by the dashboard from raw returns"""
+    port = np.asarray(portfolio_returns, dtype=float)
+    bench = np.asarray(benchmark_returns, dtype=float)
+    cum_port = cumulative_returns(port)
+    drawdown = drawdown_series(cum_port)
+    var_threshold, cvar_threshold = historical_var(port, confidence)
+
+    vol_annual = float(port.std(ddof=1) * np.sqrt(periods_per_year)) if len(port) > 1 else 0.0
+    beta_full = 0.0
+    if len(port) > 1 and len(bench) == len(port):
+        bench_var = bench.var(ddof=0)  # The export's mixed convention, see above
+        beta_full = float(np.cov(port, bench)[0, 1] / bench_var) if bench_var > 0 else 0.0
+
+    return {
+        'cum_port': cum_port,
+        'cum_bench': cumulative_returns(bench),
+        'drawdown': drawdown,
+        'rolling_vol': rolling_volatility(port, window, periods_per_year),
+        'rolling_beta': rolling_beta(port, bench, window) if len(bench) == len(port) else np.zeros(len(port)),
+        'var_threshold': var_threshold,
+        'cvar_threshold': cvar_threshold,
+        'VaR_pct': -var_threshold,
+        'CVaR_pct': -cvar_threshold,
+        'max_drawdown': float(drawdown.min()) if len(drawdown) else 0.0,
+        'portfolio_vol_annual': vol_annual,
+        'beta_full': beta_full,
+    }
+
+
+class _GrowableArray:
+    """Append-only float buffer with amortized O(1) appends"""
+
+    def __init__(self, values=(), capacity=256):
+        values = np.asarray(values, dtype=float)
+        self._data = np.empty(max(capacity, 2 * len(values)))
+        self._data[:len(values)] = values
+        self._size = len(values)
+
+    def append(self, value):
+        if self._size == len(self._data):
+            grown = np.empty(2 * len(self._data))
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size] = value
+        self._size += 1
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+
+class IncrementalRiskEngine:
+    """Risk series that update in O(1) per appended day of returns"""
+
+    def __init__(self, window=DEFAULT_WINDOW, periods_per_year=TRADING_DAYS, resync_every=None):
+        self.window = window
+        self.periods_per_year = periods_per_year
+        # Periodically rebuild the window sums from scratch to stop float drift
+        self.resync_every = resync_every or 50 * window
+        self._recent = deque(maxlen=window)
+        self._sums = np.zeros(5)  # sum p, sum b, sum p*p, sum b*b, sum p*b
+        self._since_resync = 0
+        self._cum_port = 1.0
+        self._cum_bench = 1.0
+        self._peak = -np.inf
+        self._max_drawdown = 0.0
+        # Full-period count, means and co-moments (sum of squared deviations of
+        # p and b, and of their cross products), updated Welford-style
+        self._n = 0
+        self._means = np.zeros(2)
+        self._moments = np.zeros(3)
+        self.series = {name: _GrowableArray() for name in
+                       ('portfolio_returns', 'benchmark_returns', 'cum_port', 'cum_bench',
+                        'drawdown', 'rolling_vol', 'rolling_beta')}
+
+    @classmethod
+    def from_history(cls, portfolio_returns, benchmark_returns, window=DEFAULT_WINDOW, **kwargs):
+        """Seed the engine from a full history with one vectorized pass"""
+        engine = cls(window=window, **kwargs)
+        port = np.asarray(portfolio_returns, dtype=float)
+        bench = np.asarray(benchmark_returns, dtype=float)
+        metrics = compute_risk_metrics(port, bench, window, periods_per_year=engine.periods_per_year)
+        for name, values in (('portfolio_returns', port), ('benchmark_returns', bench),
+                             ('cum_port', metrics['cum_port']), ('cum_bench', metrics['cum_bench']),
+                             ('drawdown', metrics['drawdown']), ('rolling_vol', metrics['rolling_vol']),
+                             ('rolling_beta', metrics['rolling_beta'])):
+            engine.series[name] = _GrowableArray(values)
+        if len(port):
+            engine._cum_port = metrics['cum_port'][-1]
+            engine._cum_bench = metrics['cum_bench'][-1]
+            engine._peak = metrics['cum_port'].max()
+            engine._max_drawdown = metrics['max_drawdown']
+        if len(port) and len(bench) == len(port):
+            dp, db = port - port.mean(), bench - bench.mean()
+            engine._n = len(port)
+            engine._means = np.array([port.mean(), bench.mean()])
+            engine._moments = np.array([(dp * dp).sum(), (db * db).sum(), (dp * db).sum()])
+        engine._recent.extend(zip(port[-window:], bench[-window:]))
+        engine._resync()
+        return engine
+
+    def _resync(self):
+        if self._recent:
+            p, b = np.array(self._recent).T
+            self._sums = np.array([p.sum(), b.sum(), (p * p).sum(), (b * b).sum(), (p * b).sum()])
+        else:
+            self._sums = np.zeros(5)
+        self._since_resync = 0
+
+    def append(self, portfolio_return, benchmark_return):
+        """Add one day of returns and return the latest value of every series"""
+        p, b = float(portfolio_return), float(benchmark_return)
+        if len(self._recent) == self.window:
+            op, ob = self._recent[0]
+            self._sums -= (op, ob, op * op, ob * ob, op * ob)
+        self._recent.append((p, b))
+        self._sums += (p, b, p * p, b * b, p * b)
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every:
+            self._resync()
+
+        self._cum_port *= 1.0 + p
+        self._cum_bench *= 1.0 + b
+        self._peak = max(self._peak, self._cum_port)
+        drawdown = self._cum_port / self._peak - 1.0
+        self._max_drawdown = min(self._max_drawdown, drawdown)
+
+        self._n += 1
+        dp, db = p - self._means[0], b - self._means[1]
+        self._means += (dp / self._n, db / self._n)
+        self._moments += (dp * (p - self._means[0]), db * (b - self._means[1]), dp * (b - self._means[1]))
+
+        vol, beta = 0.0, 0.0
+        n = len(self._recent)
+        if n == self.window and n > 1:
+            sp, sb, spp, sbb, spb = self._sums
+            var_p = max((spp - sp * sp / n) / (n - 1), 0.0)
+            var_b = (sbb - sb * sb / n) / (n - 1)
+            cov = (spb - sp * sb / n) / (n - 1)
+            vol = float(np.sqrt(var_p * self.periods_per_year))
+            beta = float(cov / var_b) if var_b > 0 else 0.0
+
+        latest = {
+            'portfolio_returns': p,
+            'benchmark_returns': b,
+            'cum_port': self._cum_port,
+            'cum_bench': self._cum_bench,
+            'drawdown': drawdown,
+            'rolling_vol': vol,
+            'rolling_beta': beta,
+        }
+        for name, value in latest.items():
+            self.series[name].append(value)
+        return latest
+
+    @property
+    def max_drawdown(self):
+        return float(self._max_drawdown)
+
+    def to_dict(self):
+        """Current series as arrays, keyed like current_data"""
+        return {name: buffer.values for name, buffer in self.series.items()}
+
+    def metrics(self, confidence=DEFAULT_CONFIDENCE):
+        """Every series and scalar of compute_risk_metrics for the history so far"""
+        series = self.to_dict()
+        var_threshold, cvar_threshold = historical_var(series['portfolio_returns'], confidence)
+        n = self._n
+        m2_p, m2_b, c_pb = self._moments
+        vol_annual = float(np.sqrt(max(m2_p, 0.0) / (n - 1) * self.periods_per_year)) if n > 1 else 0.0
+        # Sample covariance over population variance, as compute_risk_metrics
+        beta_full = float((c_pb / (n - 1)) / (m2_b / n)) if n > 1 and m2_b > 0 else 0.0
+        return {
+            'cum_port': series['cum_port'],
+            'cum_bench': series['cum_bench'],
+            'drawdown': series['drawdown'],
+            'rolling_vol': series['rolling_vol'],
+            'rolling_beta': series['rolling_beta'],
+            'var_threshold': var_threshold,
+            'cvar_threshold': cvar_threshold,
+            'VaR_pct': -var_threshold,
+            'CVaR_pct': -cvar_threshold,
+            'max_drawdown': self.max_drawdown,
+            'portfolio_vol_annual': vol_annual,
+            'beta_full': beta_full,
+        }
+
+
+def extend(engine, portfolio_returns, benchmark_returns, window=DEFAULT_WINDOW, **kwargs):
+    """An engine for these returns: engine itself with the new days appended when
+    its history is a prefix of them, otherwise a fresh one seeded from them"""
+    port = np.asarray(portfolio_returns, dtype=float)
+    bench = np.asarray(benchmark_returns, dtype=float)
+    if engine is not None and engine.window == window:
+        seen_port = engine.series['portfolio_returns'].values
+        seen_bench = engine.series['benchmark_returns'].values
+        n = len(seen_port)
+        if (n <= len(port) and np.array_equal(port[:n], seen_port)
+                and np.array_equal(bench[:n], seen_bench)):
+            for p, b in zip(port[n:], bench[n:]):
+                engine.append(p, b)
+            return engine
+    return IncrementalRiskEngine.from_history(port, bench, window=window, **kwargs)
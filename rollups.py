@@ -0,0 +1,161 @@
+"""Precomputed rollups of the holdings by sector, asset type and tag.
+
+The export ships sector weights and sector risk as fixed tables, so any other
+grouping used to mean another offline pass and a bigger JSON, or a pandas
+groupby per click. RollupCube sums the additive holding measures (MEASURES,
+plus each holding's share of portfolio risk from the risk table) for every
+group of every dimension once per data version; group-by and drill-down
+switches are then lookups:
+
+* ``Sector``     - the holding's sector (UNKNOWN when missing);
+* ``Asset Type`` - Equity, ETF or Mutual Fund, inferred from ISIN and ticker
+  (see asset_types);
+* ``Tag``        - custom groups from a ``Tags`` column of the export and a
+  tag -> tickers mapping (PORTFOLIO_TAGS in app.py). A holding may carry
+  several tags or none (UNTAGGED), so tag totals can exceed the book's.
+
+Each dimension is stored the way HoldingsStore stores sectors: ``rows`` lists
+the member holdings group by group, largest position first, and
+``offsets[k]:offsets[k + 1]`` is the slice of group k, so the totals are one
+``np.add.reduceat`` per measure and a drill-down is a slice of row numbers.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ('Sector', 'Asset Type', 'Tag')
+
+# Holding columns summed per group; all of them are additive across holdings
+MEASURES = ('Current Value', 'Weight', 'Unrealized P&L', '1W Abs Change', '1M Abs Change')
+
+# Risk-table column rolled up onto the holdings by ticker: shares of portfolio
+# variance that sum to 1, like the sector risk table (ComponentVar there)
+RISK_MEASURE = 'ComponentVarPct'
+
+UNKNOWN_SECTOR = 'UNKNOWN'
+UNTAGGED = 'Untagged'
+
+
+def asset_types(isin, ticker):
+    """Equity, ETF or Mutual Fund per holding.
+
+    Indian ISINs read INE... for company shares and INF... for fund units.
+    Fund units with an exchange ticker are ETFs; mutual fund schemes are
+    quoted under Morningstar 0P... codes instead.
+    """
+    def upper(values):
+        return ['' if pd.isna(v) else str(v).upper() for v in values]
+
+    mutual_fund = np.array([code.startswith('0P') for code in upper(ticker)], dtype=bool)
+    fund = np.array([code.startswith('INF') for code in upper(isin)], dtype=bool)
+    return np.where(mutual_fund, 'Mutual Fund', np.where(fund, 'ETF', 'Equity'))
+
+
+def _tag_list(value):
+    if isinstance(value, str):
+        return [tag.strip() for tag in value.split(',') if tag.strip()]
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(tag) for tag in value if str(tag).strip()]
+    return []
+
+
+class RollupCube:
+    """Per-group totals and member rows of one book's holdings, for every dimension"""
+
+    def __init__(self, holdings_index, tags=None):
+        portfolio = holdings_index.portfolio
+        self.portfolio = portfolio
+        n = len(portfolio)
+        values = {name: np.nan_to_num(portfolio[name].to_numpy(dtype=float))
+                  for name in MEASURES if name in portfolio.columns}
+        if RISK_MEASURE in holdings_index.component_var_df.columns:
+            values[RISK_MEASURE] = holdings_index.by_ticker(holdings_index.component_var_df, RISK_MEASURE,
+                                                           holdings_index.holding_codes)
+        self.measures = tuple(values)
+        size = values.get('Current Value', values.get('Weight', np.zeros(n)))
+
+        self._labels, self._rows, self._offsets, self._tables = {}, {}, {}, {}
+        self._nbytes = 0
+        for dimension in DIMENSIONS:
+            rows, groups, labels = self._membership(dimension, holdings_index, tags or {})
+            # Group by group, largest position first within each group
+            order = np.lexsort((-size[rows], groups))
+            rows, groups = rows[order].astype(np.int32), groups[order]
+            counts = np.bincount(groups, minlength=len(labels))
+            offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+            table = {dimension: labels, 'Holdings': counts}
+            for name, column in values.items():
+                if len(rows):
+                    # reduceat returns the element at the start for empty groups
+                    totals = np.add.reduceat(column[rows], np.minimum(offsets[:-1], len(rows) - 1))
+                    table[name] = np.where(counts > 0, totals, 0.0)
+                else:
+                    table[name] = np.zeros(len(labels))
+            # Held groups, largest first (ties keep label order)
+            held = np.flatnonzero(counts > 0)
+            ranked = held[np.argsort(-table[self.measures[0] if self.measures else 'Holdings'][held], kind='stable')]
+            self._labels[dimension] = pd.Index(labels, dtype=object)
+            self._rows[dimension], self._offsets[dimension] = rows, offsets
+            columns = {name: column[ranked] for name, column in table.items()}
+            self._tables[dimension] = pd.DataFrame(columns)
+            # Sized here from the arrays: memory_usage(deep=True) on every load costs more than the build
+            self._nbytes += rows.nbytes + offsets.nbytes + sum(
+                column.nbytes + (sum(sys.getsizeof(v) for v in column) if column.dtype == object else 0)
+                for column in columns.values())
+
+    @staticmethod
+    def _membership(dimension, holdings_index, tags):
+        """(holding rows, group codes, group labels); a row appears once per group it belongs to"""
+        portfolio = holdings_index.portfolio
+        n = len(portfolio)
+        if not n:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.array([], dtype=object)
+        if dimension == 'Sector':
+            codes = holdings_index.holding_sectors
+            labels = np.append(holdings_index.sectors.to_numpy(dtype=object), UNKNOWN_SECTOR)
+            return np.arange(n), np.where(codes >= 0, codes, len(labels) - 1), labels
+        if dimension == 'Asset Type':
+            kinds = asset_types(portfolio['ISIN'] if 'ISIN' in portfolio.columns else [''] * n,
+                                portfolio['Ticker'].astype(object) if 'Ticker' in portfolio.columns else [''] * n)
+            labels, codes = np.unique(kinds.astype(object), return_inverse=True)
+            return np.arange(n), codes, labels
+
+        # Tags: the export's Tags column plus the configured tag -> tickers mapping
+        pairs = []
+        if 'Tags' in portfolio.columns:
+            pairs += [(row, tag) for row, value in enumerate(portfolio['Tags']) for tag in _tag_list(value)]
+        row_of_code = np.full(len(holdings_index.tickers) + 1, -1, dtype=np.int64)
+        known = holdings_index.holding_codes >= 0
+        row_of_code[holdings_index.holding_codes[known]] = np.flatnonzero(known)
+        for tag, tickers in tags.items():
+            held = row_of_code[holdings_index.ticker_codes(tickers)]
+            pairs += [(int(row), str(tag)) for row in held[held >= 0]]
+        pairs = list(dict.fromkeys(pairs))  # A tag listed twice for a holding counts once
+        tagged = {row for row, _ in pairs}
+        pairs += [(row, UNTAGGED) for row in range(n) if row not in tagged]
+        rows = np.array([row for row, _ in pairs], dtype=np.int64)
+        labels, codes = np.unique(np.array([tag for _, tag in pairs], dtype=object), return_inverse=True)
+        return rows, codes, labels
+
+    def table(self, dimension):
+        """Totals per group with at least one holding, largest first"""
+        return self._tables[dimension]
+
+    def groups(self, dimension):
+        """Labels of the held groups of a dimension, largest first"""
+        return self._tables[dimension][dimension].tolist()
+
+    def members(self, dimension, group):
+        """Holding rows of one group, largest position first (empty for an unknown group)"""
+        k = self._labels[dimension].get_indexer([group])[0]
+        if k < 0:
+            return self.portfolio.iloc[:0]
+        offsets = self._offsets[dimension]
+        return self.portfolio.iloc[self._rows[dimension][offsets[k]:offsets[k + 1]]]
+
+    @property
+    def nbytes(self):
+        """Bytes of the member rows and group tables (the holdings are counted where the data holds them)"""
+        return self._nbytes
@@ -0,0 +1,207 @@
+"""Compact binary columnar format for portfolio snapshots.
+
+Holds the same keys as ``portfolio_data.json`` in a layout that can be
+memory-mapped and read without parsing:
+
+    MAGIC (8 bytes) | header length (uint32 LE) | JSON header | 64-byte aligned column blobs
+
+Numeric series and table columns are stored as typed little-endian arrays,
+``dates`` as ``datetime64[D]``, and string columns such as ``Ticker`` and
+``Sector`` as int32 codes into dictionaries kept in the header (one dictionary
+shared by every table that uses the column). Square label/value tables such
+as ``corr_matrix`` are stored as a single 2-D matrix. Scalars and free text
+(``nudges``) live in the header.
+
+``decode`` returns NumPy views straight into the buffer, so a mapped snapshot
+costs no parsing and no copies for the time series.
+
+Convert a JSON export from the command line with:
+
+    python snapshot_format.py portfolio_data.json portfolio_data.snap
+"""
+
+import json
+import re
+import struct
+import sys
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"PFSNAP01"
+ALIGNMENT = 64
+_HEADER_LEN = struct.Struct("<I")
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# String columns and lists that share one dictionary across tables
+SHARED_DICTIONARIES = {
+    "Ticker": "tickers",
+    "portfolio_tickers": "tickers",
+    "Sector": "sectors",
+}
+
+
+def is_binary_snapshot(buffer):
+    return bytes(buffer[:len(MAGIC)]) == MAGIC
+
+
+def _is_number(value):
+    return value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+class _Encoder:
+    def __init__(self, float_dtype):
+        self.float_dtype = np.dtype(float_dtype).newbyteorder("<")
+        self.dictionaries = {}
+        self._lookups = {}
+        self.blobs = []
+        self.offset = 0
+
+    def add_array(self, array):
+        array = np.ascontiguousarray(array)
+        if array.dtype.byteorder == ">":
+            array = array.astype(array.dtype.newbyteorder("<"))
+        pad = -self.offset % ALIGNMENT
+        self.blobs.append(b"\0" * pad)
+        self.offset += pad
+        spec = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": self.offset}
+        data = array.tobytes()
+        self.blobs.append(data)
+        self.offset += len(data)
+        return spec
+
+    def add_codes(self, dictionary, values):
+        words = self.dictionaries.setdefault(dictionary, [])
+        lookup = self._lookups.setdefault(dictionary, {})
+        codes = np.empty(len(values), dtype="<i4")
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(words)
+                words.append(value)
+            codes[i] = code
+        return {"kind": "codes", "dictionary": dictionary, "array": self.add_array(codes)}
+
+    def numeric(self, values):
+        if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            return self.add_array(np.asarray(values, dtype="<i8"))
+        return self.add_array(np.asarray([np.nan if v is None else v for v in values], dtype=self.float_dtype))
+
+    def encode_table(self, name, records):
+        columns = list(dict.fromkeys(key for record in records for key in record))
+        values = {col: [record.get(col) for record in records] for col in columns}
+
+        # Square label/value tables (correlation matrices) become one matrix
+        label = columns[0] if columns else None
+        if (label is not None and all(isinstance(v, str) for v in values[label])
+                and columns[1:] == values[label]
+                and all(_is_number(v) for col in columns[1:] for v in values[col])):
+            matrix = np.array([[np.nan if v is None else v for v in values[col]] for col in columns[1:]],
+                              dtype=self.float_dtype).T
+            return {"kind": "matrix", "label": label,
+                    "labels": self.add_codes(SHARED_DICTIONARIES.get(label, f"{name}.{label}"), values[label]),
+                    "values": self.add_array(matrix)}
+
+        specs = []
+        for col in columns:
+            col_values = values[col]
+            if all(_is_number(v) for v in col_values):
+                specs.append({"name": col, "kind": "array", "array": self.numeric(col_values)})
+            elif all(v is None or isinstance(v, str) for v in col_values):
+                spec = self.add_codes(SHARED_DICTIONARIES.get(col, f"{name}.{col}"), col_values)
+                specs.append(dict(spec, name=col))
+            else:
+                specs.append({"name": col, "kind": "json", "values": col_values})
+        return {"kind": "table", "columns": specs}
+
+    def encode_value(self, name, value):
+        if not isinstance(value, list):
+            return {"kind": "json", "value": value}
+        if value and all(isinstance(v, dict) for v in value):
+            return self.encode_table(name, value)
+        if all(_is_number(v) for v in value):
+            return {"kind": "array", "array": self.numeric(value)}
+        if value and all(isinstance(v, str) and _DATE_RE.match(v) for v in value):
+            return {"kind": "array", "array": self.add_array(np.asarray(value, dtype="datetime64[D]"))}
+        if name in SHARED_DICTIONARIES and all(isinstance(v, str) for v in value):
+            return self.add_codes(SHARED_DICTIONARIES[name], value)
+        return {"kind": "json", "value": value}
+
+
+def encode(data_dict, float_dtype="<f8"):
+    """Encode a portfolio_data.json document into the binary columnar format"""
+    encoder = _Encoder(float_dtype)
+    entries = {name: encoder.encode_value(name, value) for name, value in data_dict.items()}
+    header = json.dumps({"format": 1, "entries": entries, "dictionaries": encoder.dictionaries}).encode("utf-8")
+
+    # Blob offsets are relative to the aligned start of the data section
+    prefix = len(MAGIC) + _HEADER_LEN.size + len(header)
+    data_start = prefix + (-prefix % ALIGNMENT)
+    return b"".join([MAGIC, _HEADER_LEN.pack(len(header)), header,
+                     b"\0" * (data_start - prefix)] + encoder.blobs)
+
+
+def _view(buffer, data_start, spec):
+    dtype = np.dtype(spec["dtype"])
+    shape = tuple(spec["shape"])
+    count = int(np.prod(shape)) if shape else 1
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec["offset"])
+    return array.reshape(shape)
+
+
+def decode(buffer):
+    """Decode a binary snapshot into arrays, DataFrames and plain values.
+
+    Time series and matrices are zero-copy views into ``buffer`` (for example
+    an mmap), which must stay open for as long as the result is in use.
+    """
+    if not is_binary_snapshot(buffer):
+        raise ValueError("Not a binary portfolio snapshot")
+    (header_len,) = _HEADER_LEN.unpack_from(buffer, len(MAGIC))
+    header_start = len(MAGIC) + _HEADER_LEN.size
+    header = json.loads(bytes(buffer[header_start:header_start + header_len]).decode("utf-8"))
+    prefix = header_start + header_len
+    data_start = prefix + (-prefix % ALIGNMENT)
+    dictionaries = {name: pd.Index(words, dtype=object) for name, words in header["dictionaries"].items()}
+
+    def categorical(spec):
+        codes = _view(buffer, data_start, spec["array"])
+        return pd.Categorical.from_codes(codes, categories=dictionaries[spec["dictionary"]])
+
+    result = {}
+    for name, entry in header["entries"].items():
+        kind = entry["kind"]
+        if kind == "json":
+            result[name] = entry["value"]
+        elif kind == "array":
+            result[name] = _view(buffer, data_start, entry["array"])
+        elif kind == "codes":
+            result[name] = np.asarray(categorical(entry))
+        elif kind == "matrix":
+            labels = pd.Index(np.asarray(categorical(entry["labels"])), name=entry["label"])
+            values = _view(buffer, data_start, entry["values"])
+            result[name] = pd.DataFrame(values, index=labels, columns=list(labels), copy=False)
+        else:
+            columns = {}
+            for spec in entry["columns"]:
+                if spec["kind"] == "array":
+                    columns[spec["name"]] = _view(buffer, data_start, spec["array"])
+                elif spec["kind"] == "codes":
+                    columns[spec["name"]] = categorical(spec)
+                else:
+                    columns[spec["name"]] = spec["values"]
+            result[name] = pd.DataFrame(columns)
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python snapshot_format.py INPUT.json OUTPUT.snap")
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        encoded = encode(json.load(f))
+    with open(sys.argv[2], "wb") as f:
+        f.write(encoded)
+    print(f"✅ Wrote {len(encoded):,} bytes to {sys.argv[2]}")
@@ -0,0 +1,135 @@
+"""Shared on-disk snapshot store for multi-worker deployments.
+
+One process at a time holds the writer lock and publishes new snapshots; every
+gunicorn worker maps the current snapshot read-only. Publishing writes the
+snapshot under its content version and then atomically swaps the ``CURRENT``
+pointer, so readers always see either the old or the new version, never a mix.
+"""
+
+import mmap
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server
+    fcntl = None
+
+# Old snapshot files kept around for readers that are still switching over
+KEEP_SNAPSHOTS = 3
+
+
+class SharedSnapshotStore:
+    """Single-writer, multi-reader snapshot directory shared by all workers"""
+
+    def __init__(self, directory, suffix=".json"):
+        self.directory = directory
+        self.suffix = suffix
+        self.pointer_path = os.path.join(directory, "CURRENT")
+        self.lock_path = os.path.join(directory, "writer.lock")
+        self.request_path = os.path.join(directory, "refresh.request")
+        self._lock_fd = None
+        self._lock_pid = None
+        self._pointer_stat = None
+        self._pointer = (None, None)
+        os.makedirs(directory, exist_ok=True)
+
+    # --- writer side ---
+
+    def acquire_writer(self):
+        """Try to become (or stay) the single writer; never blocks"""
+        if fcntl is None:
+            return True
+        if self._lock_fd is not None and self._lock_pid == os.getpid():
+            return True
+        # A descriptor inherited across fork belongs to the parent's lock
+        self._lock_fd = None
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self._lock_pid = os.getpid()
+        return True
+
+    def publish(self, content, version):
+        """Write a snapshot and atomically make it the current version"""
+        filename = f"snapshot-{version}{self.suffix}"
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            self._atomic_write(path, content)
+        self._atomic_write(self.pointer_path, f"{version}\n{filename}\n".encode("utf-8"))
+        self._prune(keep=filename)
+
+    def _atomic_write(self, path, content):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _prune(self, keep):
+        snapshots = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.startswith("snapshot-") and name.endswith(self.suffix)]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        for path in snapshots[KEEP_SNAPSHOTS:]:
+            if os.path.basename(path) != keep:
+                try:
+                    # Readers that still map the file keep their pages on POSIX
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # --- refresh requests from non-writer workers ---
+
+    def request_refresh(self):
+        """Ask whichever worker holds the writer lock to fetch now"""
+        with open(self.request_path, "a"):
+            os.utime(self.request_path, None)
+
+    def refresh_requested_at(self):
+        try:
+            return os.stat(self.request_path).st_mtime
+        except OSError:
+            return 0
+
+    # --- reader side ---
+
+    def current(self):
+        """Return (version, path) of the current snapshot, or (None, None)"""
+        try:
+            st = os.stat(self.pointer_path)
+        except OSError:
+            return None, None
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stamp != self._pointer_stat:
+            try:
+                with open(self.pointer_path, "r", encoding="utf-8") as f:
+                    version, filename = f.read().split()[:2]
+            except (OSError, ValueError):
+                return None, None
+            self._pointer_stat = stamp
+            self._pointer = (version, os.path.join(self.directory, filename))
+        return self._pointer
+
+    def current_version(self):
+        return self.current()[0]
+
+    def open_current(self):
+        """Map the current snapshot read-only; return (version, mmap) or (None, None)"""
+        version, path = self.current()
+        if version is None:
+            return None, None
+        with open(path, "rb") as f:
+            return version, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def age(self):
+        """Seconds since the current snapshot was published"""
+        try:
+            return time.time() - os.stat(self.pointer_path).st_mtime
+        except OSError:
+            return None
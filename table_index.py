@@ -0,0 +1,203 @@
+"""Column-typed index behind the server-side paged DataTables.
+
+The portfolio and risk-contribution tables run in Dash's ``custom`` paging,
+sorting and filtering modes, so only the visible page is sent. Each table is
+indexed once per data version:
+
+* numeric columns are kept as float64 arrays;
+* text columns (Sector, Ticker, Name, ...) become categoricals, so filters are
+  evaluated once per category and mapped through the integer codes;
+* the row order for each (column, direction) is computed on first use and
+  cached, so re-sorting and paging through a sorted table is a lookup;
+* filter masks are cached per ``filter_query`` string.
+"""
+
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache
+
+# Dash filter_query operators, word and symbol forms, mapped to one name
+OPERATORS = {
+    '=': 'eq', 'eq': 'eq', '!=': 'ne', 'ne': 'ne',
+    '<': 'lt', 'lt': 'lt', '<=': 'le', 'le': 'le',
+    '>': 'gt', 'gt': 'gt', '>=': 'ge', 'ge': 'ge',
+    'contains': 'contains', 'datestartswith': 'datestartswith',
+}
+
+_TERM = re.compile(r'^\{(?P<column>[^}]+)\}\s+(?P<op>\S+)(?:\s+(?P<value>.*))?$')
+
+_COMPARE = {
+    'eq': np.equal, 'ne': np.not_equal, 'lt': np.less,
+    'le': np.less_equal, 'gt': np.greater, 'ge': np.greater_equal,
+}
+
+
+def parse_filter_query(filter_query):
+    """Split a Dash filter_query into (column, operator, value, case_sensitive) terms"""
+    terms = []
+    for part in (filter_query or '').split(' && '):
+        part = part.strip()
+        if not part:
+            continue
+        match = _TERM.match(part)
+        if match is None:
+            raise ValueError(f"Unsupported filter expression: {part}")
+        op = match.group('op').lower()
+        case_sensitive = True
+        # "i" / "s" prefixes select case-insensitive / sensitive variants (ieq, scontains, ...)
+        if op not in OPERATORS and op[:1] in ('i', 's') and op[1:] in OPERATORS:
+            case_sensitive = op[0] == 's'
+            op = op[1:]
+        if op == 'is' and (match.group('value') or '').strip() == 'blank':
+            terms.append((match.group('column'), 'blank', None, True))
+            continue
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        value = (match.group('value') or '').strip()
+        if not value:
+            raise ValueError(f"Missing filter value: {part}")
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+            value = value[1:-1]
+        terms.append((match.group('column'), OPERATORS[op], value, case_sensitive))
+    return terms
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text_mask(labels, op, value, case_sensitive):
+    """Boolean per label for a text comparison"""
+    labels = pd.Series(labels, dtype=object).astype(str)
+    if not case_sensitive:
+        labels, value = labels.str.lower(), value.lower()
+    if op == 'contains':
+        return labels.str.contains(value, regex=False).to_numpy()
+    if op == 'datestartswith':
+        return labels.str.startswith(value).to_numpy()
+    return _COMPARE[op](labels.to_numpy(dtype=object), value).astype(bool)
+
+
+class TableIndex:
+    """Typed columns, cached sort orders and filter masks for one DataFrame"""
+
+    def __init__(self, frame, categorical=('Sector', 'Ticker'), decimals=None, cache_size=32):
+        self.frame = frame.reset_index(drop=True)
+        self.decimals = decimals
+        self.numeric = {}
+        self.categories = {}
+        for column in self.frame.columns:
+            values = self.frame[column]
+            if column not in categorical and pd.api.types.is_numeric_dtype(values):
+                self.numeric[column] = values.to_numpy(dtype=float)
+            else:
+                # Sorted categories make code order the lexical order
+                self.categories[column] = pd.Categorical(values.astype(object).where(values.notna(), None),
+                                                         ordered=True)
+        self._orders = {}
+        self._ranks = {}
+        self._masks = LRUCache(maxsize=cache_size)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def columns(self):
+        """DataTable column definitions with numeric/text types for the filter UI"""
+        return [{'name': c, 'id': c, 'type': 'numeric' if c in self.numeric else 'text'}
+                for c in self.frame.columns]
+
+    def _sort_key(self, column, descending):
+        # Missing values sort last in both directions
+        if column in self.numeric:
+            key = -self.numeric[column] if descending else self.numeric[column].copy()
+            key[np.isnan(key)] = np.inf
+            return key
+        codes = self.categories[column].codes.astype(np.int64)
+        key = -codes if descending else codes.copy()
+        key[codes < 0] = np.iinfo(np.int64).max
+        return key
+
+    def order(self, column, descending=False):
+        """Row order sorted by one column, computed once and cached"""
+        cache_key = (column, descending)
+        if cache_key not in self._orders:
+            self._orders[cache_key] = np.argsort(self._sort_key(column, descending), kind='stable')
+        return self._orders[cache_key]
+
+    def _rank(self, column, descending):
+        cache_key = (column, descending)
+        if cache_key not in self._ranks:
+            order = self.order(column, descending)
+            key = self._sort_key(column, descending)[order]
+            # Dense ranks so ties stay ties for the next sort key
+            dense = np.concatenate(([0], np.cumsum(key[1:] != key[:-1])))
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = dense
+            self._ranks[cache_key] = rank
+        return self._ranks[cache_key]
+
+    def sorted_rows(self, sort_by):
+        """Row order for a DataTable sort_by list (first entry is the primary key)"""
+        sort_by = [s for s in (sort_by or []) if s.get('column_id') in self.frame.columns]
+        if not sort_by:
+            return np.arange(len(self.frame))
+        if len(sort_by) == 1:
+            return self.order(sort_by[0]['column_id'], sort_by[0].get('direction') == 'desc')
+        ranks = [self._rank(s['column_id'], s.get('direction') == 'desc') for s in sort_by]
+        return np.lexsort(ranks[::-1])
+
+    def _term_mask(self, column, op, value, case_sensitive):
+        if column not in self.frame.columns:
+            raise ValueError(f"Unknown filter column: {column}")
+        if column in self.categories:
+            categorical = self.categories[column]
+            if op == 'blank':
+                return categorical.codes < 0
+            per_category = _text_mask(categorical.categories, op, value, case_sensitive)
+            # One comparison per category, mapped to rows through the codes
+            lookup = np.append(per_category, False)
+            return lookup[categorical.codes]
+        values = self.numeric[column]
+        if op == 'blank':
+            return np.isnan(values)
+        number = _as_number(value)
+        if op in _COMPARE and number is not None:
+            return _COMPARE[op](values, number)
+        return _text_mask(self.frame[column], op, value, case_sensitive)
+
+    def mask(self, filter_query):
+        """Boolean row mask for a filter_query, or None when nothing is filtered"""
+        terms = parse_filter_query(filter_query)
+        if not terms:
+            return None
+        cached = self._masks.get(filter_query)
+        if cached is None:
+            cached = np.ones(len(self.frame), dtype=bool)
+            for term in terms:
+                cached &= self._term_mask(*term)
+            self._masks.put(filter_query, cached)
+        return cached
+
+    def page(self, page_current=0, page_size=25, sort_by=None, filter_query=''):
+        """Records of the requested page and the page count after filtering"""
+        rows = self.sorted_rows(sort_by)
+        mask = self.mask(filter_query)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        page_count = max(math.ceil(len(rows) / page_size), 1)
+        page_current = min(max(page_current or 0, 0), page_count - 1)
+        rows = rows[page_current * page_size:(page_current + 1) * page_size]
+        visible = self.frame.iloc[rows]
+        if self.decimals is not None:
+            # Round float32 columns from their float64 copies, or they serialize
+            # with their binary noise (0.018 -> 0.017999999225139618)
+            widened = {c: self.numeric[c][rows] for c, dtype in visible.dtypes.items() if dtype == np.float32}
+            visible = visible.assign(**widened).round(self.decimals)
+        return visible.to_dict('records'), page_count
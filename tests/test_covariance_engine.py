@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import covariance_engine
+
+
+def _returns(n_days=300, n_assets=37, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0004, 0.01, n_days)
+    return market[:, None] * rng.uniform(0.5, 1.5, n_assets) + rng.normal(0, 0.015, (n_days, n_assets))
+
+
+@pytest.mark.parametrize("dtype, rtol", [(np.float64, 1e-10), (np.float32, 2e-3)])
+def test_accumulator_day_by_day_matches_full_covariance(dtype, rtol):
+    returns = _returns()
+    expected, _ = covariance_engine.covariance_matrix(returns)
+    # Small blocks so the rank-1 update crosses block boundaries
+    acc = covariance_engine.CovarianceAccumulator(returns.shape[1], dtype=dtype, block_size=8)
+    for row in returns:
+        acc.update(row)
+    cov = acc.covariance()
+    assert cov.dtype == dtype
+    np.testing.assert_allclose(cov, expected, rtol=rtol, atol=rtol * np.abs(expected).max())
+
+
+@pytest.mark.parametrize("dtype, rtol", [(np.float64, 1e-10), (np.float32, 2e-3)])
+def test_accumulator_seeded_then_updated(dtype, rtol):
+    returns = _returns(seed=1)
+    acc = covariance_engine.CovarianceAccumulator.from_returns(returns[:200], dtype=dtype, block_size=8)
+    for row in returns[200:]:
+        acc.update(row)
+    expected, _ = covariance_engine.covariance_matrix(returns)
+    np.testing.assert_allclose(acc.covariance(), expected, rtol=rtol, atol=rtol * np.abs(expected).max())
+
+
+def test_risk_tables_keep_covariance_ticker_order():
+    returns = _returns(n_assets=5)
+    tickers = ['E', 'C', 'A', 'D', 'B']
+    tables = covariance_engine.risk_tables(returns, tickers, np.full(5, 0.2), ['X'] * 5)
+    assert tables['asset_covariance_tickers'] == tickers
+    variances = returns.var(axis=0, ddof=1) * covariance_engine.TRADING_DAYS
+    np.testing.assert_allclose(np.diag(tables['asset_covariance']), variances)
+
+
+def test_gaps_are_left_out_pair_by_pair():
+    returns = _returns(n_days=120, n_assets=6, seed=2)
+    returns[:40, 1] = np.nan  # Listed late
+    returns[70:75, 4] = np.nan  # Suspended
+    cov, _ = covariance_engine.covariance_matrix(returns, block_size=4)
+
+    means = np.nanmean(returns, axis=0)
+    for i in range(6):
+        for j in range(6):
+            both = ~np.isnan(returns[:, i]) & ~np.isnan(returns[:, j])
+            expected = ((returns[both, i] - means[i]) * (returns[both, j] - means[j])).sum() / (both.sum() - 1)
+            assert cov[i, j] == pytest.approx(expected, rel=1e-10), (i, j)
+    np.testing.assert_allclose(np.diag(cov), np.nanvar(returns, axis=0, ddof=1), rtol=1e-10)
+
+
+@pytest.mark.parametrize("dtype, rtol", [(np.float64, 1e-9), (np.float32, 2e-3)])
+def test_extend_follows_appended_and_sliding_histories(dtype, rtol):
+    returns = _returns(n_days=400, seed=3)
+    acc = covariance_engine.extend(None, returns[:300], dtype=dtype, block_size=8)
+    # Appended days, then a fixed-length window sliding forward
+    for history in (returns[:310], returns[5:315], returns[20:330]):
+        extended = covariance_engine.extend(acc, history, dtype=dtype, block_size=8)
+        assert extended is acc
+        expected, _ = covariance_engine.covariance_matrix(history)
+        np.testing.assert_allclose(acc.covariance(), expected, rtol=rtol, atol=rtol * np.abs(expected).max())
+
+
+def test_extend_reseeds_a_revised_history():
+    returns = _returns(n_days=200, seed=4)
+    acc = covariance_engine.extend(None, returns[:150])
+    revised = returns.copy()
+    revised[3] += 0.01
+    assert covariance_engine.extend(acc, revised) is not acc
+    assert covariance_engine.extend(acc, returns[:, :-1]) is not acc
+    assert covariance_engine.extend(acc, returns, dtype=np.float32) is not acc
@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+import numpy as np
+
+# The app loads its sources at import: point it at nothing and keep side effects off
+os.environ.setdefault("PORTFOLIO_JSON_URL", "http://127.0.0.1:9/portfolio_data.json")
+os.environ.setdefault("PORTFOLIO_CACHE_DIR", tempfile.mkdtemp(prefix="portfolio-tests-"))
+os.environ.setdefault("PRERENDER", "0")
+os.environ.setdefault("PORTFOLIO_HISTORY", "0")
+
+import app  # noqa: E402
+import risk_engine  # noqa: E402
+
+DERIVED = ('cum_port', 'cum_bench', 'drawdown', 'rolling_vol', 'rolling_beta')
+
+
+def _document(n_days, seed=5):
+    rng = np.random.default_rng(seed)
+    bench = rng.normal(0.0004, 0.01, n_days)
+    port = 0.9 * bench + rng.normal(0.0001, 0.005, n_days)
+    return {'portfolio_returns': port.tolist(), 'benchmark_returns': bench.tolist()}
+
+
+def test_appended_days_extend_the_portfolio_engine():
+    full = _document(260)
+    first = {k: v[:250] for k, v in full.items()}
+    app.derive_risk_metrics(first, 'appended')
+    engine = app.risk_engines['appended']
+    derived = app.derive_risk_metrics(full, 'appended')
+
+    # The same engine took the ten new days, and agrees with a cold start
+    assert app.risk_engines['appended'] is engine
+    assert len(engine.series['portfolio_returns'].values) == 260
+    expected = risk_engine.compute_risk_metrics(full['portfolio_returns'], full['benchmark_returns'],
+                                                window=app.RISK_WINDOW)
+    for key in DERIVED:
+        np.testing.assert_allclose(derived[key], expected[key], rtol=1e-8, atol=1e-10, err_msg=key)
+    np.testing.assert_allclose(derived['beta_full'], expected['beta_full'], rtol=1e-9)
+
+
+def test_without_a_portfolio_the_metrics_are_computed_cold():
+    before = dict(app.risk_engines)
+    derived = app.derive_risk_metrics(_document(80))
+    assert app.risk_engines == before
+    assert len(derived['cum_port']) == 80
+
+
+def test_appended_days_update_the_portfolio_covariance():
+    rng = np.random.default_rng(6)
+    tickers = ['AAA', 'BBB', 'CCC', 'DDD']
+    returns = rng.normal(0.0005, 0.01, (200, len(tickers)))
+    portfolio = [{'Ticker': t, 'Weight': 0.25, 'Sector': s} for t, s in zip(tickers, 'XXYZ')]
+
+    def document(days):
+        records = [dict(zip(tickers, row), Date=str(day)) for day, row in enumerate(returns[:days])]
+        return {'asset_returns': records, 'portfolio': portfolio}
+
+    app.derive_risk_tables(document(190), 'covariance')
+    _, accumulator = app.covariance_accumulators['covariance']
+    derived = app.derive_risk_tables(document(200), 'covariance')
+    assert app.covariance_accumulators['covariance'][1] is accumulator
+
+    cold = app.derive_risk_tables(document(200))
+    np.testing.assert_allclose(derived['asset_covariance'], cold['asset_covariance'], rtol=1e-10)
+    np.testing.assert_allclose(derived['component_var_df']['ComponentVarPct'],
+                               cold['component_var_df']['ComponentVarPct'], rtol=1e-10)
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+# The app loads its sources at import: point it at nothing and keep side effects off
+os.environ.setdefault("PORTFOLIO_JSON_URL", "http://127.0.0.1:9/portfolio_data.json")
+os.environ.setdefault("PORTFOLIO_CACHE_DIR", tempfile.mkdtemp(prefix="portfolio-tests-"))
+os.environ.setdefault("PRERENDER", "0")
+os.environ.setdefault("PORTFOLIO_HISTORY", "0")
+
+import app  # noqa: E402
+import price_feed  # noqa: E402
+from conftest import REPO_DIR  # noqa: E402
+from dash.exceptions import PreventUpdate  # noqa: E402
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    with open(os.path.join(REPO_DIR, "portfolio_data.json"), "r", encoding="utf-8") as f:
+        data = app.build_current_data(json.load(f), version="live-test")
+    book = price_feed.TickBook()
+    monkeypatch.setattr(app, "price_book", book)
+    monkeypatch.setattr(app, "live_feed", object())
+    monkeypatch.setattr(app, "get_portfolio_data", lambda portfolio_id: data)
+    return data, book
+
+
+def _operations(patch):
+    return {tuple(op['location']): op['params']['value'] for op in patch.to_plotly_json()['operations']}
+
+
+def test_visible_page_gets_the_live_values(streaming):
+    data, book = streaming
+    holding = data['portfolio'].iloc[0]
+    page, _ = app.portfolio_table_index(data).page(0, app.TABLE_PAGE_SIZE)
+    row = next(i for i, record in enumerate(page) if record['Ticker'] == holding['Ticker'])
+
+    book.push([(holding['Ticker'], 2 * holding['Current Value'] / holding['Quantity Available'], 0.0)])
+    app.live_portfolio(data).refresh(book)
+    operations = _operations(app.update_live_table_page({}, page, ['on'], None))
+    assert operations[(row, 'Current Value')] == pytest.approx(2 * holding['Current Value'])
+    assert operations[(row, 'Unrealized P&L')] == pytest.approx(holding['Unrealized P&L'] + holding['Current Value'])
+
+    # Every weight on the page is re-based on the live total
+    for (i, column), value in operations.items():
+        page[i][column] = value
+    weights = app.live_portfolio(data).snapshot()['weight']
+    positions = app.live_portfolio(data).positions
+    assert [record['Weight'] for record in page] == [round(weights[positions[record['Ticker']]], 3) for record in page]
+
+    with pytest.raises(PreventUpdate):
+        app.update_live_table_page({}, page, [], None)
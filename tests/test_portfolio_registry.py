@@ -0,0 +1,35 @@
+import json
+import os
+import tempfile
+
+os.environ.setdefault("PORTFOLIO_CACHE_DIR", tempfile.mkdtemp(prefix="portfolio-tests-"))
+
+from portfolio_registry import PortfolioRegistry  # noqa: E402
+
+EMPTY = {'version': None}
+
+
+def _registry(names, max_bytes=None):
+    sources = {name: f"http://127.0.0.1:9/{name}-{os.getpid()}.json" for name in names}
+    registry = PortfolioRegistry(sources, lambda data_dict, version, name: dict(data_dict, version=version, name=name),
+                                 EMPTY, max_bytes=max_bytes, keep_history=False)
+    for name, refresher in registry.refreshers.items():
+        refresher.fetcher.publish(json.dumps({'book': name, 'pad': 'x' * 10_000}).encode("utf-8"))
+    return registry
+
+
+def test_warm_parses_the_other_books_from_their_snapshots():
+    registry = _registry(['warm-a', 'warm-b', 'warm-c'])
+    registry.load('warm-a', fetch=False)
+    registry.warm(['warm-b', 'warm-c']).join(timeout=30)
+    assert {name for name in registry.names if name in registry.datasets} == {'warm-a', 'warm-b', 'warm-c'}
+    assert registry.datasets.get('warm-c')['name'] == 'warm-c'
+
+
+def test_warm_stops_at_its_share_of_the_memory_budget():
+    registry = _registry(['fill-a', 'fill-b', 'fill-c'], max_bytes=10**9)
+    registry.load('fill-a', fetch=False)
+    registry.datasets.max_bytes = registry.datasets.total_bytes  # Full already
+    loaded = registry.load_all(['fill-b', 'fill-c'], fetch=False, fill=0.5)
+    assert loaded == {'fill-b': None, 'fill-c': None}
+    assert 'fill-a' in registry.datasets
@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import risk_engine
+from conftest import REPO_DIR
+
+SERIES = ('cum_port', 'cum_bench', 'drawdown', 'rolling_vol', 'rolling_beta')
+
+
+def _returns(n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    bench = rng.normal(0.0004, 0.01, n_days)
+    return 0.8 * bench + rng.normal(0.0002, 0.006, n_days), bench
+
+
+def test_matches_shipped_export():
+    with open(os.path.join(REPO_DIR, "portfolio_data.json"), "r", encoding="utf-8") as f:
+        shipped = json.load(f)
+    metrics = risk_engine.compute_risk_metrics(shipped['portfolio_returns'], shipped['benchmark_returns'])
+    for key in ('beta_full', 'portfolio_vol_annual', 'max_drawdown', 'var_threshold', 'cvar_threshold'):
+        assert metrics[key] == pytest.approx(shipped[key], rel=1e-9, abs=1e-12), key
+    for key in SERIES:
+        np.testing.assert_allclose(metrics[key], shipped[key], rtol=1e-9, atol=1e-12, err_msg=key)
+
+
+@pytest.mark.parametrize("seeded_days", [0, 120])
+def test_incremental_matches_full_recompute(seeded_days):
+    window = 5
+    port, bench = _returns(700)
+    engine = risk_engine.IncrementalRiskEngine.from_history(port[:seeded_days], bench[:seeded_days], window=window)
+    for p, b in zip(port[seeded_days:], bench[seeded_days:]):
+        engine.append(p, b)
+
+    # 700 days cross the float-drift rebuild (every 50 windows) more than once
+    assert len(port) - seeded_days > 2 * engine.resync_every
+    expected = risk_engine.compute_risk_metrics(port, bench, window=window)
+    series = engine.to_dict()
+    for key in SERIES:
+        np.testing.assert_allclose(series[key], expected[key], rtol=1e-8, atol=1e-10, err_msg=key)
+    assert engine.max_drawdown == pytest.approx(expected['max_drawdown'])
+
+
+def test_resync_rebuilds_window_sums():
+    engine = risk_engine.IncrementalRiskEngine(window=4, resync_every=3)
+    port, bench = _returns(10, seed=1)
+    for p, b in zip(port, bench):
+        engine.append(p, b)
+    assert engine._since_resync == 10 % 3
+    p, b = port[-4:], bench[-4:]
+    np.testing.assert_allclose(engine._sums, [p.sum(), b.sum(), (p * p).sum(), (b * b).sum(), (p * b).sum()])
+
+
+SCALARS = ('var_threshold', 'cvar_threshold', 'VaR_pct', 'CVaR_pct', 'max_drawdown', 'portfolio_vol_annual', 'beta_full')
+
+
+def _assert_metrics_match(metrics, expected):
+    for key in SERIES:
+        np.testing.assert_allclose(metrics[key], expected[key], rtol=1e-8, atol=1e-10, err_msg=key)
+    for key in SCALARS:
+        assert metrics[key] == pytest.approx(expected[key], rel=1e-9, abs=1e-12), key
+
+
+def test_incremental_scalars_match_full_recompute():
+    port, bench = _returns(400, seed=2)
+    engine = risk_engine.IncrementalRiskEngine.from_history(port[:100], bench[:100], window=20)
+    for p, b in zip(port[100:], bench[100:]):
+        engine.append(p, b)
+    _assert_metrics_match(engine.metrics(), risk_engine.compute_risk_metrics(port, bench, window=20))
+
+
+def test_extend_appends_new_days_and_reseeds_a_revised_history():
+    port, bench = _returns(300, seed=4)
+    engine = risk_engine.extend(None, port[:250], bench[:250], window=20)
+    extended = risk_engine.extend(engine, port, bench, window=20)
+    assert extended is engine
+    _assert_metrics_match(extended.metrics(), risk_engine.compute_risk_metrics(port, bench, window=20))
+
+    revised = port.copy()
+    revised[10] += 0.01
+    reseeded = risk_engine.extend(engine, revised, bench, window=20)
+    assert reseeded is not engine
+    _assert_metrics_match(reseeded.metrics(), risk_engine.compute_risk_metrics(revised, bench, window=20))
+    assert risk_engine.extend(engine, port, bench, window=30) is not engine
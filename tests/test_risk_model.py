@@ -0,0 +1,62 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The app loads its sources at import: point it at nothing and keep side effects off
+os.environ.setdefault("PORTFOLIO_JSON_URL", "http://127.0.0.1:9/portfolio_data.json")
+os.environ.setdefault("PORTFOLIO_CACHE_DIR", tempfile.mkdtemp(prefix="portfolio-tests-"))
+os.environ.setdefault("PRERENDER", "0")
+os.environ.setdefault("PORTFOLIO_HISTORY", "0")
+
+import app  # noqa: E402
+import covariance_engine  # noqa: E402
+import synthetic  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def document():
+    return synthetic.generate(12, 300, seed=3, asset_returns=True)
+
+
+def _asset_returns(document):
+    returns = pd.DataFrame(document['asset_returns']).drop(columns='Date')
+    return returns, returns.var(ddof=1) * covariance_engine.TRADING_DAYS
+
+
+def test_derived_covariance_matches_its_tickers(document):
+    model = app.risk_model(app.build_current_data(document))
+    _, variances = _asset_returns(document)
+    np.testing.assert_allclose(np.diag(model['cov']), variances[model['tickers']].to_numpy())
+
+
+def test_shipped_risk_table_in_another_order(document):
+    # Ship the risk table (sorted by risk share) but not corr_matrix, so only
+    # the covariance is derived from asset_returns, in the returns' column order
+    returns, variances = _asset_returns(document)
+    weights = pd.DataFrame(document['portfolio']).set_index('Ticker')['Weight'].reindex(returns.columns)
+    tables = covariance_engine.risk_tables(returns.to_numpy(), list(returns.columns), weights.to_numpy(),
+                                           ['X'] * len(weights))
+    shipped = tables['component_var_df'].sort_values('ComponentVarPct', ascending=False)
+    assert list(shipped['Ticker']) != list(returns.columns)
+    model = app.risk_model(app.build_current_data(dict(document, component_var_df=shipped.to_dict('records'))))
+
+    assert model['tickers'] == list(shipped['Ticker'])
+    np.testing.assert_allclose(np.diag(model['cov']), variances[model['tickers']].to_numpy())
+    np.testing.assert_allclose(model['weights'], shipped['Weight'].to_numpy())
+
+
+def test_risk_table_ticker_missing_from_returns(document):
+    # A held ticker without returns rules the derived covariance out; the model
+    # falls back to the covariance implied by the (derived) correlations
+    returns, _ = _asset_returns(document)
+    document = dict(document, asset_returns=pd.DataFrame(document['asset_returns'])
+                    .drop(columns=returns.columns[0]).to_dict('records'))
+    data = app.build_current_data(dict(document, component_var_df=pd.DataFrame({
+        'Ticker': returns.columns, 'Weight': 1 / len(returns.columns),
+        'ComponentVar': 0.001, 'ComponentVarPct': 1 / len(returns.columns)}).to_dict('records')))
+    model = app.risk_model(data)
+    assert model['tickers'] == list(returns.columns[1:])
+    assert np.isfinite(model['cov']).all()
@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+# The app loads its sources at import: point it at nothing and keep side effects off
+os.environ.setdefault("PORTFOLIO_JSON_URL", "http://127.0.0.1:9/portfolio_data.json")
+os.environ.setdefault("PORTFOLIO_CACHE_DIR", tempfile.mkdtemp(prefix="portfolio-tests-"))
+os.environ.setdefault("PRERENDER", "0")
+os.environ.setdefault("PORTFOLIO_HISTORY", "0")
+
+import app  # noqa: E402
+import rollups  # noqa: E402
+from conftest import REPO_DIR  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def data():
+    with open(os.path.join(REPO_DIR, "portfolio_data.json"), "r", encoding="utf-8") as f:
+        return app.build_current_data(json.load(f))
+
+
+def test_sector_risk_shares_match_the_sector_risk_table(data):
+    table = data['rollups'].table('Sector').set_index('Sector')[rollups.RISK_MEASURE]
+    shipped = data['sector_contrib_pct'].set_index('Sector')['ComponentVar']
+    assert table.sum() == pytest.approx(1.0, abs=1e-6)
+    np.testing.assert_allclose(table.to_numpy(), shipped.reindex(table.index).to_numpy(), atol=1e-6)
+
+
+def test_asset_type_risk_shares_cover_the_book(data):
+    assert data['rollups'].table('Asset Type')[rollups.RISK_MEASURE].sum() == pytest.approx(1.0, abs=1e-6)
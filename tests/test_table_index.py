@@ -0,0 +1,13 @@
+import numpy as np
+import pandas as pd
+
+from table_index import TableIndex
+
+
+def test_rounded_page_of_float32_columns():
+    frame = pd.DataFrame({'Ticker': ['A', 'B'], 'Weight': np.array([0.018, 0.25], dtype=np.float32),
+                          'Current Value': [1065.1224, 324.8731]})
+    records, page_count = TableIndex(frame, decimals=3).page()
+    assert page_count == 1
+    assert records == [{'Ticker': 'A', 'Weight': 0.018, 'Current Value': 1065.122},
+                       {'Ticker': 'B', 'Weight': 0.25, 'Current Value': 324.873}]